@@ -1,11 +1,8 @@
-import pygame
-import cv2, os
-import threading
-import numpy as np
-import tensorflow as tf  # assuming your YOLO model is in TensorFlow
-import time
-import pygame
+import os
 from constants import *
+from road_map import RoadMap
+# pygame, cv2 and the perception stack are imported on first use, so road
+# properties load with NumPy only (see bench_startup.py)
 
 global minLineLength, maxLineGap
 minLineLength = 20
@@ -13,39 +10,61 @@ maxLineGap = 4
 
 class Road:
 
-    def __init__(self):
+    def __init__(self, road_map=None):
         # Defining some sample road properties
         self.road_types = ["asphalt", "gravel", "dirt", "snow"]
-        self.roughness = {
-            "asphalt": 0.1,   # Roughness scale: 0 (smooth) to 1 (very rough)
-            "gravel": 0.6,
-            "dirt": 0.8,
-            "snow": 0.7
-        }
-        self.friction = {
-            "asphalt": 0.9,   # Friction scale: 0 (no friction) to 1 (high friction)
-            "gravel": 0.5,
-            "dirt": 0.4,
-            "snow": 0.3
-        }
-
-    def get_road_properties(self, position):
+        # RoadMap or path to a map file; the default repeats the road types every 100 units
+        if isinstance(road_map, str):
+            road_map = RoadMap.load(road_map)
+        self.map = road_map if road_map is not None else RoadMap.straight(self.road_types, 100, periodic=True)
+        self._lane_detector = None
+        self.detector = None  # InferenceBatcher, created by load_perception_model
+
+    @property
+    def lane_detector(self):
+        if self._lane_detector is None:
+            from lane_detection import LaneDetectionStage
+            self._lane_detector = LaneDetectionStage()
+        return self._lane_detector
+
+    def load_perception_model(self, spec="tiny", max_batch=16, deadline=0.02, frame_shape=None, **model_kwargs):
+        """Load an object detector once and return the InferenceBatcher that feeds it.
+
+        spec is "tiny" for the NumPy stand-in, a saved TensorFlow model path,
+        or a model object (see detection.load_model). Models are cached per
+        process, so every Road shares one loaded copy. With frame_shape
+        (height, width, 3) the model is warmed up on a full batch here rather
+        than on the first real frame.
         """
-        This function returns road properties based on a given position.
-        For simplicity, the road type changes every 100 units of position.
-        You can modify the logic to be more sophisticated if needed.
+        from detection import InferenceBatcher, load_model
+        self.detector = InferenceBatcher(load_model(spec, **model_kwargs), max_batch, deadline, frame_shape)
+        return self.detector
+
+    def detect_objects(self, frames, frame_time=0.0):
+        """Detect objects in a list of frames (one per vehicle) with as few model calls as max_batch allows.
+
+        Returns one DetectionResult per frame, in order, each with its
+        detections and the queueing and inference time of its batch.
+        """
+        if self.detector is None:
+            from detection import frame_array
+            # warm up on the first frame's shape before any of them is timed
+            self.load_perception_model(frame_shape=frame_array(frames[0]).shape if len(frames) else None)
+        return self.detector.infer(frames, frame_time)
+
+    def get_road_properties(self, x, y=None):
         """
+        Return road properties at arc length x along the road, or at the map
+        point (x, y) when y is given.
 
-        # Based on position, determine which type of road it is
-        road_type = self.road_types[position // 100 % len(self.road_types)]
+        Scalars get a dict shared per segment (do not modify it); arrays are
+        looked up in one vectorized query and get a dict of arrays.
+        """
+        return self.map.lookup(x, y)
 
-        return {
-            "road_type": road_type,
-            "roughness": self.roughness[road_type],
-            "friction": self.friction[road_type]
-        }
     @staticmethod
     def lane_decider(surface):
+        import pygame
         pygame_image = pygame.surfarray.array3d(surface)
         return pygame_image
 
@@ -75,45 +94,21 @@ class Road:
     @staticmethod
     def pygame_surface_to_opencv_image(surface):
         """Convert a pygame surface to an OpenCV image."""
+        import pygame
         opencv_image = pygame.surfarray.array3d(surface).transpose([1, 0, 2])
         return opencv_image
     
-    def detect_lanes_pygame(self, image, minLineLength=95, maxLineGap=100, canny_thresholds=(255, 255),solid_line_threshold=200.0):
-        road_image = self.pygame_surface_to_opencv_image(image)
-        gray = cv2.cvtColor(road_image[:, :, ::-1], cv2.COLOR_BGR2GRAY)
-        contrasted = cv2.convertScaleAbs(gray, alpha=1.5, beta=0)
-        blurred = cv2.GaussianBlur(contrasted, (5, 5), 0) 
-        canny = cv2.Canny(blurred, *canny_thresholds)
-        
-        kernel = np.ones((3, 3), np.uint8)
-        dilated = cv2.dilate(canny, kernel, iterations=1)
-
-        height, width = road_image.shape[:2]
-
-        rectangle_top_left = (-50, height//2-30)
-        rectangle_bottom_right = (width+150, 2*height//3-20)
-        rectangle = np.array([[rectangle_top_left, (rectangle_bottom_right[0], rectangle_top_left[1]), rectangle_bottom_right, (rectangle_top_left[0], rectangle_bottom_right[1])]])
-        polygons = np.array(rectangle, dtype=np.int32)
-
-        mask = np.zeros_like(dilated)
-        cv2.fillPoly(mask, polygons, 255)
-        masked_image = cv2.bitwise_and(dilated, mask)  # Use dilated here
-        lines = cv2.HoughLinesP(masked_image, 2, np.pi/180, 100, np.array([]), minLineLength=minLineLength, maxLineGap=maxLineGap)
-        line_image = np.zeros(road_image.shape, dtype=road_image.dtype)
-
-        if lines is not None:
-            for line in lines:
-                x1, y1, x2, y2 = line.reshape(4)
-                length = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
-
-                if length > solid_line_threshold:  # Solid line
-                    cv2.line(line_image, (x1, y1), (x2, y2), (0, 255, 0), 10)
-                else:  # Dashed line
-                    cv2.line(line_image, (x1, y1), (x2, y2), (0, 0, 255), 10)
-                combined_image = cv2.addWeighted(road_image, 0.8, line_image, 1, 1)
-                # Draw the ROI polygon for debugging purposes
-            cv2.polylines(combined_image, [polygons], isClosed=True, color=(255, 255, 0), thickness=2)
-        return lines, combined_image
+    def detect_lanes_pygame(self, image, minLineLength=95, maxLineGap=100, canny_thresholds=(255, 255),solid_line_threshold=200.0, draw=True):
+        """Return (lines, combined_image) for a pygame surface.
+
+        The work is done by a LaneDetectionStage that crops to the ROI first and
+        reuses its buffers; combined_image is that stage's overlay buffer (None
+        when draw is False).
+        """
+        stage = self.lane_detector
+        stage.minLineLength, stage.maxLineGap = minLineLength, maxLineGap
+        stage.canny_thresholds, stage.solid_line_threshold = canny_thresholds, solid_line_threshold
+        return stage.process_surface(image, draw)
 
     def car_position_in_lane(self,lines, car_image_np, combined_image):
         
@@ -128,18 +123,20 @@ class Road:
         return combined_image
 
 if __name__=="__main__":
+    import cv2
+    import pygame
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    assets_path = os.path.join(current_dir, "assets\\")
+    assets_path = os.path.join(current_dir, "assets")
 
     rd = Road()
-    pygame_image = pygame.image.load(assets_path + "city\\" + "4Wayroad800x600.png")
+    pygame_image = pygame.image.load(os.path.join(assets_path, "city", "4Wayroad800x600.png"))
 
     while True:  # Loop until a break condition is met
         if pygame_image.get_size() != (800, 600):
-            scaled_pygame_image = pygame.transform.scale(pygame_image, (WIDTH, HEIGHT))
-            com_img = rd.detect_lanes_pygame(scaled_pygame_image)
+            scaled_pygame_image = pygame.transform.scale(pygame_image, (800, 600))
+            _, com_img = rd.detect_lanes_pygame(scaled_pygame_image)
         else:
-            com_img = rd.detect_lanes_pygame(pygame_image)
+            _, com_img = rd.detect_lanes_pygame(pygame_image)
 
         cv2.imshow('Image', com_img)
         key = cv2.waitKey(1) & 0xFF
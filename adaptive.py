@@ -0,0 +1,291 @@
+import math
+import time
+from collections import namedtuple
+import numpy as np
+from scipy.integrate import solve_ivp
+from dynamics import Car, CarState
+from constants import V_HOLD
+from vehicle_params import vehicle_parameters
+
+VELOCITY = 1
+STOP_SPEED = 1e-3 * V_HOLD  # m/s; the brake force fades out towards v = 0, so "stopped" is just below this
+
+# one discrete change found by an event function: kind is "shift_up",
+# "shift_down", "stop" or "surface", detail the new gear or segment index
+Event = namedtuple("Event", "t kind detail")
+AdaptiveResult = namedtuple("AdaptiveResult", "t y acceleration gear events nfev intervals")
+
+
+class Powertrain:
+    """Gearbox from vehicle_parameters; turns engine torque into wheel torque.
+
+    PhysicsLoop and EventIntegrator share this model, and both default to
+    direct(), the plain Car's engine torque at the wheels.
+    """
+
+    def __init__(self, params=None, shift_up_rpm=5000.0, shift_down_rpm=1500.0):
+        params = vehicle_parameters if params is None else params
+        self.ratios = list(params["transmission_ratios"])
+        self.final_drive = params["final_drive_ratio"]
+        self.efficiency = params["engine_efficiency"]
+        self.tire_radius = params["tire_radius"]
+        self.shift_up_rpm = shift_up_rpm
+        self.shift_down_rpm = shift_down_rpm
+
+    @classmethod
+    def direct(cls, params=None):
+        """A single 1:1 gear without losses: the engine torque reaches the wheels unchanged."""
+        powertrain = cls(params)
+        powertrain.ratios, powertrain.final_drive, powertrain.efficiency = [1.0], 1.0, 1.0
+        return powertrain
+
+    @property
+    def top_gear(self):
+        return len(self.ratios) - 1
+
+    def rpm(self, velocity, gear):
+        return velocity / self.tire_radius * self.ratios[gear] * self.final_drive * 60.0 / (2 * math.pi)
+
+    def wheel_torque(self, engine_torque, gear):
+        return engine_torque * self.ratios[gear] * self.final_drive * self.efficiency
+
+    def gear_for(self, velocity):
+        """Lowest gear that keeps the engine below shift_up_rpm at this speed."""
+        for gear in range(self.top_gear + 1):
+            if self.rpm(velocity, gear) < self.shift_up_rpm:
+                return gear
+        return self.top_gear
+
+    def shift(self, velocity, gear):
+        """Gear for the next fixed step: one up past shift_up_rpm, one down below shift_down_rpm."""
+        if gear is None:
+            return self.gear_for(velocity)
+        if gear < self.top_gear and self.rpm(velocity, gear) > self.shift_up_rpm:
+            return gear + 1
+        if gear > 0 and self.rpm(velocity, gear) < self.shift_down_rpm:
+            return gear - 1
+        return gear
+
+
+class EventIntegrator:
+    """Adaptive-step integration of a Car that stops only at discontinuities.
+
+    solve_ivp runs with its own step control between events; event functions
+    locate gear-shift points, the car stopping under brake, and the car
+    crossing into another road segment. At each event the discrete state
+    (gear, surface, stopped) is updated and integration restarts from the
+    event time, so no step ever straddles a jump in the right-hand side.
+    Acceleration is evaluated from the equations of motion at each output
+    point, not differenced from velocities.
+    """
+
+    def __init__(self, car=None, powertrain=None, engine_torque=vehicle_parameters["max_torque"], slip_angle=0.05,
+                 method="RK45", rtol=1e-6, atol=1e-8, max_step=np.inf):
+        self.car = car if car is not None else Car()
+        self.powertrain = powertrain if powertrain is not None else Powertrain.direct()
+        self.engine_torque = engine_torque
+        self.slip_angle = slip_angle
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        self.gear = None
+        self.stopped = False
+
+    def _segment(self, position):
+        surface = self.car.surface
+        s = position % surface.length if surface.periodic else position
+        return min(int(np.searchsorted(surface.ends, s, side="right")), len(surface.ends) - 1)
+
+    def _next_boundary(self, position, segment):
+        """Arc length at which the car leaves `segment`, or None on a uniform surface."""
+        surface = self.car.surface
+        end = surface.ends[segment]
+        if not np.isfinite(end) or (not surface.periodic and segment == len(surface.ends) - 1):
+            return None  # the surface past the end of a non-periodic map stays that of the last segment
+        if surface.periodic:
+            end += math.floor(position / surface.length) * surface.length
+            while end <= position:
+                end += surface.length
+        return end
+
+    def _surface(self, segment):
+        table = self.car.surface
+        return table.rolling_coefficients[segment], table.frictions[segment]
+
+    def _held(self, y, surface):
+        """True when the car is at rest with the brakes holding it against the drive force."""
+        torque = self.powertrain.wheel_torque(self.engine_torque, self.gear)
+        return self.car.derivatives_on_surface(y, 0.0, torque, self.car.steering_angle, *surface)[VELOCITY] <= 0.0
+
+    def _events(self, segment, position):
+        powertrain, gear = self.powertrain, self.gear
+        events = []
+        if gear < powertrain.top_gear:
+            shift_up = lambda t, y: powertrain.rpm(y[VELOCITY], gear) - powertrain.shift_up_rpm
+            events.append(("shift_up", shift_up, 1))
+        if gear > 0:
+            shift_down = lambda t, y: powertrain.rpm(y[VELOCITY], gear) - powertrain.shift_down_rpm
+            events.append(("shift_down", shift_down, -1))
+        if self.car.brake > 0:
+            events.append(("stop", lambda t, y: y[VELOCITY] - STOP_SPEED, -1))
+        boundary = self._next_boundary(position, segment)
+        if boundary is not None:
+            events.append(("surface", lambda t, y: y[0] - boundary, 1))
+        functions = []
+        for kind, function, direction in events:
+            function.terminal = True
+            function.direction = direction
+            functions.append(function)
+        return [kind for kind, _, _ in events], functions
+
+    def run(self, state, duration, dt=0.05, t0=0.0):
+        """Integrate from state for `duration` seconds with the car's current controls.
+
+        Outputs are sampled every dt (the solver's own steps are independent
+        of it). The gear carries over between calls, so a maneuver can be
+        run as consecutive control phases.
+        """
+        y = np.array(self.car.state_vector(state) if isinstance(state, CarState) else state, dtype=float)
+        t_end = t0 + duration
+        t_out = t0 + dt * np.arange(1, int(round(duration / dt)) + 1)
+        if self.gear is None:
+            self.gear = self.powertrain.gear_for(y[VELOCITY])
+        segment = self._segment(y[0])
+        ts, ys, accelerations, gears, events = [], [], [], [], []
+        nfev = intervals = 0
+        t = t0
+        while t < t_end:
+            surface = self._surface(segment)
+            if self.stopped and self._held(y, surface):
+                # held at rest until the controls change: nothing to integrate
+                remaining = t_out[t_out > t]
+                ts.append(remaining)
+                ys.append(np.tile(y, (len(remaining), 1)))
+                accelerations.append(np.zeros(len(remaining)))
+                gears.append(np.full(len(remaining), self.gear))
+                break
+            self.stopped = False
+            kinds, functions = self._events(segment, y[0])
+            torque = self.powertrain.wheel_torque(self.engine_torque, self.gear)
+            args = (torque, self.car.steering_angle, *surface)
+            fun = lambda t, y: self.car.derivatives_on_surface(y, t, *args)
+            window = t_out[(t_out > t) & (t_out <= t_end)]
+            sol = solve_ivp(fun, (t, t_end), y, method=self.method, t_eval=window, events=functions,
+                            rtol=self.rtol, atol=self.atol, max_step=self.max_step)
+            if not sol.success:
+                raise RuntimeError("integration failed at t={:.3f}: {}".format(t, sol.message))
+            nfev += sol.nfev
+            intervals += 1
+            if len(sol.t):
+                ts.append(sol.t)
+                ys.append(sol.y.T)
+                accelerations.append(np.array([fun(ti, yi)[VELOCITY] for ti, yi in zip(sol.t, sol.y.T)]))
+                gears.append(np.full(len(sol.t), self.gear))
+            if sol.status != 1:  # reached t_end
+                y = sol.y[:, -1] if len(sol.t) else y
+                t = t_end
+                break
+            k = next(i for i, hits in enumerate(sol.t_events) if len(hits))
+            t, y = sol.t_events[k][0], sol.y_events[k][0].copy()
+            kind = kinds[k]
+            if kind == "shift_up":
+                self.gear += 1
+                detail = self.gear
+            elif kind == "shift_down":
+                self.gear -= 1
+                detail = self.gear
+            elif kind == "stop":
+                y[VELOCITY] = 0.0
+                y[3:4] = y[5:] = 0.0  # no lateral sliding (or yaw) at rest either
+                self.stopped = True
+                detail = None
+            else:
+                segment = (segment + 1) % len(self.car.surface.ends)
+                detail = segment
+            events.append(Event(t, kind, detail))
+        if not ts:
+            empty = np.zeros(0)
+            return AdaptiveResult(empty, np.zeros((0, len(y))), empty, empty.astype(int), events, nfev, intervals)
+        return AdaptiveResult(np.concatenate(ts), np.vstack(ys), np.concatenate(accelerations),
+                              np.concatenate(gears).astype(int), events, nfev, intervals)
+
+
+def run_maneuver(integrator, phases, dt=0.05):
+    """Run (duration, throttle, brake, steering) phases back to back; returns one merged AdaptiveResult."""
+    state = CarState()
+    t, results = 0.0, []
+    for duration, throttle, brake, steering in phases:
+        integrator.car.throttle, integrator.car.brake, integrator.car.steering_angle = throttle, brake, steering
+        result = integrator.run(state, duration, dt, t)
+        results.append(result)
+        t += duration
+        if len(result.t):
+            state = result.y[-1]
+    return AdaptiveResult(np.concatenate([r.t for r in results]), np.vstack([r.y for r in results]),
+                          np.concatenate([r.acceleration for r in results]), np.concatenate([r.gear for r in results]),
+                          [e for r in results for e in r.events], sum(r.nfev for r in results),
+                          sum(r.intervals for r in results))
+
+
+def fixed_step_maneuver(car, powertrain, phases, engine_torque=vehicle_parameters["max_torque"], slip_angle=0.05, Dt=0.05):
+    """The same maneuver with one odeint call per Dt and gears picked at step starts, for comparison.
+
+    Returns (t, y, nfev).
+    """
+    from scipy.integrate import odeint
+    y = np.zeros(5)
+    gear = powertrain.gear_for(0.0)
+    ts, ys, nfev, t = [], [], 0, 0.0
+    for duration, throttle, brake, steering in phases:
+        car.throttle, car.brake, car.steering_angle = throttle, brake, steering
+        for _ in range(int(round(duration / Dt))):
+            t += Dt
+            ts.append(t)
+            gear = powertrain.shift(y[VELOCITY], gear)
+            torque = powertrain.wheel_torque(engine_torque, gear)
+            y, info = odeint(car.equations_of_motion, y, [0, Dt], args=(torque, car.steering_angle, slip_angle),
+                             full_output=True)
+            y = y[1]
+            nfev += int(info["nfe"][-1])
+            ys.append(y)
+    return np.array(ts), np.array(ys), nfev
+
+
+# Accelerate through the gears, coast, then brake to a standstill
+DEFAULT_PHASES = [
+    (30.0, 1.0, 0.0, 0.0),
+    (10.0, 0.0, 0.0, 0.0),
+    (50.0, 0.0, 1.0, 0.0),
+]
+
+
+if __name__ == "__main__":
+    import argparse
+    from constants import ROAD_TYPES
+    from road_map import RoadMap
+
+    parser = argparse.ArgumentParser(description="Event-driven adaptive integration vs fixed odeint steps.")
+    parser.add_argument("--dt", type=float, default=0.05, help="output / fixed step in seconds")
+    parser.add_argument("--segment-length", type=float, default=250.0, help="road segment length in metres")
+    args = parser.parse_args()
+
+    surface = RoadMap.straight(ROAD_TYPES, args.segment_length)
+    start = time.perf_counter()
+    result = run_maneuver(EventIntegrator(Car(surface), Powertrain()), DEFAULT_PHASES, args.dt)
+    adaptive_wall = time.perf_counter() - start
+    reference = run_maneuver(EventIntegrator(Car(surface), Powertrain(), rtol=1e-10, atol=1e-12), DEFAULT_PHASES, args.dt)
+    start = time.perf_counter()
+    t_fixed, y_fixed, fixed_nfev = fixed_step_maneuver(Car(surface), Powertrain(), DEFAULT_PHASES, Dt=args.dt)
+    fixed_wall = time.perf_counter() - start
+
+    counts = {}
+    for event in result.events:
+        counts[event.kind] = counts.get(event.kind, 0) + 1
+    print("events: " + ", ".join("{} {}".format(n, kind) for kind, n in counts.items()))
+    print("{:<10} {:>8} {:>10} {:>12}".format("mode", "nfev", "wall ms", "max |dx| m"))
+    print("{:<10} {:>8} {:>10.1f} {:>12.2e}".format("adaptive", result.nfev, adaptive_wall * 1e3,
+                                                   np.max(np.abs(result.y[:, 0] - reference.y[:, 0]))))
+    print("{:<10} {:>8} {:>10.1f} {:>12.2e}".format("fixed", fixed_nfev, fixed_wall * 1e3,
+                                                   np.max(np.abs(y_fixed[:, 0] - reference.y[:, 0]))))
+    print("final: x={:.1f} m, v={:.2f} m/s, gear {}".format(result.y[-1, 0], result.y[-1, 1], result.gear[-1] + 1))
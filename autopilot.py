@@ -0,0 +1,344 @@
+"""Closed-loop lane keeping from detected lane lines, and a headless evaluation harness.
+
+    python autopilot.py                                  # both controllers over assets/city
+    python autopilot.py --controllers pursuit --control-hz 10 --offsets -1 0 1
+    python autopilot.py --out autopilot.json             # also write every run as JSON
+
+Each run renders the car's camera view from its pose, detects the lane,
+steers at the control rate and integrates the physics at its own step.
+Tracking error is the true distance from the lane centre; latency is the
+wall time of one control cycle (render, detection, control law).
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from bicycle import ENGINES, make_car
+from dynamics import CarState
+from lane_detection import LaneDetectionStage, ROI_MARGIN, roi_rows
+from physics_loop import PhysicsLoop
+from profiler import PROFILER
+from Road import Road
+from vehicle_params import vehicle_parameters
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CITY_ASSETS = os.path.join(HERE, "assets", "city")
+PIXELS_PER_METER = 10.0  # the bundled road images then have about 6.5 m between the outer lane lines
+MAX_LANE_SLOPE = 0.5  # steeper lines in the car's view are cross streets, not its lane
+BOUNDARY_GAP = 8  # pixels; detected segments closer than this at the car's column are one painted line
+LANE_WIDTH_TOLERANCE = 0.25  # a boundary pair must be this close to the reference lane width
+PAINT_LEVEL = 170  # grey level above which a pixel is lane paint; asphalt and crossings are darker
+VIEW_SIZE = (800, 600)  # road images are scaled to the size the detector's ROI is tuned for
+
+# offset is the lane centre's lateral position in the car frame (m, positive on the
+# positive-steering side), heading the lane direction relative to the car (rad)
+LaneObservation = namedtuple("LaneObservation", "offset heading lane_center slope")
+RunResult = namedtuple("RunResult", "image controller initial_offset initial_heading rms_error max_error final_error "
+                                    "misses cycles latency_p50 latency_p99 period")
+
+
+class LaneCamera:
+    """Car-fixed top-down view of a road image, rendered from the car's pose.
+
+    The image is the world at pixels_per_meter with the road along x, and
+    repeats along x. The view is rotated and shifted so the car sits at
+    `anchor` heading along +x. The anchor row is the lane centre detected in
+    the unshifted image, so a car on the reference line, heading straight,
+    sees the image as stored; lateral_position is measured from that line.
+
+    Hough segments only place a painted line to within a few pixels (its
+    rho and theta bins, and several segments per line), which is tenths of
+    a metre here, so each boundary is refined to the centre of its paint
+    before it is used.
+    """
+
+    def __init__(self, image, road=None, stage=None, pixels_per_meter=PIXELS_PER_METER, x0=0.0):
+        self.image = np.ascontiguousarray(image)
+        self.road = road if road is not None else Road()
+        self.stage = stage if stage is not None else LaneDetectionStage()
+        self.pixels_per_meter = pixels_per_meter
+        self.x0 = x0  # image column of position 0
+        height, width = self.image.shape[:2]
+        self.view = np.zeros_like(self.image)
+        # only the rows the detector reads are rendered
+        top, bottom = roi_rows(height)
+        self.rows = (max(top - ROI_MARGIN, 0), min(bottom + 1 + ROI_MARGIN, height))
+        self._band = self.view[self.rows[0]:self.rows[1]]
+        self._matrix = np.zeros((2, 3))
+        # reference lane: the outermost boundaries found in the unshifted image
+        self.anchor = (width / 2, 0.0)
+        boundaries = self._boundaries(self.stage.process(self.image, draw=False)[0])
+        if len(boundaries) < 2:
+            raise ValueError("no lane found in the road image")
+        (top_row, _), (bottom_row, _) = self._refine(*boundaries[0]), self._refine(*boundaries[-1])
+        self.lane_width = bottom_row - top_row  # pixels
+        self.anchor = (width / 2, (top_row + bottom_row) / 2)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError("cannot read road image {}".format(path))
+        if image.shape[1::-1] != VIEW_SIZE:
+            image = cv2.resize(image, VIEW_SIZE)
+        return cls(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), **kwargs)
+
+    def render(self, position, lateral_position, orientation):
+        """The view from a pose; a reused buffer, valid until the next call, drawn only in the ROI rows."""
+        cos, sin = math.cos(orientation), math.sin(orientation)
+        cx = self.x0 + self.anchor[0] + position * self.pixels_per_meter
+        cy = self.anchor[1] + lateral_position * self.pixels_per_meter
+        m = self._matrix  # world pixel -> view pixel: rotate by -orientation about the car, car to the anchor
+        m[0, 0], m[0, 1], m[1, 0], m[1, 1] = cos, sin, -sin, cos
+        m[0, 2] = self.anchor[0] - (cos * cx + sin * cy)
+        m[1, 2] = self.anchor[1] - (-sin * cx + cos * cy) - self.rows[0]
+        cv2.warpAffine(self.image, m, self._band.shape[1::-1], dst=self._band, flags=cv2.INTER_LINEAR,
+                       borderMode=cv2.BORDER_WRAP)
+        return self.view
+
+    def _boundaries(self, lines):
+        """(row at the car's column, line) per lane boundary, top to bottom.
+
+        Hough returns several segments per painted line; segments whose rows
+        at the car's column are within BOUNDARY_GAP pixels are one boundary,
+        represented by its longest segment. Steep segments are dropped.
+        """
+        if lines is None:
+            return []
+        x1, y1, x2, y2 = lines.reshape(-1, 4).astype(np.float64).T
+        dx, dy = x2 - x1, y2 - y1
+        keep = np.abs(dy) <= MAX_LANE_SLOPE * np.abs(dx)
+        if not keep.any():
+            return []
+        lines, x1, y1, dx, dy = lines[keep], x1[keep], y1[keep], dx[keep], dy[keep]
+        rows = y1 + dy / dx * (self.anchor[0] - x1)
+        lengths = np.hypot(dx, dy)
+        order = np.argsort(rows)
+        boundaries, cluster = [], [order[0]]
+        for i in order[1:]:
+            if rows[i] - rows[cluster[-1]] > BOUNDARY_GAP:
+                boundaries.append(cluster)
+                cluster = []
+            cluster.append(i)
+        boundaries.append(cluster)
+        result = []
+        for cluster in boundaries:
+            longest = cluster[int(np.argmax(lengths[cluster]))]
+            result.append((rows[longest], lines[longest]))
+        return result
+
+    def _refine(self, row, line, passes=2):
+        """(row at the car's column, slope) of a boundary, fitted to its paint in the frame last processed.
+
+        In each column along the segment, the paint within BOUNDARY_GAP rows
+        of the current estimate is reduced to its brightness-weighted centre
+        row, and a line is fitted through those centres. Columns without
+        paint (gaps in a dashed line) are skipped. The second pass starts
+        from the first pass's fit, which corrects the Hough slope.
+        """
+        stage = self.stage
+        x1, y1, x2, y2 = line.reshape(4).astype(np.float64)
+        slope = (y2 - y1) / (x2 - x1)
+        columns = np.arange(int(min(x1, x2)), int(max(x1, x2)) + 1)
+        dx = columns - self.anchor[0]
+        window = np.arange(-BOUNDARY_GAP, BOUNDARY_GAP + 1)
+        for _ in range(passes):
+            rows = np.rint(row + slope * dx).astype(np.intp)[:, None] + window - stage.band[0]
+            rows = np.clip(rows, 0, stage.gray.shape[0] - 1)
+            weights = np.clip(stage.gray[rows, columns[:, None]].astype(np.float64) - PAINT_LEVEL, 0.0, None)
+            total = weights.sum(axis=1)
+            painted = total > 0
+            if np.count_nonzero(painted) < 2:
+                break
+            centres = (weights * rows).sum(axis=1)[painted] / total[painted] + stage.band[0]
+            slope, row = np.polyfit(dx[painted], centres, 1)
+        return float(row), float(slope)
+
+    def measure(self, frame):
+        """LaneObservation from a view, or None without a pair of boundaries one lane width apart.
+
+        Of the pairs about one lane width apart, the one the car is in (centre
+        nearest the anchor) is the lane; other pairs are kerbs and markings.
+        """
+        boundaries = self._boundaries(self.stage.process(frame, draw=False)[0])
+        best = None
+        for i in range(len(boundaries)):
+            for j in range(i + 1, len(boundaries)):
+                (top, top_line), (bottom, bottom_line) = boundaries[i], boundaries[j]
+                if abs(bottom - top - self.lane_width) > LANE_WIDTH_TOLERANCE * self.lane_width:
+                    continue
+                distance = abs((top + bottom) / 2 - self.anchor[1])
+                if best is None or distance < best[0]:
+                    best = (distance, (top, top_line), (bottom, bottom_line))
+        if best is None:
+            return None
+        (top, top_slope), (bottom, bottom_slope) = self._refine(*best[1]), self._refine(*best[2])
+        row, slope = (top + bottom) / 2, (top_slope + bottom_slope) / 2  # lane centre at the car's column
+        return LaneObservation((row - self.anchor[1]) / self.pixels_per_meter, math.atan(slope), (self.anchor[0], row), slope)
+
+
+class PIDLaneController:
+    """PID on the lane offset plus a proportional term on the heading error."""
+
+    def __init__(self, kp=0.1, ki=0.01, kd=0.05, k_heading=1.0, integral_limit=2.0):
+        self.kp, self.ki, self.kd, self.k_heading = kp, ki, kd, k_heading
+        self.integral_limit = integral_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous = None
+
+    def steer(self, offset, heading, velocity, dt):
+        self.integral = max(-self.integral_limit, min(self.integral + offset * dt, self.integral_limit))
+        derivative = 0.0 if self.previous is None else (offset - self.previous) / dt
+        self.previous = offset
+        return self.kp * offset + self.ki * self.integral + self.kd * derivative + self.k_heading * heading
+
+
+class PurePursuitController:
+    """Steers onto the arc through the lane centre one lookahead distance ahead.
+
+    The lookahead grows with speed (lookahead_time) from min_lookahead.
+    """
+
+    def __init__(self, lookahead_time=1.0, min_lookahead=5.0, wheelbase=vehicle_parameters["wheelbase"]):
+        self.lookahead_time = lookahead_time
+        self.min_lookahead = min_lookahead
+        self.wheelbase = wheelbase
+
+    def reset(self):
+        pass
+
+    def steer(self, offset, heading, velocity, dt):
+        lookahead = max(self.min_lookahead, self.lookahead_time * velocity)
+        alpha = math.atan2(offset + lookahead * math.tan(heading), lookahead)
+        return math.atan2(2.0 * self.wheelbase * math.sin(alpha), lookahead)
+
+
+CONTROLLERS = {"pid": PIDLaneController, "pursuit": PurePursuitController}
+
+
+class Autopilot:
+    """Camera, lane detection and controller, run as a PhysicsLoop subscriber at control_hz.
+
+    Commands go to `controls`, anything with throttle, brake and
+    steering_angle: the Car itself headless, or the controls ECU in
+    sim.Simulation so they travel over the CAN network. The control rate is
+    rounded to a whole number of physics steps; `period` is the one in use.
+    Without a lane in view the last steering is held and the miss counted.
+    Speed is held at target_speed by a PI loop on throttle and brake.
+    """
+
+    def __init__(self, camera, controller, controls, target_speed=10.0, control_hz=20.0, speed_gains=(0.5, 0.1)):
+        self.camera = camera
+        self.controller = controller
+        self.controls = controls
+        self.target_speed = target_speed
+        self.control_hz = control_hz
+        self.speed_gains = speed_gains
+        self.period = None
+        self.speed_integral = 0.0
+        self.observation = None
+        self.misses = 0
+        self.cycles = 0
+        self.latencies = []
+
+    def attach(self, physics):
+        every = max(1, int(round(1.0 / (self.control_hz * physics.Dt))))
+        self.period = every * physics.Dt
+        physics.add_subscriber(self.update, every)
+        return self
+
+    def update(self, physics):
+        start = time.perf_counter()
+        with PROFILER.scope("autopilot"):
+            state = physics.current_state
+            frame = self.camera.render(state.position, state.lateral_position, state.orientation)
+            self.observation = observation = self.camera.measure(frame)
+            if observation is None:
+                self.misses += 1
+            else:
+                self.controls.steering_angle = self.controller.steer(observation.offset, observation.heading,
+                                                                     state.velocity, self.period)
+            kp, ki = self.speed_gains
+            error = self.target_speed - state.velocity
+            self.speed_integral = max(-1.0 / ki, min(self.speed_integral + error * self.period, 1.0 / ki))
+            command = kp * error + ki * self.speed_integral
+            self.controls.throttle = max(command, 0.0)
+            self.controls.brake = max(-command, 0.0)
+        self.cycles += 1
+        self.latencies.append(time.perf_counter() - start)
+
+
+def evaluate(camera, controller, offset=0.0, heading=0.0, duration=20.0, Dt=0.01, control_hz=20.0, speed=10.0, image="",
+             engine="kinematic"):
+    """One closed-loop run from a lateral offset (m) and heading (rad) off the lane centre."""
+    car = make_car(engine)
+    physics = PhysicsLoop(car, CarState(velocity=speed, lateral_position=offset, orientation=heading), Dt=Dt)
+    controller.reset()
+    autopilot = Autopilot(camera, controller, car, target_speed=speed, control_hz=control_hz).attach(physics)
+    physics.run(duration)
+    error = np.abs(physics.lateral_positions)
+    tail = physics.history.time_slice(duration - 1.0)["lateral_position"]
+    latencies = np.array(autopilot.latencies)
+    p50, p99 = np.percentile(latencies, (50, 99))
+    return RunResult(image, type(controller).__name__, offset, heading, float(np.sqrt(np.mean(error ** 2))),
+                     float(error.max()), float(np.abs(tail).mean()), autopilot.misses, autopilot.cycles,
+                     float(p50), float(p99), autopilot.period)
+
+
+def image_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith((".png", ".jpg")))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate lane-keeping controllers headless over road images and start offsets.")
+    parser.add_argument("images", nargs="*", default=[CITY_ASSETS], help="road images or directories of them")
+    parser.add_argument("--controllers", nargs="+", default=sorted(CONTROLLERS), choices=sorted(CONTROLLERS))
+    parser.add_argument("--offsets", nargs="+", type=float, default=[-1.5, -0.75, 0.0, 0.75, 1.5], help="start offsets, m")
+    parser.add_argument("--headings", nargs="+", type=float, default=[0.0, 0.05], help="start headings, rad")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--dt", type=float, default=0.01, help="physics step, s")
+    parser.add_argument("--control-hz", type=float, default=20.0, help="control rate, Hz")
+    parser.add_argument("--speed", type=float, default=10.0, help="target speed, m/s")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="kinematic", help="vehicle model")
+    parser.add_argument("--out", default=None, help="write every run to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for path in image_files(args.images):
+        camera = LaneCamera.load(path)
+        name = os.path.basename(path)
+        for controller in args.controllers:
+            for offset in args.offsets:
+                for heading in args.headings:
+                    r = evaluate(camera, CONTROLLERS[controller](), offset, heading, args.duration, args.dt,
+                                 args.control_hz, args.speed, name, args.engine)
+                    results.append(r)
+                    print("{:<22} {:<22} start {:+5.2f} m {:+5.2f} rad  rms {:5.2f} m  max {:5.2f} m  final {:5.2f} m  "
+                          "misses {:3d}/{:<4d} latency p50 {:5.2f} ms p99 {:5.2f} ms".format(
+                              name, r.controller, offset, heading, r.rms_error, r.max_error, r.final_error,
+                              r.misses, r.cycles, 1e3 * r.latency_p50, 1e3 * r.latency_p99))
+    for controller in sorted({r.controller for r in results}):
+        rows = [r for r in results if r.controller == controller]
+        print("{:<22} runs {:3d}  rms {:5.2f} m  worst max {:5.2f} m  worst final {:5.2f} m  "
+              "latency p99 {:5.2f} ms of a {:.0f} ms period".format(
+                  controller, len(rows), np.sqrt(np.mean([r.rms_error ** 2 for r in rows])), max(r.max_error for r in rows),
+                  max(r.final_error for r in rows), 1e3 * max(r.latency_p99 for r in rows), 1e3 * rows[0].period))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump([r._asdict() for r in results], f, indent=2)
+            f.write("\n")
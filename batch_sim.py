@@ -0,0 +1,197 @@
+import time
+import numpy as np
+from constants import RHO, G, F_BRAKE_MAX, V_HOLD
+from vehicle_params import vehicle_parameters
+from dynamics import Car, CarState
+from road_map import SurfaceTable
+
+# Column layout of the (N, 5) state array, same order as CarState.as_list()
+POSITION, VELOCITY, LATERAL_POSITION, LATERAL_VELOCITY, ORIENTATION = range(5)
+STATE_SIZE = 5
+
+# Largest absolute deviation from the single-car odeint path we accept
+ODEINT_TOLERANCE = 1e-3
+
+
+def _per_car(params, key, n):
+    """Collect one vehicle parameter into an (n,) float array."""
+    if isinstance(params, dict):
+        return np.full(n, float(params[key]))
+    if len(params) != n:
+        raise ValueError("expected {} parameter sets, got {}".format(n, len(params)))
+    return np.array([float(p[key]) for p in params])
+
+
+class BatchCar:
+    """N cars driven by the dynamics of dynamics.Car, stored as one (N, 5) array.
+
+    params is either a single vehicle_parameters style dict shared by every
+    car or a list with one dict per car, so parameter sweeps run in one batch.
+    surface is a SurfaceTable or RoadMap; every derivative evaluation looks up
+    the rolling coefficient and friction under all cars in one array query.
+    """
+
+    def __init__(self, n, params=None, engine_torque=320, slip_angle=0.05, surface=None):
+        if params is None:
+            params = vehicle_parameters
+        self.n = n
+        self.mass = _per_car(params, "mass", n)
+        self.drag_coefficient = _per_car(params, "drag_coefficient", n)
+        self.frontal_area = _per_car(params, "frontal_area", n)
+        self.tire_radius = _per_car(params, "tire_radius", n)
+        self.cornering_stiffness = _per_car(params, "tire_cornering_stiffness", n)
+        self.wheelbase = _per_car(params, "wheelbase", n)
+        self.max_steering_angle = np.pi / 6
+        self.max_acceptable_acceleration = 50.0
+        self.slip_angle = slip_angle
+
+        if surface is None:
+            surface = SurfaceTable.uniform()
+        elif not isinstance(surface, SurfaceTable):
+            surface = surface.surface_table()
+        self.surface = surface
+
+        # Terms that do not depend on the state are folded once here
+        self._drag_factor = 0.5 * RHO * self.frontal_area * self.drag_coefficient
+        self._weight = self.mass * G
+
+        self.states = np.zeros((n, STATE_SIZE))
+        self.engine_torque = np.full(n, float(engine_torque))
+        self._throttle = np.ones(n)
+        self._brake = np.zeros(n)
+        self._steering_angle = np.zeros(n)
+
+    @classmethod
+    def from_states(cls, states, params=None, **kwargs):
+        batch = cls(len(states), params, **kwargs)
+        batch.states[:] = [s.as_list() for s in states]
+        return batch
+
+    def car_state(self, i) -> CarState:
+        return CarState(*self.states[i])
+
+    @property
+    def throttle(self):
+        return self._throttle
+    @throttle.setter
+    def throttle(self, value):
+        self._throttle = np.clip(np.broadcast_to(value, (self.n,)), 0, 1).astype(float)
+    @property
+    def brake(self):
+        return self._brake
+    @brake.setter
+    def brake(self, value):
+        self._brake = np.clip(np.broadcast_to(value, (self.n,)), 0, 1).astype(float)
+    @property
+    def steering_angle(self):
+        return self._steering_angle
+    @steering_angle.setter
+    def steering_angle(self, value):
+        self._steering_angle = np.clip(np.broadcast_to(value, (self.n,)),
+                                       -self.max_steering_angle, self.max_steering_angle).astype(float)
+
+    def longitudinal_forces(self, v, rolling_coefficient, grip):
+        """Return (F_engine, F_net) for every car; mirrors Car.longitudinal_forces."""
+        hold = np.clip(v / V_HOLD, -1.0, 1.0)  # brake and rolling resistance fade out towards v = 0
+        F_net_without_engine_brake = -self._drag_factor * v ** 2 - self._weight * rolling_coefficient * hold
+        a = F_net_without_engine_brake / self.mass
+
+        # Traction control, vectorised form of Car.traction_control
+        over = a > self.max_acceptable_acceleration
+        engine_max_torque = np.where(over, self.engine_torque * self.max_acceptable_acceleration / np.where(over, a, 1.0),
+                                     self.engine_torque)
+        engine_max_torque = np.minimum(engine_max_torque, grip * self.tire_radius)
+        F_engine = self._throttle * engine_max_torque / self.tire_radius
+        F_brake = np.minimum(self._brake * F_BRAKE_MAX, grip) * hold
+        return F_engine, F_engine + F_net_without_engine_brake - F_brake
+
+    def longitudinal_dynamics(self, v, rolling_coefficient, grip):
+        return self.longitudinal_forces(v, rolling_coefficient, grip)[1] / self.mass
+
+    def engine_force(self):
+        """Tractive force of every car at its current state, the load the battery pack supplies."""
+        rolling_coefficient, friction = self.surface.lookup(self.states[:, POSITION])
+        return self.longitudinal_forces(self.states[:, VELOCITY], rolling_coefficient, friction * self._weight)[0]
+
+    def lateral_dynamics(self, slip_angle, grip):
+        return np.clip(-self.cornering_stiffness * slip_angle, -grip, grip) / self.mass
+
+    def equations_of_motion(self, states, out=None):
+        """Return d(state)/dt for every car as an (N, 5) array."""
+        if out is None:
+            out = np.empty_like(states)
+        velocity = states[:, VELOCITY]
+        orientation = states[:, ORIENTATION]
+        adjust_slip_angle = np.arctan2(states[:, LATERAL_VELOCITY], velocity) + self._steering_angle
+        rolling_coefficient, friction = self.surface.lookup(states[:, POSITION])
+        grip = friction * self._weight  # largest tyre force the surface supports
+
+        out[:, POSITION] = velocity * np.cos(orientation)
+        out[:, VELOCITY] = self.longitudinal_dynamics(velocity, rolling_coefficient, grip)
+        out[:, LATERAL_POSITION] = velocity * np.sin(orientation)
+        out[:, LATERAL_VELOCITY] = self.lateral_dynamics(adjust_slip_angle, grip)
+        out[:, ORIENTATION] = velocity * np.sin(self._steering_angle) / self.wheelbase
+        return out
+
+    def step(self, Dt, substeps=1):
+        """Advance every car by Dt with classic fixed-step RK4.
+
+        The lateral slip term gets stiff at very low speed while steering, so
+        use substeps to shrink the internal step when starting from rest.
+        """
+        h = Dt / substeps
+        y = self.states
+        k1, k2, k3, k4 = (np.empty_like(y) for _ in range(4))
+        for _ in range(substeps):
+            self.equations_of_motion(y, k1)
+            self.equations_of_motion(y + 0.5 * h * k1, k2)
+            self.equations_of_motion(y + 0.5 * h * k2, k3)
+            self.equations_of_motion(y + h * k3, k4)
+            y = y + (h / 6.0) * (k1 + 2 * k2 + 2 * k3 + k4)
+        self.states = y
+        return y
+
+
+def compare_with_odeint(steps=100, Dt=0.05, steering_angle=0.05, initial_velocity=10.0, surface=None):
+    """Run one car through BatchCar and through Car.get_next_state and return the max deviation."""
+    car = Car(surface)
+    car.steering_angle = steering_angle
+    state = CarState(velocity=initial_velocity)
+    batch = BatchCar.from_states([state], surface=car.surface)
+    batch.steering_angle = car.steering_angle
+    batch.throttle = car.throttle
+    batch.brake = car.brake
+    deviation = 0.0
+    for _ in range(steps):
+        state = car.get_next_state(state, Dt, batch.engine_torque[0], batch.slip_angle, car.steering_angle)
+        batch.step(Dt)
+        deviation = max(deviation, np.max(np.abs(batch.states[0] - state.as_list())))
+    return deviation
+
+
+def throughput(sizes=(1, 10, 100, 1000, 10000), steps=200, Dt=0.05):
+    """Return car-steps per second of BatchCar.step for each batch size."""
+    results = {}
+    for n in sizes:
+        batch = BatchCar(n)
+        batch.states[:, VELOCITY] = np.linspace(1, 30, n)
+        batch.steering_angle = np.linspace(-0.1, 0.1, n)
+        start = time.perf_counter()
+        for _ in range(steps):
+            batch.step(Dt)
+        results[n] = n * steps / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    deviation = compare_with_odeint()
+    print("max deviation from odeint: {:.2e} (tolerance {:.0e})".format(deviation, ODEINT_TOLERANCE))
+    if deviation > ODEINT_TOLERANCE:
+        raise SystemExit("BatchCar diverged from the odeint reference")
+    from constants import ROAD_TYPES
+    from road_map import RoadMap
+    # fixed-step RK4 is only first order across a surface change, so this is reported, not gated
+    deviation = compare_with_odeint(steps=400, surface=RoadMap.straight(ROAD_TYPES, 100))
+    print("max deviation across surface changes: {:.2e}".format(deviation))
+    for n, rate in throughput().items():
+        print("N={:>6}: {:>12.0f} car-steps/s".format(n, rate))
@@ -0,0 +1,282 @@
+import math
+import numpy as np
+from vehicle_params import battery_parameters, vehicle_parameters
+
+AMBIENT_TEMPERATURE = 25.0  # C
+AUXILIARY_POWER = 300.0  # W drawn by everything that is not the drivetrain
+THERMAL_INTERVAL = 1.0  # s between cell temperature updates; cell thermal time constants are minutes
+FAULTS = ("over_voltage", "under_voltage", "over_temperature")
+
+
+class BatteryPack:
+    """Equivalent-circuit model of one series string of cells per vehicle, with BMS limits.
+
+    Every cell is an open-circuit voltage source (piecewise linear in its
+    state of charge) behind an ohmic resistance r0, which rises when the cell
+    is cold, and one RC polarization pair, with a lumped thermal mass. Cells
+    differ by a seeded spread in capacity and r0, so the weakest cell reaches
+    the limits first. Cell state is held as (cells, vehicles) arrays, so the
+    reductions over a string run along contiguous rows.
+
+    All cells of a string carry the same current, which keeps the per-cell
+    work out of most steps:
+
+    * the charge drawn since a reference point is one number per pack, and
+      each cell's SOC and OCV are exact affine functions of it until some
+      cell crosses a breakpoint of the OCV table; only those packs are
+      re-anchored when that happens;
+    * identical RC pairs share one polarization voltage;
+    * heat is accumulated per pack as the integrals of I^2 and I * v_rc and
+      applied to the cell temperatures, and from them to the resistances,
+      every thermal_interval seconds;
+    * the BMS current limit, set by the weakest cell reaching v_min, is
+      computed per cell only for packs whose conservative per-pack bound
+      says it may bind.
+
+    So step() is O(vehicles) apart from those occasional vectorized passes
+    over all the cells.
+    """
+
+    def __init__(self, n_vehicles=1, chemistry="lithium-ion", soc=0.9, temperature=AMBIENT_TEMPERATURE, seed=0,
+                 params=None, thermal_interval=THERMAL_INTERVAL):
+        p = battery_parameters[chemistry] if params is None else params
+        self.chemistry = chemistry
+        self.params = p
+        self.thermal_interval = thermal_interval
+        shape = (p["cells_in_series"], n_vehicles)
+        rng = np.random.default_rng(seed)
+        self.capacity = p["capacity_ah"] * 3600.0 * (1 + p["capacity_spread"] * rng.standard_normal(shape))  # coulomb
+        self.r0 = p["r0"] * (1 + p["resistance_spread"] * rng.standard_normal(shape))
+        self.temperature = np.full(shape, float(temperature))
+        self.v_rc = np.zeros(n_vehicles)  # polarization voltage of each cell
+        self.current = np.zeros(n_vehicles)  # A, positive when discharging
+        self.voltage = np.zeros(n_vehicles)  # pack terminal voltage, V
+        self.energy = np.zeros(n_vehicles)  # J delivered since creation
+        for name in FAULTS:
+            setattr(self, name, np.zeros(n_vehicles, bool))
+
+        self._ocv = np.asarray(p["ocv"], dtype=float)
+        self._segments = len(self._ocv) - 1
+        self._ocv_slope = np.append(np.diff(self._ocv), 0.0) * self._segments  # V per unit SOC
+        self._inverse_capacity = 1.0 / self.capacity
+        # r0 * (1 + k * (25 - T)) == r0_cold - r0_k * T
+        k = p["r0_temperature_coefficient"]
+        self._r0_cold = self.r0 * (1 + k * AMBIENT_TEMPERATURE)
+        self._r0_k = self.r0 * k
+        self._heat_capacity = p["cell_mass"] * p["specific_heat"]
+        self._decay_dt = None
+        self._decay = 1.0
+
+        # SOC/OCV anchors, refreshed per pack when a cell crosses a table breakpoint
+        self._soc_ref = np.full(shape, float(soc))
+        self._ocv_ref = np.empty(shape)
+        self._ocv_rate = np.empty(shape)  # d(OCV)/d(charge drawn) per cell
+        self._emf_ref = np.empty(n_vehicles)
+        self._emf_rate = np.empty(n_vehicles)
+        self._ocv_floor = np.empty(n_vehicles)  # lowest cell OCV at the anchor
+        self._rate_min = np.empty(n_vehicles)
+        self._rate_max = np.empty(n_vehicles)
+        self._charge = np.zeros(n_vehicles)  # coulomb drawn since the anchor
+        self._discharge_room = np.empty(n_vehicles)
+        self._charge_room = np.empty(n_vehicles)
+        self._anchor(slice(None))
+
+        # heat since the last temperature update
+        self._i2dt = np.zeros(n_vehicles)
+        self._ivdt = np.zeros(n_vehicles)
+        self._thermal_elapsed = 0.0
+        self._r = np.empty(shape)
+        self._heat = np.empty(shape)
+        self._update_resistance()
+
+    @property
+    def n_vehicles(self):
+        return self.temperature.shape[1]
+
+    @property
+    def n_cells(self):
+        return self.temperature.shape[0]
+
+    @property
+    def soc(self):
+        """Per-cell state of charge, (cells, vehicles)."""
+        return self._soc_ref - self._charge * self._inverse_capacity
+
+    def open_circuit_voltage(self, rows=slice(None)):
+        """Per-cell OCV of the given packs, (cells, vehicles)."""
+        return self._ocv_ref[:, rows] + self._ocv_rate[:, rows] * self._charge[rows]
+
+    def cell_voltage(self, rows=slice(None)):
+        """Per-cell terminal voltage at the last step's current."""
+        current = self.current[rows]
+        return self.open_circuit_voltage(rows) - self._r[:, rows] * current - self.v_rc[rows]
+
+    def _anchor(self, rows):
+        soc = self._soc_ref[:, rows] - self._charge[rows] * self._inverse_capacity[:, rows]
+        x = np.clip(soc, 0.0, 1.0) * self._segments
+        index = np.minimum(x.astype(np.intp), self._segments - 1)
+        ocv = self._ocv[index] + (soc * self._segments - index) * self._ocv_slope[index] / self._segments
+        rate = -self._ocv_slope[index] * self._inverse_capacity[:, rows]
+        # charge each cell can pass before leaving its table segment; the end segments extrapolate
+        lower = np.where(index > 0, index / self._segments, -np.inf)
+        upper = np.where(index < self._segments - 1, (index + 1) / self._segments, np.inf)
+        self._discharge_room[rows] = ((soc - lower) * self.capacity[:, rows]).min(axis=0)
+        self._charge_room[rows] = ((upper - soc) * self.capacity[:, rows]).min(axis=0)
+        self._soc_ref[:, rows] = soc
+        self._ocv_ref[:, rows] = ocv
+        self._ocv_rate[:, rows] = rate
+        self._emf_ref[rows] = ocv.sum(axis=0)
+        self._emf_rate[rows] = rate.sum(axis=0)
+        self._ocv_floor[rows] = ocv.min(axis=0)
+        self._rate_min[rows] = rate.min(axis=0)
+        self._rate_max[rows] = rate.max(axis=0)
+        self._charge[rows] = 0.0
+
+    def _update_resistance(self):
+        r = np.multiply(self._r0_k, self.temperature, out=self._r)
+        np.subtract(self._r0_cold, r, out=r)
+        self._resistance = r.sum(axis=0)
+        self._r_max = r.max(axis=0)
+
+    def _update_temperature(self):
+        """Apply the heat accumulated since the last update, as constant power over the interval."""
+        p = self.params
+        elapsed = self._thermal_elapsed
+        cooling = p["cooling"]
+        decay = math.exp(-cooling * elapsed / self._heat_capacity)
+        # T(elapsed) = Ta + (T - Ta) * decay + heat_power / cooling * (1 - decay)
+        gain = (1 - decay) / (cooling * elapsed)
+        heat = np.multiply(self._r, self._i2dt * gain, out=self._heat)
+        heat += self._ivdt * gain + AMBIENT_TEMPERATURE * (1 - decay)
+        self.temperature *= decay
+        self.temperature += heat
+        self.over_temperature |= self.temperature.max(axis=0) > p["t_max"]
+        self._i2dt[:] = 0.0
+        self._ivdt[:] = 0.0
+        self._thermal_elapsed = 0.0
+        self._update_resistance()
+
+    def _current_limit(self, rows):
+        """Current at which the weakest cell of each given pack reaches v_min."""
+        headroom = self.open_circuit_voltage(rows) - (self.params["v_min"] + self.v_rc[rows])
+        return np.maximum((headroom / self._r[:, rows]).min(axis=0), 0.0)
+
+    def step(self, power, dt):
+        """Deliver `power` W per vehicle for dt seconds; returns the power actually delivered.
+
+        Negative power charges the pack. Discharge is limited to what the pack
+        can supply and to the current at which its weakest cell reaches v_min.
+        """
+        p = self.params
+        power = np.broadcast_to(np.asarray(power, dtype=float), (self.n_vehicles,))
+        charge = self._charge
+        emf = self._emf_ref + self._emf_rate * charge - self.n_cells * self.v_rc
+        resistance = self._resistance
+        # power = I * (emf - I * R): the smaller root, capped at the matched load
+        discriminant = np.maximum(emf * emf - 4 * resistance * power, 0.0)
+        current = (emf - np.sqrt(discriminant)) / (2 * resistance)
+
+        # BMS: no cell may be pulled below v_min. The lowest OCV over a lower
+        # bound and the highest resistance give a current every pack can take.
+        ocv_floor = self._ocv_floor + charge * np.where(charge > 0, self._rate_min, self._rate_max)
+        safe = (ocv_floor - p["v_min"] - self.v_rc) / self._r_max
+        check = np.flatnonzero((current > 0) & (current > safe))
+        if len(check):
+            limit = self._current_limit(check)
+            limited = current[check] > limit
+            current[check] = np.minimum(current[check], limit)
+            self.under_voltage[check[limited]] = True
+
+        self.current = current
+        self.voltage = emf - current * resistance
+        delivered = current * self.voltage
+        charging = np.flatnonzero(current < 0)
+        if len(charging):  # only charging can push a cell over v_max
+            self.over_voltage[charging] |= self.cell_voltage(charging).max(axis=0) > p["v_max"]
+
+        if dt != self._decay_dt:
+            self._decay_dt, self._decay = dt, math.exp(-dt / (p["r1"] * p["c1"]))
+        self._i2dt += current * current * dt
+        self._ivdt += current * self.v_rc * dt
+        self.v_rc *= self._decay
+        self.v_rc += p["r1"] * (1 - self._decay) * current
+        charge += current * dt
+        self.energy += delivered * dt
+
+        self._thermal_elapsed += dt
+        if self._thermal_elapsed >= self.thermal_interval:
+            self._update_temperature()
+        crossed = (charge > self._discharge_room) | (-charge > self._charge_room)
+        if crossed.any():
+            self._anchor(np.flatnonzero(crossed))
+        return delivered
+
+    def summary(self, vehicle=0):
+        soc = self.soc[:, vehicle]
+        return {
+            "soc": float(soc.mean()),
+            "soc_min": float(soc.min()),
+            "voltage": float(self.voltage[vehicle]),
+            "current": float(self.current[vehicle]),
+            "temperature_max": float(self.temperature[:, vehicle].max()),
+            "energy_kwh": float(self.energy[vehicle] / 3.6e6),
+            "faults": [name for name in FAULTS if getattr(self, name)[vehicle]],
+        }
+
+
+def electrical_power(F_engine, velocity, efficiency=vehicle_parameters["engine_efficiency"]):
+    """Battery power for a tractive force at a speed; no regeneration, plus the auxiliary load."""
+    return np.maximum(F_engine * velocity, 0.0) / efficiency + AUXILIARY_POWER
+
+
+def battery_subscriber(pack, vehicle=0, every=1):
+    """PhysicsLoop subscriber drawing the traction power from one pack; register it with the same `every`."""
+    power = np.zeros(pack.n_vehicles)
+
+    def draw(loop):
+        car, state = loop.car, loop.current_state
+        # the torque at the wheels, through the loop's gearbox when it has one
+        gear = loop.gear if loop.gear is not None else loop.powertrain.gear_for(state.velocity)
+        torque = loop.powertrain.wheel_torque(loop.engine_torque, gear)
+        F_engine = car.longitudinal_forces(state.velocity, torque, *car.surface.at(state.position))[0]
+        power[vehicle] = electrical_power(F_engine, state.velocity)
+        pack.step(power, loop.Dt * every)
+    return draw
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from batch_sim import BatchCar, VELOCITY
+
+    parser = argparse.ArgumentParser(description="Battery pack coupled to BatchCar: per-step overhead and a long drive.")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=400)
+    parser.add_argument("--chemistry", default="lithium-ion", choices=sorted(battery_parameters))
+    args = parser.parse_args()
+
+    Dt = 0.05
+    batch = BatchCar(args.vehicles)
+    batch.states[:, VELOCITY] = np.linspace(5, 30, args.vehicles)
+    pack = BatteryPack(args.vehicles, args.chemistry)
+    pack.step(electrical_power(batch.engine_force(), batch.states[:, VELOCITY]), Dt)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        batch.step(Dt)
+    physics = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        batch.step(Dt)
+        pack.step(electrical_power(batch.engine_force(), batch.states[:, VELOCITY]), Dt)
+    coupled = time.perf_counter() - start
+    print("{} vehicles x {} cells: physics {:.3f} ms/step, with battery {:.3f} ms/step ({:+.0%})".format(
+        args.vehicles, pack.n_cells, 1e3 * physics / args.steps, 1e3 * coupled / args.steps, coupled / physics - 1))
+
+    # one car at full throttle until the BMS cuts the power or half an hour passes
+    from physics_loop import PhysicsLoop
+    loop = PhysicsLoop()
+    single = BatteryPack(1, args.chemistry)
+    loop.add_subscriber(battery_subscriber(single))
+    loop.run(duration=1800, should_stop=lambda: single.under_voltage[0])
+    print("after {:.0f} s: {}".format(loop.t, single.summary()))
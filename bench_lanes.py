@@ -0,0 +1,29 @@
+"""Lane detection throughput in frames per second on the bundled 800x600 city image."""
+import os
+import time
+import pygame
+from lane_detection import LaneDetectionStage
+
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "city", "4Wayroad800x600.png")
+
+
+def load_frame(path=ASSET, size=(800, 600)):
+    surface = pygame.image.load(path)
+    if surface.get_size() != size:
+        surface = pygame.transform.scale(surface, size)
+    return surface
+
+
+def frames_per_second(surface, draw=True, frames=200):
+    stage = LaneDetectionStage()
+    stage.process_surface(surface, draw)  # allocate buffers outside the timed loop
+    start = time.perf_counter()
+    for _ in range(frames):
+        stage.process_surface(surface, draw)
+    return frames / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    surface = load_frame()
+    print("800x600 with overlay:    {:7.1f} fps".format(frames_per_second(surface, draw=True)))
+    print("800x600 lines only:      {:7.1f} fps".format(frames_per_second(surface, draw=False)))
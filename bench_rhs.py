@@ -0,0 +1,38 @@
+"""Microbenchmark: right-hand-side evaluations per second, old vs fast path."""
+import time
+import numpy as np
+import car_model
+import fast_rhs
+from dynamics import Car
+
+
+def evaluations_per_second(rhs, args, n=20000):
+    state = np.array([10.0, 12.0, 0.5, 0.2, 0.1])
+    start = time.perf_counter()
+    for _ in range(n):
+        rhs(state, 0.0, *args)
+    return n / (time.perf_counter() - start)
+
+
+def run(n=20000):
+    p = fast_rhs.pack_parameters()
+    cases = {
+        "dynamics.Car.equations_of_motion": (Car().equations_of_motion, (320, 0.1, 0.05)),
+        "fast_rhs.equations_of_motion": (fast_rhs.make_rhs("sim"), (320, 0.1, 0.05, p.tolist())),
+        "car_model.Car.equations_of_motion": (car_model.Car().equations_of_motion, (320, 0, 0.1, 0.05)),
+        "fast_rhs.car_model_equations_of_motion": (fast_rhs.make_rhs("car_model"), (320, 0, 0.1, 0.05, p.tolist())),
+    }
+    if fast_rhs.numba_available():
+        cases["fast_rhs.equations_of_motion (numba)"] = (fast_rhs.make_rhs("sim", use_numba=True), (320, 0.1, 0.05, p))
+    results = {}
+    for name, (rhs, args) in cases.items():
+        rhs(np.zeros(5), 0.0, *args)  # warm up, triggers numba compilation
+        results[name] = evaluations_per_second(rhs, args, n)
+    return results
+
+
+if __name__ == "__main__":
+    worst = fast_rhs.check_equivalence()
+    print("equivalence: ok (max abs difference {:.1e})".format(worst))
+    for name, rate in run().items():
+        print("{:<42} {:>12,.0f} evals/s".format(name, rate))
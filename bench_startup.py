@@ -0,0 +1,65 @@
+"""Startup time: `import sim` and time to the first physics step, each in a fresh interpreter.
+
+Exits non-zero when a measurement exceeds its budget or when a heavy backend
+(TensorFlow, OpenCV) gets imported just to step the physics.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Seconds; generous for a cold cache, far below the multi-second TensorFlow import
+BUDGETS = {"import sim": 2.0, "first step": 1.5}
+HEAVY_MODULES = ("tensorflow", "torch", "cv2", "numba")
+
+PROBES = {
+    "import sim": "import sim",
+    "first step": "from physics_loop import PhysicsLoop\nfrom Road import Road\nPhysicsLoop().step()\nRoad().get_road_properties(0)",
+}
+
+PROBE_TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(code, repeat=3):
+    """Best-of-`repeat` wall time for running `code` in a new interpreter, plus heavy modules it loaded."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE_TEMPLATE.format(code=code, heavy=HEAVY_MODULES)],
+                             cwd=here, env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def run(repeat=3, budgets=BUDGETS):
+    """Return {probe: result} and a list of failure messages."""
+    results, failures = {}, []
+    for name, code in PROBES.items():
+        result = results[name] = measure(code, repeat)
+        if result["seconds"] > budgets[name]:
+            failures.append("{}: {:.3f}s over budget {:.3f}s".format(name, result["seconds"], budgets[name]))
+        if result["modules"]:
+            failures.append("{}: loaded {}".format(name, ", ".join(result["modules"])))
+    return results, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    results, failures = run(args.repeat)
+    for name, result in results.items():
+        print("{:<12} {:7.3f}s  (budget {:.1f}s)".format(name, result["seconds"], BUDGETS[name]))
+    for failure in failures:
+        print("FAIL", failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,268 @@
+"""Hot-path benchmark suite with JSON baselines and a regression gate.
+
+    python bench_suite.py                 # run and compare against bench_baseline.json
+    python bench_suite.py --update        # run and store the results as the new baseline
+    python bench_suite.py --only rhs_     # benchmarks whose name starts with a prefix
+
+Each benchmark reports one number with a direction: rates are better when
+higher, latencies when lower. A run fails (exit status 1) when a result is
+worse than its baseline by more than the tolerance. Baselines are only
+meaningful on the machine that wrote them; the platform is stored with them
+and a mismatch is reported.
+
+A shared machine speeds up and slows down as a whole, so every run also
+times a fixed calibration workload and the gate compares results scaled by
+how much slower or faster that workload got since the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+CITY_ASSETS = os.path.join(HERE, "assets", "city")
+DEFAULT_TOLERANCE = 0.50  # fraction, after calibration; single benchmarks still swing by tens of percent
+
+# higher is True for rates (per second), False for latencies (seconds)
+Result = namedtuple("Result", "name value unit higher")
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, higher):
+    def register(function):
+        BENCHMARKS[name] = (function, unit, higher)
+        return function
+    return register
+
+
+def best_of(function, repeat=5):
+    """Smallest wall time of `repeat` calls to function()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@benchmark("step_latency", "s/step", higher=False)
+def step_latency(steps=200):
+    from dynamics import Car, CarState
+    car = Car()
+    def run():
+        state = CarState(velocity=10.0)
+        for _ in range(steps):
+            state = car.get_next_state(state, 0.05, 320, 0.05, 0.02)
+    return best_of(run) / steps
+
+
+@benchmark("step_latency_dynamic", "s/step", higher=False)
+def step_latency_dynamic(steps=200):
+    # step_latency on the dynamic single-track engine
+    from bicycle import DynamicCar
+    from dynamics import CarState
+    car = DynamicCar()
+    def run():
+        state = CarState(velocity=10.0)
+        for _ in range(steps):
+            state = car.get_next_state(state, 0.05, 320, 0.05, 0.02)
+    return best_of(run) / steps
+
+
+@benchmark("rhs_car", "evals/s", higher=True)
+def rhs_car(n=20000):
+    from bench_rhs import evaluations_per_second
+    from dynamics import Car
+    return max(evaluations_per_second(Car().equations_of_motion, (320, 0.1, 0.05), n) for _ in range(3))
+
+
+@benchmark("rhs_fast", "evals/s", higher=True)
+def rhs_fast(n=20000):
+    import fast_rhs
+    from bench_rhs import evaluations_per_second
+    args = (320, 0.1, 0.05, fast_rhs.pack_parameters().tolist())
+    return max(evaluations_per_second(fast_rhs.make_rhs("sim"), args, n) for _ in range(3))
+
+
+@benchmark("maneuver", "s", higher=False)
+def maneuver():
+    # the integration behind pyg.Simulation.position_pixel, without the window
+    from car_model import Car, DEFAULT_MANEUVER, simulate_maneuver
+    return best_of(lambda: simulate_maneuver(Car(), DEFAULT_MANEUVER, 320, 0, 0.05), repeat=3)
+
+
+@benchmark("road_scalar", "lookups/s", higher=True)
+def road_scalar(n=100000):
+    from Road import Road
+    road = Road()
+    positions = list(range(n))
+    def run():
+        for position in positions:
+            road.get_road_properties(position)
+    return n / best_of(run, repeat=3)
+
+
+@benchmark("road_vectorized", "lookups/s", higher=True)
+def road_vectorized(n=1000000):
+    from Road import Road
+    road = Road(os.path.join(HERE, "assets", "maps", "city_loop.json"))
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 800, n), rng.uniform(0, 600, n)
+    road.get_road_properties(x[:10], y[:10])  # builds the spatial index
+    return n / best_of(lambda: road.get_road_properties(x, y), repeat=3)
+
+
+@benchmark("lanes_fps", "frames/s", higher=True)
+def lanes_fps(frames=50):
+    import pygame
+    from Road import Road
+    road = Road()
+    rates = []
+    for name in sorted(os.listdir(CITY_ASSETS)):
+        surface = pygame.image.load(os.path.join(CITY_ASSETS, name))
+        if surface.get_size() != (800, 600):
+            surface = pygame.transform.scale(surface, (800, 600))
+        road.detect_lanes_pygame(surface)  # allocate the stage's buffers
+        rates.append(frames / best_of(lambda: [road.detect_lanes_pygame(surface) for _ in range(frames)], repeat=3))
+    return min(rates)  # the slowest bundled image gates
+
+
+@benchmark("frame_loop", "s/frame", higher=False)
+def frame_loop(frames=100, network=False):
+    import pygame
+    from render_cache import clear_fonts
+    from sim import Simulation
+    view = Simulation(network=network)
+    def run():
+        for _ in range(frames):
+            view.update_dynamics(0.05)
+            view.render(-1)
+    seconds = best_of(run, repeat=3) / frames
+    clear_fonts()
+    pygame.quit()
+    return seconds
+
+
+@benchmark("frame_loop_network", "s/frame", higher=False)
+def frame_loop_network(frames=100):
+    return frame_loop(frames, network=True)
+
+
+def calibrate():
+    """Seconds for a fixed mix of interpreter and small-array work, the best of several runs."""
+    values = np.linspace(0.0, 1.0, 64)
+    def work():
+        total = 0.0
+        for i in range(20000):
+            total += (i * 0.5) % 7.0
+        for _ in range(2000):
+            total += float(np.sqrt(values).sum())
+        return total
+    return best_of(work, repeat=7)
+
+
+def run(names):
+    results = {}
+    for name in names:
+        function, unit, higher = BENCHMARKS[name]
+        results[name] = Result(name, float(function()), unit, higher)
+    return results
+
+
+def machine():
+    return {"platform": platform.platform(), "python": platform.python_version(), "processor": platform.processor()}
+
+
+def load_baseline(path=BASELINE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE, previous=None, calibration=None):
+    entries = dict(previous["results"]) if previous else {}
+    entries.update({name: {"value": r.value, "unit": r.unit, "higher": r.higher} for name, r in results.items()})
+    if calibration is None and previous:
+        calibration = previous.get("calibration")
+    with open(path, "w") as f:
+        json.dump({"machine": machine(), "calibration": calibration, "results": entries}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def slowdown(baseline, calibration):
+    """How many times longer the calibration workload takes now than when the baseline was stored."""
+    reference = baseline.get("calibration")
+    if not reference or not calibration:
+        return 1.0
+    return calibration / reference
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, calibration=None):
+    """Return rows (name, value, baseline value, relative change, regressed) for results with a baseline.
+
+    The baseline value is first scaled by slowdown(baseline, calibration);
+    relative change is positive when the result got better.
+    """
+    factor = slowdown(baseline, calibration)
+    rows = []
+    for name, result in results.items():
+        entry = baseline["results"].get(name)
+        if entry is None:
+            rows.append((name, result.value, None, None, False))
+            continue
+        expected = entry["value"] / factor if result.higher else entry["value"] * factor
+        change = (result.value - expected) / expected
+        if not result.higher:
+            change = -change
+        tol = entry.get("tolerance", tolerance)
+        rows.append((name, result.value, entry["value"], change, change < -tol))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the hot-path benchmarks and gate on the stored baseline.")
+    parser.add_argument("--update", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--only", default=None, help="run only benchmarks whose name starts with this prefix")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # frame_loop and lanes_fps need no real display
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    names = [name for name in BENCHMARKS if args.only is None or name.startswith(args.only)]
+    # calibrate on both sides of the run, since the machine's load can change while it runs
+    before = calibrate()
+    results = run(names)
+    calibration = (before + calibrate()) / 2
+    baseline = load_baseline(args.baseline)
+
+    if args.update:
+        save_baseline(results, args.baseline, baseline, calibration)
+        for r in results.values():
+            print("{:<16} {:>14.6g} {}".format(r.name, r.value, r.unit))
+        print("baseline written to {}".format(args.baseline))
+        sys.exit(0)
+    if baseline is None:
+        sys.exit("no baseline at {}; run with --update first".format(args.baseline))
+    if baseline.get("machine", {}).get("platform") != machine()["platform"]:
+        print("note: baseline recorded on {}, comparing anyway".format(baseline["machine"].get("platform")))
+    print("calibration {:.4g} s, {:.2f}x the baseline's".format(calibration, slowdown(baseline, calibration)))
+
+    failed = False
+    for name, value, reference, change, regressed in compare(results, baseline, args.tolerance, calibration):
+        unit = results[name].unit
+        if reference is None:
+            print("{:<16} {:>14.6g} {:<10} (no baseline)".format(name, value, unit))
+            continue
+        print("{:<16} {:>14.6g} {:<10} baseline {:>12.6g} {:>+7.1%}{}".format(
+            name, value, unit, reference, change, "  REGRESSION" if regressed else ""))
+        failed = failed or regressed
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,193 @@
+import math
+import os
+from scipy.integrate import odeint
+from constants import G, friction
+from dynamics import Car, CarState
+from profiler import PROFILER
+from telemetry import TRACE, TRACE_STEP, TRACE_RHS
+from vehicle_params import vehicle_parameters
+
+LOAD_SENSITIVITY = 0.1  # fraction of tyre friction lost per nominal wheel load of extra load
+BLEND_SPEED = (1.0, 3.0)  # m/s: kinematic lateral motion below the first, tyre forces alone above the second
+KINEMATIC_LAG = 0.1  # s, how fast the lateral states follow the kinematic bicycle at low speed
+
+
+def brush_tire(alpha, stiffness, capacity):
+    """Lateral force of a brush (Fiala) tyre at slip angle alpha.
+
+    Linear (-stiffness * alpha) at small slip, rounding off to +-capacity,
+    which it reaches at full sliding.
+    """
+    if capacity <= 0.0 or stiffness <= 0.0:
+        return 0.0
+    t = math.tan(alpha)
+    if abs(t) >= 3.0 * capacity / stiffness:
+        return -capacity if t > 0 else capacity
+    ratio = stiffness / capacity
+    return -stiffness * t + stiffness * ratio / 3.0 * abs(t) * t - stiffness * ratio * ratio / 27.0 * t * t * t
+
+
+class DynamicCar(Car):
+    """Single-track (bicycle) model with yaw rate as a state, a drop-in for the kinematic Car.
+
+    velocity and lateral_velocity are body-frame, and both move the car;
+    CarState.yaw_rate carries the sixth state. Axle loads shift with the
+    longitudinal acceleration (cg height over wheelbase), and between the
+    two wheels of an axle with the lateral acceleration (over track width).
+    Each wheel is a brush tyre whose stiffness scales with its load and
+    whose grip is what the friction circle leaves after its share of the
+    drive (front axle) and brake forces. Friction falls slightly with load
+    (LOAD_SENSITIVITY), which is what makes lateral load transfer cost
+    grip. Below BLEND_SPEED slip angles are meaningless, so the lateral
+    states are pulled towards the kinematic bicycle instead.
+
+    center_of_gravity["x"] is taken as a fraction of the wheelbase from the
+    front axle; as metres it would put 80% of the weight on the front.
+    """
+
+    def __init__(self, surface=None, params=None):
+        super().__init__(surface)
+        params = vehicle_parameters if params is None else params
+        self.wheelbase = params["wheelbase"]
+        self.a = params["center_of_gravity"]["x"] * self.wheelbase  # front axle to cg
+        self.b = self.wheelbase - self.a  # cg to rear axle
+        self.cg_height = params["center_of_gravity"]["z"]
+        self.track_width = params["track_width"]
+        self.inertia = params["inertia"]
+        self.wheel_stiffness = params["tire_cornering_stiffness"]  # per wheel, at nominal load
+        self.tire_friction = params["tire_friction_coefficient"] / friction["asphalt"]  # scales road friction
+        self.nominal_load = self.mass * G / 4
+        self.yaw_rate = 0.0  # of the last state get_next_state returned
+
+    def _wheel_force(self, alpha, load, longitudinal, mu):
+        """Lateral force of one wheel under `load` N, already carrying `longitudinal` N."""
+        if load <= 0.0:
+            return 0.0
+        grip = mu * (1.0 - LOAD_SENSITIVITY * (load / self.nominal_load - 1.0)) * load
+        capacity = math.sqrt(max(grip * grip - longitudinal * longitudinal, 0.0))
+        return brush_tire(alpha, self.wheel_stiffness * load / self.nominal_load, capacity)
+
+    def _derivatives(self, state, engine_torque, steering_angle, rolling_coefficient, road_friction):
+        """(derivatives, longitudinal forces) at a six-element state vector."""
+        position, vx, lateral_position, vy, orientation, yaw_rate = state
+        m, a, b, L = self.mass, self.a, self.b, self.wheelbase
+        forces = self.longitudinal_forces(vx, engine_torque, rolling_coefficient, road_friction)
+        F_engine, F_brake, F_drag, F_net = forces
+        ax = F_net / m
+        ay = vx * yaw_rate
+
+        # per-wheel loads: static split, shifted rearwards by ax and outwards by ay (shared like the static split)
+        pitch = m * ax * self.cg_height / L
+        roll = m * ay * self.cg_height / self.track_width
+        front, rear = (m * G * b / L - pitch) / 2, (m * G * a / L + pitch) / 2
+        front_roll, rear_roll = roll * b / L, roll * a / L
+        # longitudinal force per wheel: drive on the front, brake by static load
+        front_x = (F_engine - F_brake * b / L) / 2
+        rear_x = -F_brake * a / L / 2
+
+        mu = road_friction * self.tire_friction
+        speed = max(vx, BLEND_SPEED[0])
+        alpha_front = math.atan2(vy + a * yaw_rate, speed) - steering_angle
+        alpha_rear = math.atan2(vy - b * yaw_rate, speed)
+        # both wheels of an axle share its slip angle, so only how the load is split matters, not which side
+        F_front = (self._wheel_force(alpha_front, front - front_roll / 2, front_x, mu)
+                   + self._wheel_force(alpha_front, front + front_roll / 2, front_x, mu))
+        F_rear = (self._wheel_force(alpha_rear, rear - rear_roll / 2, rear_x, mu)
+                  + self._wheel_force(alpha_rear, rear + rear_roll / 2, rear_x, mu))
+
+        cos_steer, sin_steer = math.cos(steering_angle), math.sin(steering_angle)
+        coupling = vy * yaw_rate - F_front * sin_steer / m  # includes the front tyre's cornering drag
+        dvy_dt = (F_front * cos_steer + F_rear) / m - vx * yaw_rate
+        dr_dt = (a * F_front * cos_steer - b * F_rear) / self.inertia
+        low, high = BLEND_SPEED
+        if vx < high:
+            w = max(0.0, (vx - low) / (high - low))
+            kinematic_yaw_rate = vx * math.tan(steering_angle) / L
+            coupling *= w
+            dvy_dt = w * dvy_dt + (1 - w) * (kinematic_yaw_rate * b - vy) / KINEMATIC_LAG
+            dr_dt = w * dr_dt + (1 - w) * (kinematic_yaw_rate - yaw_rate) / KINEMATIC_LAG
+        dvx_dt = ax + coupling
+
+        cos_heading, sin_heading = math.cos(orientation), math.sin(orientation)
+        return [vx * cos_heading - vy * sin_heading, dvx_dt,
+                vx * sin_heading + vy * cos_heading, dvy_dt,
+                yaw_rate, dr_dt], forces
+
+    def state_vector(self, state: CarState):
+        return state.as_list() + [state.yaw_rate]
+
+    def make_state(self, values) -> CarState:
+        self.yaw_rate = float(values[5])
+        return CarState(*values[:5], yaw_rate=self.yaw_rate)
+
+    def derivatives_on_surface(self, state, t, engine_torque, steering_angle, rolling_coefficient, friction):
+        derivatives, (F_engine, F_brake, F_drag, F_net) = self._derivatives(
+            state, engine_torque, steering_angle, rolling_coefficient, friction)
+        if TRACE.level >= TRACE_RHS:
+            TRACE.record(self.elapsed + t, F_engine, F_brake, F_drag, F_net, state[5], self._throttle, self._brake, steering_angle)
+        return derivatives
+
+    def acceleration(self, state, engine_torque):
+        """dv/dt of the body-frame speed; a five-element state takes the yaw rate of the last step."""
+        if len(state) < 6:
+            state = list(state) + [self.yaw_rate]
+        return self._derivatives(state, engine_torque, self._steering_angle, *self.surface.at(state[0]))[0][1]
+
+    def get_next_state(self, state: CarState, Dt, engine_torque, slip_angle, steering_angle) -> CarState:
+        y0 = self.state_vector(state)
+        args = (engine_torque, steering_angle, slip_angle)
+        if PROFILER.enabled:
+            solution, info = odeint(self.equations_of_motion, y0, [0, Dt], args=args, full_output=True)
+            PROFILER.count("rhs_calls", int(info["nfe"][-1]))
+            values = solution[1]
+        else:
+            values = odeint(self.equations_of_motion, y0, [0, Dt], args=args)[1]
+        self.elapsed += Dt
+        next_state = self.make_state(values)
+        if TRACE.level == TRACE_STEP:
+            F_engine, F_brake, F_drag, F_net = self.longitudinal_forces(values[1], engine_torque, *self.surface.at(values[0]))
+            TRACE.record(self.elapsed, F_engine, F_brake, F_drag, F_net, self.yaw_rate, self._throttle, self._brake, steering_angle)
+        return next_state
+
+
+# model name -> Car class; each takes surface as its first argument
+ENGINES = {"kinematic": Car, "dynamic": DynamicCar}
+
+
+def make_car(engine="kinematic", surface=None):
+    if engine not in ENGINES:
+        raise ValueError("unknown engine {!r}; known: {}".format(engine, sorted(ENGINES)))
+    return ENGINES[engine](surface)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import numpy as np
+    from scenario import SCENARIOS, compile_scenario, evaluate, load_scenario, scenario_files, simulate
+
+    parser = argparse.ArgumentParser(description="Run the same scenarios on every engine: cost per step and how far the results drift apart.")
+    parser.add_argument("paths", nargs="*", default=[SCENARIOS], help="scenario files or directories")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per engine and scenario; the fastest is reported")
+    args = parser.parse_args()
+
+    print("{:<26} {:<10} {:>10} {:>10} {:>12} {:>10}  {}".format(
+        "scenario", "engine", "ms/step", "x end", "max |dy|", "v end", "assertions"))
+    for path in scenario_files(args.paths):
+        compiled = compile_scenario(load_scenario(path), os.path.dirname(os.path.abspath(path)))
+        runs = {}
+        for engine in ENGINES:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                physics, applied = simulate(compiled, engine)
+                best = min(best, time.perf_counter() - start)
+            runs[engine] = (physics, applied, best / physics.step_count)
+        reference = runs["kinematic"][0]
+        for engine, (physics, applied, seconds) in runs.items():
+            # lateral drift from the kinematic run at the same instants
+            drift = np.abs(physics.lateral_positions - reference.lateral_positions).max()
+            checks = evaluate(compiled, physics, applied)
+            print("{:<26} {:<10} {:10.3f} {:10.1f} {:12.2f} {:10.2f}  {}".format(
+                compiled.name, engine, 1e3 * seconds, physics.positions[-1], drift, physics.velocities[-1],
+                " ".join("{}={}".format(c.name, "ok" if c.passed else "FAIL") for c in checks)))
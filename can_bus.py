@@ -0,0 +1,647 @@
+import asyncio
+import heapq
+import math
+import random
+import selectors
+import weakref
+from collections import deque, namedtuple
+
+# One entry per message in the network database, like a DBC file. period is
+# None for event-driven messages. Lower can_id wins arbitration.
+MessageSpec = namedtuple("MessageSpec", "name can_id dlc period signals")
+
+MESSAGES = {spec.name: spec for spec in (
+    MessageSpec("bms_fault", 0x080, 1, None, ("faults",)),
+    MessageSpec("controls", 0x100, 6, 0.01, ("throttle", "brake", "steering_angle")),
+    MessageSpec("vehicle_speed", 0x120, 4, 0.02, ("velocity", "position")),
+    MessageSpec("lane", 0x180, 6, 0.05, ("lane_center", "slope")),
+    MessageSpec("bms_status", 0x200, 8, 0.1, ("soc", "voltage", "current", "temperature_max")),
+    MessageSpec("body_status", 0x300, 3, 0.2, ("falcon_wing_left", "falcon_wing_right", "front_door")),
+    MessageSpec("body_command", 0x310, 2, None, ("actuator", "target")),
+)}
+
+BODY_ACTUATORS = ("falcon_wing_left", "falcon_wing_right", "front_door")
+ERROR_FRAME_BITS = 23  # error flag, echo and delimiter
+BUS_OFF_RECOVERY_BITS = 128 * 11  # 128 runs of 11 recessive bits
+COUNTER_MODULO = 16  # alive counter carried by every frame
+FAILSAFE_BRAKE = 0.3
+
+
+def frame_bits(dlc):
+    """Worst-case bits on the wire for a standard 11-bit-id frame: stuffing plus interframe space."""
+    return 47 + 8 * dlc + (34 + 8 * dlc - 1) // 4
+
+
+_FRAME_BITS = [frame_bits(dlc) for dlc in range(9)]
+
+
+class Frame:
+    __slots__ = ("spec", "can_id", "values", "counter", "sender", "bits", "queued_at", "sent_at", "delivered_at", "retries")
+
+    def __init__(self, spec, values, counter, sender):
+        self.spec = spec
+        self.can_id = spec.can_id
+        self.values = values
+        self.counter = counter
+        self.sender = sender
+        self.bits = _FRAME_BITS[spec.dlc]
+        self.queued_at = self.sent_at = self.delivered_at = None
+        self.retries = 0
+
+    def __repr__(self):
+        return "Frame({}, 0x{:03x}, {}, counter={})".format(self.spec.name, self.can_id, self.values, self.counter)
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    """Selector that never waits: a select() timeout advances the loop's virtual clock instead."""
+
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("virtual time stalled: nothing is scheduled")
+        self.loop._now += timeout
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """asyncio event loop on a simulated clock.
+
+    Whenever nothing is ready, time jumps straight to the next timer, so
+    asyncio.sleep, call_later and timeouts all run in simulated seconds and a
+    simulated second costs only the callbacks inside it. There is no real I/O.
+    """
+
+    def __init__(self):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._now = 0.0
+
+    def time(self):
+        return self._now
+
+
+class Bus:
+    """One CAN segment with a bitrate, priority arbitration and a bounded transmit queue.
+
+    Whenever the bus goes idle, the pending frame with the lowest can_id wins
+    and occupies the bus for frame_bits(dlc) / bitrate. The transmit schedule
+    is worked out exactly from the queue times, lazily whenever a frame is
+    queued or a tick runs; delivery to subscribers is batched into ticks, so a
+    receiver sees a frame up to `tick` after its delivered_at, which is exact.
+
+    Faults: error_rate corrupts that fraction of transmissions (an error frame,
+    then the frame re-arbitrates; the sender's transmit error counter rises by
+    8 and at 256 it goes bus-off for the recovery time and loses its frames),
+    and fail(duration) takes the bus down.
+    """
+
+    def __init__(self, network, name, bitrate=500_000, queue_limit=256, tick=1e-3, seed=0):
+        self.network = network
+        self.name = name
+        self.bitrate = bitrate
+        self.queue_limit = queue_limit
+        self.tick = tick
+        self.error_rate = 0.0
+        self.down_until = 0.0
+        self._rng = random.Random(seed)
+        self._loop = network.loop
+        self._pending = []  # heap of (can_id, sequence, frame)
+        self._sequence = 0
+        self._free_at = 0.0  # when the frame now on the wire, if any, ends
+        self._done = deque()  # transmitted, waiting for the tick that delivers them
+        self._ticking = False
+        self._subscribers = {}
+        self._monitors = []
+        self.frames = 0
+        self.bits = 0
+        self.busy_time = 0.0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def subscribe(self, can_id, callback):
+        self._subscribers.setdefault(can_id, []).append(callback)
+
+    def monitor(self, callback):
+        """Call callback(frame) for every delivered frame, e.g. a logger or a gateway."""
+        self._monitors.append(callback)
+
+    def fail(self, duration):
+        """Nothing is transmitted for the next `duration` seconds; queued frames wait."""
+        self.down_until = max(self.down_until, self._loop.time() + duration)
+
+    def transmit(self, frame):
+        """Queue a frame now; returns False if it was dropped (queue full or sender bus-off)."""
+        return self.transmit_many((frame,)) == 1
+
+    def transmit_many(self, frames):
+        """Queue frames now, in order; returns how many were accepted."""
+        now = self._loop.time()
+        self._catch_up(now)
+        pending = self._pending
+        if not pending and self._free_at < now:
+            self._free_at = now
+        accepted = 0
+        for frame in frames:
+            if now < frame.sender.bus_off_until or len(pending) >= self.queue_limit:
+                self.dropped += 1
+                continue
+            frame.queued_at = now
+            heapq.heappush(pending, (frame.can_id, self._sequence, frame))
+            self._sequence += 1
+            accepted += 1
+        if accepted and not self._ticking:
+            self._ticking = True
+            self._loop.call_at(now + self.tick, self._on_tick)
+        return accepted
+
+    def _catch_up(self, now):
+        """Run arbitration for every transmission that starts before `now`."""
+        pending = self._pending
+        free = self._free_at
+        while pending and free < now:
+            if free < self.down_until:
+                free = self.down_until
+                continue
+            item = heapq.heappop(pending)
+            frame = item[2]
+            sender = frame.sender
+            if free < sender.bus_off_until:
+                self.dropped += 1
+                continue
+            if self.error_rate and self._rng.random() < self.error_rate:
+                free += (frame.bits // 2 + ERROR_FRAME_BITS) / self.bitrate
+                self.errors += 1
+                frame.retries += 1
+                sender.transmit_errors += 8
+                if sender.transmit_errors >= 256:
+                    sender.bus_off_until = free + BUS_OFF_RECOVERY_BITS / self.bitrate
+                    sender.transmit_errors = 0
+                    self.dropped += 1
+                else:
+                    heapq.heappush(pending, item)
+                continue
+            if sender.transmit_errors:
+                sender.transmit_errors -= 1
+            duration = frame.bits / self.bitrate
+            frame.sent_at = free
+            free += duration
+            frame.delivered_at = free
+            self.busy_time += duration
+            self.frames += 1
+            self.bits += frame.bits
+            self._done.append(frame)
+        self._free_at = free
+
+    def _on_tick(self):
+        now = self._loop.time()
+        self._catch_up(now)
+        done = self._done
+        subscribers = self._subscribers
+        monitors = self._monitors
+        while done and done[0].delivered_at <= now:
+            frame = done.popleft()
+            latency = frame.delivered_at - frame.queued_at
+            self.latency_total += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            for callback in subscribers.get(frame.can_id, ()):
+                callback(frame)
+            for callback in monitors:
+                callback(frame)
+        if self._pending or done:
+            self._loop.call_at(now + self.tick, self._on_tick)
+        else:
+            self._ticking = False
+
+    def stats(self, elapsed=None):
+        elapsed = self._loop.time() if elapsed is None else elapsed
+        return {
+            "frames": self.frames,
+            "load": self.busy_time / elapsed if elapsed > 0 else 0.0,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": len(self._pending),
+            "latency_mean": self.latency_total / self.frames if self.frames else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+
+class ECU:
+    """A node on one bus: periodic frames and jobs on loop timers, event frames on demand.
+
+    Subclasses register what they send with periodic() and what they do on a
+    timer with every(), and react to frames through subscribe(). Periodic
+    jobs run from the network's shared timer, which costs a fraction of a
+    task wakeup; behaviour that reads better as a coroutine goes in run(),
+    which the network starts as a task. Setting silent makes the node stop
+    transmitting, as a crashed ECU would.
+    """
+
+    def __init__(self, network, bus, name):
+        self.network = network
+        self.bus = bus
+        self.name = name
+        self.loop = network.loop
+        self.silent = False
+        self.transmit_errors = 0
+        self.bus_off_until = 0.0
+        self._counters = {}
+        network.add(self)
+
+    def every(self, period, callback, offset=0.0):
+        self.network.every(period, callback, offset)
+
+    def periodic(self, name, source, period=None, offset=0.0):
+        """Send message `name` with values source() at its database period."""
+        spec = MESSAGES[name]
+        self.every(period or spec.period, lambda: self.send(spec, source()), offset)
+
+    def send(self, spec, values, count=1):
+        """Send `count` frames of a message now; returns how many the bus accepted."""
+        if isinstance(spec, str):
+            spec = MESSAGES[spec]
+        if self.silent:
+            return 0
+        counter = self._counters.get(spec.can_id, 0)
+        self._counters[spec.can_id] = (counter + count) % COUNTER_MODULO
+        frames = [Frame(spec, values, (counter + i) % COUNTER_MODULO, self) for i in range(count)]
+        return self.bus.transmit_many(frames)
+
+    def subscribe(self, name, callback, bus=None):
+        (bus or self.bus).subscribe(MESSAGES[name].can_id, callback)
+
+    async def run(self):
+        pass
+
+
+class ControlsECU(ECU):
+    """Driver pedals and steering wheel.
+
+    Holds the requested throttle, brake and steering (clamped like Car) and
+    broadcasts them every 10 ms, plus an immediate frame whenever the brake
+    request rises.
+    """
+
+    def __init__(self, network, bus, throttle=0.0, brake=0.0, steering_angle=0.0, max_steering_angle=math.pi / 6):
+        super().__init__(network, bus, "controls")
+        self.max_steering_angle = max_steering_angle
+        self._throttle = throttle
+        self._brake = brake
+        self._steering_angle = steering_angle
+        self.periodic("controls", self.values)
+
+    def values(self):
+        return (self._throttle, self._brake, self._steering_angle)
+
+    @property
+    def throttle(self):
+        return self._throttle
+    @throttle.setter
+    def throttle(self, value):
+        self._throttle = max(0, min(1, value))
+    @property
+    def brake(self):
+        return self._brake
+    @brake.setter
+    def brake(self, value):
+        value = max(0, min(1, value))
+        rising = value > self._brake
+        self._brake = value
+        if rising:
+            self.send("controls", self.values())
+    @property
+    def steering_angle(self):
+        return self._steering_angle
+    @steering_angle.setter
+    def steering_angle(self, value):
+        self._steering_angle = max(-self.max_steering_angle, min(value, self.max_steering_angle))
+
+
+class VehicleInterface(ECU):
+    """The car's chassis node: applies controls frames to the Car and reports its speed.
+
+    Controls frames are checked end to end by their alive counter: a frame is
+    accepted when it advances the counter by 1 to max_counter_jump, so a few
+    lost frames are tolerated but repeated or foreign sequences (a replay or a
+    second sender spoofing the id) are rejected. Without an accepted frame
+    for `timeout` the throttle is cut and FAILSAFE_BRAKE applied until frames
+    return, and the next frame resynchronises the counter.
+    """
+
+    def __init__(self, network, bus, physics, timeout=0.1, max_counter_jump=3):
+        super().__init__(network, bus, "vehicle")
+        self.physics = physics
+        self.car = physics.car
+        self.timeout = timeout
+        self.max_counter_jump = max_counter_jump
+        self.last_counter = None
+        self.last_accepted = 0.0
+        self.accepted = 0
+        self.rejected = 0
+        self.failsafe = False
+        self.subscribe("controls", self._on_controls)
+        self.periodic("vehicle_speed", self._speed)
+        self.every(0.01, self._watchdog)
+
+    def _speed(self):
+        state = self.physics.current_state
+        return (state.velocity, state.position)
+
+    def _on_controls(self, frame):
+        if self.last_counter is not None:
+            jump = (frame.counter - self.last_counter) % COUNTER_MODULO
+            if not 1 <= jump <= self.max_counter_jump:
+                self.rejected += 1
+                return
+        self.last_counter = frame.counter
+        self.last_accepted = frame.delivered_at
+        self.accepted += 1
+        self.failsafe = False
+        self.car.throttle, self.car.brake, self.car.steering_angle = frame.values
+
+    def _watchdog(self):
+        if self.loop.time() - self.last_accepted > self.timeout and not self.failsafe:
+            self.failsafe = True
+            self.last_counter = None
+            self.car.throttle = 0
+            self.car.brake = FAILSAFE_BRAKE
+
+
+class BmsECU(ECU):
+    """Publishes a BatteryPack's state and sends a bms_fault frame as soon as a new fault latches."""
+
+    def __init__(self, network, bus, pack, vehicle=0):
+        from battery import FAULTS
+        super().__init__(network, bus, "bms")
+        self.faults = FAULTS
+        self.pack = pack
+        self.vehicle = vehicle
+        self.reported = 0
+        self.periodic("bms_status", self._status)
+        self.every(0.01, self._check_faults)
+
+    def _status(self):
+        s = self.pack.summary(self.vehicle)
+        return (s["soc"], s["voltage"], s["current"], s["temperature_max"])
+
+    def _check_faults(self):
+        faults = 0
+        for bit, name in enumerate(self.faults):
+            if getattr(self.pack, name)[self.vehicle]:
+                faults |= 1 << bit
+        if faults & ~self.reported:
+            self.send("bms_fault", (faults,))
+        self.reported = faults
+
+
+class PerceptionECU(ECU):
+    """Forwards the newest lane estimate from a PerceptionWorker (or any object with latest())."""
+
+    def __init__(self, network, bus, worker):
+        super().__init__(network, bus, "perception")
+        self.worker = worker
+        self.every(MESSAGES["lane"].period, self._publish, offset=0.002)
+
+    def _publish(self):
+        estimate = self.worker.latest()
+        if estimate is not None and estimate.lane_center is not None:
+            self.send("lane", (estimate.lane_center, estimate.slope))
+
+
+class BodyControlECU(ECU):
+    """Falcon wings and front door as actuators moving toward commanded positions.
+
+    A body_command frame (actuator index, target 0..1) sets a target; each
+    actuator moves at `rate` per second. jam(name) makes one stop where it
+    is, for malfunction scenarios; status goes out every 200 ms.
+    """
+
+    def __init__(self, network, bus, rate=0.5, step=0.02):
+        super().__init__(network, bus, "body")
+        self.rate = rate
+        self.position = dict.fromkeys(BODY_ACTUATORS, 0.0)
+        self.target = dict.fromkeys(BODY_ACTUATORS, 0.0)
+        self.jammed = set()
+        self.subscribe("body_command", self._on_command)
+        self.periodic("body_status", lambda: tuple(self.position[name] for name in BODY_ACTUATORS))
+        self.every(step, lambda: self._move(step))
+
+    def jam(self, name):
+        self.jammed.add(name)
+
+    def _on_command(self, frame):
+        actuator, target = frame.values
+        self.target[BODY_ACTUATORS[actuator]] = max(0.0, min(1.0, target))
+
+    def _move(self, step):
+        for name in BODY_ACTUATORS:
+            if name in self.jammed:
+                continue
+            error = self.target[name] - self.position[name]
+            self.position[name] += max(-self.rate * step, min(error, self.rate * step))
+
+
+class Gateway(ECU):
+    """Forwards selected messages from one bus to another after a processing delay."""
+
+    def __init__(self, network, source, target, names, delay=2e-4):
+        super().__init__(network, target, "gateway_{}_{}".format(source.name, target.name))
+        self.delay = delay
+        for name in names:
+            source.subscribe(MESSAGES[name].can_id, self._forward)
+
+    def _forward(self, frame):
+        if not self.silent:
+            self.loop.call_later(self.delay, self._relay, frame)
+
+    def _relay(self, frame):
+        # a gateway that went silent during the processing delay drops the frame
+        if not self.silent:
+            self.bus.transmit(Frame(frame.spec, frame.values, frame.counter, self))
+
+
+class Injector(ECU):
+    """Fault and attack injection: sends `rate` frames per second of one message from `start` for `duration`.
+
+    With a high-priority id and a high rate this is a babbling node that
+    congests the bus; with the id of a real message it is a spoofing attack.
+    Frames go out in bursts every `burst` seconds to keep the cost per
+    simulated frame low.
+    """
+
+    def __init__(self, network, bus, spec, values, rate, start=0.0, duration=math.inf, burst=1e-3, name="injector"):
+        super().__init__(network, bus, name)
+        self.spec = MESSAGES[spec] if isinstance(spec, str) else spec
+        self.values = values
+        self.rate = rate
+        self.start_at = start
+        self.duration = duration
+        self.burst = burst
+        self.sent = 0
+
+    async def run(self):
+        loop = self.loop
+        await asyncio.sleep(self.start_at - loop.time())
+        end = self.start_at + self.duration
+        owed = 0.0
+        while loop.time() < end:
+            owed += self.rate * self.burst
+            count = int(owed)
+            owed -= count
+            if count:
+                self.sent += self.send(self.spec, self.values, count)
+            await asyncio.sleep(self.burst)
+
+
+def _shutdown(loop, tasks):
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.close()
+
+
+class VehicleNetwork:
+    """Buses and ECUs sharing one virtual-time asyncio loop.
+
+    run_until(t) lets every ECU and bus tick run up to simulated time t;
+    subscriber() does that after each PhysicsLoop step, so the network keeps
+    pace with the physics clock rather than the wall clock.
+    """
+
+    def __init__(self):
+        self.loop = VirtualTimeLoop()
+        self.buses = {}
+        self.ecus = []
+        self._tasks = []
+        self._started = 0
+        self._jobs = []  # [next due, period, callback] for every ECU
+        self._wake_handle = None
+        # closes the loop at exit or collection if close() was never called
+        self._finalizer = weakref.finalize(self, _shutdown, self.loop, self._tasks)
+
+    @property
+    def time(self):
+        return self.loop.time()
+
+    def bus(self, name, bitrate=500_000, **kwargs):
+        bus = self.buses[name] = Bus(self, name, bitrate, **kwargs)
+        return bus
+
+    def add(self, ecu):
+        self.ecus.append(ecu)
+
+    def every(self, period, callback, offset=0.0):
+        """Call callback() every `period` seconds from `offset`; jobs due together share one wakeup."""
+        due = max(offset, self.loop.time())
+        self._jobs.append([due, period, callback])
+        if self._wake_handle is None or due < self._wake_handle.when():
+            if self._wake_handle is not None:
+                self._wake_handle.cancel()
+            self._wake_handle = self.loop.call_at(due, self._wake)
+
+    def _wake(self):
+        now = self.loop.time() + 1e-9
+        due = math.inf
+        for job in self._jobs:
+            if job[0] <= now:
+                job[2]()
+                job[0] += job[1]
+            if job[0] < due:
+                due = job[0]
+        self._wake_handle = self.loop.call_at(due, self._wake)
+
+    def run_until(self, t):
+        for ecu in self.ecus[self._started:]:
+            if type(ecu).run is not ECU.run:
+                self._tasks.append(self.loop.create_task(ecu.run()))
+        self._started = len(self.ecus)
+        self.loop.call_at(max(t, self.loop.time()), self.loop.stop)
+        self.loop.run_forever()
+
+    def subscriber(self):
+        """PhysicsLoop subscriber advancing the network to the physics time."""
+        def advance(physics):
+            self.run_until(physics.t)
+        return advance
+
+    def stats(self):
+        return {name: bus.stats() for name, bus in self.buses.items()}
+
+    def close(self):
+        self._finalizer()
+
+    @classmethod
+    def for_vehicle(cls, physics, pack=None, perception=None, powertrain_bitrate=500_000, body_bitrate=125_000):
+        """The default topology: controls, chassis, BMS and perception on a powertrain bus,
+        body control on a slower body bus, and a gateway passing speed and BMS frames across."""
+        network = cls()
+        powertrain = network.bus("powertrain", powertrain_bitrate)
+        body = network.bus("body", body_bitrate, seed=1)
+        car = physics.car
+        network.controls = ControlsECU(network, powertrain, car.throttle, car.brake, car.steering_angle, car.max_steering_angle)
+        network.vehicle = VehicleInterface(network, powertrain, physics)
+        network.bms = BmsECU(network, powertrain, pack) if pack is not None else None
+        network.perception = PerceptionECU(network, powertrain, perception) if perception is not None else None
+        network.body = BodyControlECU(network, body)
+        network.gateway = Gateway(network, powertrain, body, ("vehicle_speed", "bms_status", "bms_fault"))
+        return network
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Network scheduler throughput and a fault scenario with the car on the bus.")
+    parser.add_argument("--buses", type=int, default=4)
+    parser.add_argument("--bitrate", type=int, default=1_000_000)
+    parser.add_argument("--load", type=float, default=0.8, help="offered load per bus as a fraction of its bandwidth")
+    parser.add_argument("--seconds", type=float, default=5.0, help="simulated seconds")
+    args = parser.parse_args()
+
+    # Throughput: every bus carries the database's periodic traffic and a filler stream up to the target load
+    network = VehicleNetwork()
+    received = [0]
+    filler = MessageSpec("filler", 0x400, 8, None, ("payload",))
+    for i in range(args.buses):
+        bus = network.bus("bus{}".format(i), args.bitrate, seed=i)
+        bus.monitor(lambda frame: received.__setitem__(0, received[0] + 1))
+        node = ECU(network, bus, "node{}".format(i))
+        periodic_bits = 0.0
+        for spec in MESSAGES.values():
+            if spec.period:
+                node.periodic(spec.name, lambda spec=spec: (0,) * len(spec.signals), offset=1e-4 * spec.can_id / 0x100)
+                periodic_bits += frame_bits(spec.dlc) / spec.period
+        rate = max(0.0, args.load * args.bitrate - periodic_bits) / frame_bits(filler.dlc)
+        Injector(network, bus, filler, (0,), rate, name="filler{}".format(i))
+    start = time.perf_counter()
+    network.run_until(args.seconds)
+    wall = time.perf_counter() - start
+    for name, s in network.stats().items():
+        print("{}: {} frames, load {:.0%}, latency mean {:.2f} ms max {:.2f} ms".format(
+            name, s["frames"], s["load"], 1e3 * s["latency_mean"], 1e3 * s["latency_max"]))
+    print("{:,} frames delivered in {:.1f} simulated s: {:,.0f} frames per simulated s, {:.1f}x real time".format(
+        received[0], args.seconds, received[0] / args.seconds, args.seconds / wall))
+    network.close()
+
+    # The car driven over the bus: spoofed controls, then the driver's node goes silent
+    from physics_loop import PhysicsLoop
+    physics = PhysicsLoop()
+    network = VehicleNetwork.for_vehicle(physics)
+    physics.add_subscriber(network.subscriber())
+    network.controls.throttle = 0.5
+    Injector(network, network.buses["powertrain"], "controls", (1.0, 0.0, 0.5), rate=100, start=2.0, duration=1.0, name="attacker")
+    network.loop.call_at(4.0, setattr, network.controls, "silent", True)
+    physics.run(duration=6.0)
+    vehicle = network.vehicle
+    print("controls accepted {}, rejected {}, failsafe {}, throttle {:.1f}, brake {:.1f}, v {:.1f} m/s".format(
+        vehicle.accepted, vehicle.rejected, vehicle.failsafe, physics.car.throttle, physics.car.brake,
+        physics.current_state.velocity))
+    print({name: {k: round(v, 4) for k, v in s.items()} for name, s in network.stats().items()})
+    network.close()
@@ -1,18 +1,28 @@
 from vehicle_params import vehicle_parameters
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy.integrate import odeint
+
+# Maneuver segments: (name, start time, end time, samples, steering angle)
+DEFAULT_MANEUVER = [
+    ('straight', 0, 4, 5 * 50, 0),
+    ('turn_right', 4, 5, 50, 30 * (np.pi / 180)),
+    ('little_straight', 5, 7, 2 * 50, 0),
+    ('turn_left', 7, 15, 8 * 50, -30 * (np.pi / 180)),
+]
+
 def main():
     #vehicle_length= vehicle_parameters("length")
     pass
 
 class Car(object):
 
-    def __init__(self):
-        self.mass= vehicle_parameters["mass"]
-        self.drag_coefficient= vehicle_parameters["drag_coefficient"]
+    def __init__(self, params=None):
+        self.params = vehicle_parameters if params is None else params
+        self.mass= self.params["mass"]
+        self.drag_coefficient= self.params["drag_coefficient"]
         self.max_steering_angle= np.pi/6  #30 degrees in radian
         self.max_acceptable_acceleration = 5.0 # in m/s^2
+        self.rolling_coefficient = 0.015
         pass
     
     def traction_control(self, acceleration, engine_torque):
@@ -25,12 +35,12 @@ class Car(object):
         g =9.81
         a=0
         
-        F_engine= engine_torque/vehicle_parameters["tire_radius"]
-        F_drag = 0.5 * rho * vehicle_parameters["frontal_area"] * self.drag_coefficient * v**2
-        F_rolling = self.mass * g * 0.015 # coefficient of rolling = 0.015
+        F_engine= engine_torque/self.params["tire_radius"]
+        F_drag = 0.5 * rho * self.params["frontal_area"] * self.drag_coefficient * v**2
+        F_rolling = self.mass * g * self.rolling_coefficient # 0.015 on asphalt
 
         engine_torque= self.traction_control(a,engine_torque)
-        F_engine= engine_torque/vehicle_parameters["tire_radius"]
+        F_engine= engine_torque/self.params["tire_radius"]
 
         F_net = F_engine - F_drag - F_rolling - brake_force
         #print(F_net)
@@ -38,7 +48,7 @@ class Car(object):
         return a
     
     def lateral_dynamics(self, v_y, slip_angle):
-        F_cornering = -vehicle_parameters["tire_cornering_stiffness"] * slip_angle
+        F_cornering = -self.params["tire_cornering_stiffness"] * slip_angle
         a_y = F_cornering / self.mass
         return a_y
 
@@ -52,11 +62,29 @@ class Car(object):
         dv_y_dt=lateral_acceleration
         dx_dt=velocity * np.cos(orientation + steering_angle)
         dy_dt=velocity * np.sin(orientation + steering_angle)
-        dtheta_dt= velocity / vehicle_parameters["wheelbase"] * np.tan(steering_angle)
+        dtheta_dt= velocity / self.params["wheelbase"] * np.tan(steering_angle)
         return [dx_dt, dv_dt,dy_dt, dv_y_dt, dtheta_dt]
 
 
+def simulate_maneuver(car, maneuver=DEFAULT_MANEUVER, engine_torque=320, brake_force=0, slip_angle=0.05, initial_state=None):
+    """Integrate the car through consecutive maneuver segments.
+
+    Each segment starts from the last state of the previous one. Returns the
+    concatenated time points and the (n, 5) solution.
+    """
+    state = [0, 0, 0, 0, 0] if initial_state is None else initial_state
+    times, solutions = [], []
+    for name, start, end, samples, steering_angle in maneuver:
+        t = np.linspace(start, end, samples)
+        solution = odeint(car.equations_of_motion, state, t, args=(engine_torque, brake_force, steering_angle, slip_angle))
+        state = solution[-1]
+        times.append(t)
+        solutions.append(solution)
+    return np.concatenate(times), np.vstack(solutions)
+
+
 if __name__=="__main__":
+    import matplotlib.pyplot as plt
     main()
     car=Car()
     #Initial state
@@ -6,6 +6,12 @@ SCREEN_WIDTH = 128*SCALE
 SCREEN_HEIGHT = 128*SCALE
 GAME_TICKS = 60
 
+""" Physics Parameters """
+RHO = 1.225  # air density in kg/m^3
+G = 9.81
+F_BRAKE_MAX = 1000  # Maximum brake force
+V_HOLD = 0.05  # m/s; brake and rolling resistance fade out below it, so they stop the car instead of reversing it
+
 """ Game Parameters """
 NUM_OBSTACLES = 0
 
@@ -50,4 +56,16 @@ friction = {
     "gravel": 0.5,
     "dirt": 0.4,
     "snow": 0.3
-}
\ No newline at end of file
+}
+# Scale on every surface's friction by weather
+weather_friction = {
+    "dry": 1.0,
+    "rain": 0.7,
+    "snow": 0.4,
+    "ice": 0.15
+}
+ROAD_TYPES = list(friction)  # road_type codes used by recordings and road maps
+# Rolling resistance coefficient grows with roughness, 0.015 on asphalt
+def rolling_coefficient(roughness):
+    return 0.01 + 0.05 * roughness
+rolling_resistance = {road_type: rolling_coefficient(value) for road_type, value in roughness.items()}
@@ -0,0 +1,230 @@
+import time
+from collections import namedtuple
+import numpy as np
+
+# box is (x0, y0, x1, y1) in frame pixels
+Detection = namedtuple("Detection", "label score box")
+# detections for one submitted frame; queued is the time the frame waited for
+# its batch, inference the duration of the batched call it was part of
+DetectionResult = namedtuple("DetectionResult", "key frame_time detections batch_size queued inference")
+
+
+def frame_array(frame):
+    """Return an (height, width, 3) uint8 view of an array or pygame surface."""
+    if hasattr(frame, "get_size"):
+        import pygame
+        return pygame.surfarray.array3d(frame).transpose(1, 0, 2)
+    return np.asarray(frame)
+
+
+class TinyDetector:
+    """Stand-in for the planned YOLO-style model: NumPy only, no GPU or download.
+
+    The frame is split into cell x cell patches; each patch's mean colour and
+    contrast go through a two-layer perceptron with fixed (seeded, untrained)
+    weights and patches scoring above threshold become "obstacle" boxes. It
+    has the interface a real backend needs (load, warmup, predict on a
+    batch) and a per-frame cost that grows with the batch like one would.
+    """
+
+    labels = ("obstacle",)
+
+    def __init__(self, cell=32, hidden=64, threshold=0.3, seed=0):
+        self.cell = cell
+        self.hidden = hidden
+        self.threshold = threshold
+        self.seed = seed
+        self.weights = None
+
+    def load(self):
+        rng = np.random.default_rng(self.seed)
+        self.weights = (rng.normal(0, 1, (6, self.hidden)).astype(np.float32),
+                        np.zeros(self.hidden, np.float32),
+                        rng.normal(0, 0.5, self.hidden).astype(np.float32),
+                        np.float32(-2.0))
+        return self
+
+    def warmup(self, shape, batch_size=1):
+        self.predict(np.zeros((batch_size,) + tuple(shape), np.uint8))
+
+    def predict(self, batch):
+        """batch is (n, height, width, 3) uint8; returns one list of Detections per frame."""
+        n, height, width = batch.shape[:3]
+        rows, cols, cell = height // self.cell, width // self.cell, self.cell
+        x = batch[:, :rows * cell, :cols * cell].astype(np.float32).reshape(n * rows, cell, cols, cell, 3)
+        # per-patch sums and sums of squares, reducing one pixel axis at a time
+        total = x.sum(axis=1).reshape(n, rows, cols, cell, 3).sum(axis=3)
+        squares = np.einsum("abcde,abcde->acde", x, x).reshape(n, rows, cols, cell, 3).sum(axis=3)
+        mean = total / (cell * cell * 255.0)
+        std = np.sqrt(np.maximum(squares / (cell * cell * 255.0**2) - mean**2, 0))
+        w1, b1, w2, b2 = self.weights
+        features = np.concatenate([mean, std], axis=-1)
+        scores = 1.0 / (1.0 + np.exp(-(np.maximum(features @ w1 + b1, 0) @ w2 + b2)))
+        detections = [[] for _ in range(n)]
+        for k, r, c in zip(*np.nonzero(scores > self.threshold)):
+            box = (int(c * cell), int(r * cell), int((c + 1) * cell), int((r + 1) * cell))
+            detections[k].append(Detection(self.labels[0], float(scores[k, r, c]), box))
+        return detections
+
+
+class SavedModelDetector:
+    """Adapter for a TensorFlow SavedModel/Keras detector; TensorFlow is imported in load().
+
+    The model is called on a float32 batch scaled to [0, 1] and must return
+    (boxes, scores) of shape (n, k, 4) and (n, k), boxes in pixels.
+    """
+
+    labels = ("obstacle",)
+
+    def __init__(self, path, threshold=0.5):
+        self.path = path
+        self.threshold = threshold
+        self.model = None
+
+    def load(self):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(self.path)
+        return self
+
+    def warmup(self, shape, batch_size=1):
+        self.predict(np.zeros((batch_size,) + tuple(shape), np.uint8))
+
+    def predict(self, batch):
+        boxes, scores = self.model(batch.astype(np.float32) / 255.0, training=False)
+        boxes, scores = np.asarray(boxes), np.asarray(scores)
+        return [[Detection(self.labels[0], float(s), tuple(int(v) for v in b))
+                 for b, s in zip(boxes[k], scores[k]) if s >= self.threshold] for k in range(len(batch))]
+
+
+_models = {}
+
+
+def load_model(spec="tiny", **kwargs):
+    """Return a loaded model, built once per process for each (spec, kwargs).
+
+    spec is "tiny" for the TinyDetector, a path to a saved TensorFlow model,
+    or an object that already has load/warmup/predict.
+    """
+    if not isinstance(spec, str):
+        return spec
+    key = (spec, tuple(sorted(kwargs.items())))
+    if key not in _models:
+        model = TinyDetector(**kwargs) if spec == "tiny" else SavedModelDetector(spec, **kwargs)
+        _models[key] = model.load()
+    return _models[key]
+
+
+class InferenceBatcher:
+    """Collects frames from any number of vehicles and runs them through the model in batches.
+
+    submit() queues a frame under a key (typically the vehicle index) and
+    runs the model once max_batch frames are waiting or the oldest waiting
+    frame is older than deadline seconds; poll() applies the deadline
+    between submissions, and flush() runs whatever is waiting. Frames must
+    share one shape; they are copied into a reused batch buffer. The model
+    is warmed up on a full batch of each new frame shape before its first
+    real call, at construction when warmup_shape is given. The newest result
+    per key is kept in `results`, and counters record how many calls and
+    frames were processed.
+    """
+
+    def __init__(self, model, max_batch=16, deadline=0.02, warmup_shape=None):
+        self.model = model
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self._buffer = None
+        self._pending = []  # (key, frame_time, submitted_at)
+        self._warm = set()  # frame shapes the model has been warmed up on
+        self.results = {}
+        self.calls = 0
+        self.frames = 0
+        if warmup_shape is not None:
+            self._allocate(tuple(warmup_shape))
+
+    def _allocate(self, shape):
+        self._buffer = np.empty((self.max_batch,) + shape, np.uint8)
+        if shape not in self._warm:
+            self.model.warmup(shape, self.max_batch)
+            self._warm.add(shape)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, key, frame, frame_time=0.0):
+        """Queue a frame; returns the DetectionResults produced if this filled a batch or hit the deadline, else []."""
+        frame = frame_array(frame)
+        if self._buffer is None or self._buffer.shape[1:] != frame.shape:
+            self.flush()
+            self._allocate(frame.shape)
+        self._buffer[len(self._pending)] = frame
+        now = time.perf_counter()
+        self._pending.append((key, frame_time, now))
+        if len(self._pending) == self.max_batch or now - self._pending[0][2] >= self.deadline:
+            return self.flush()
+        return []
+
+    def poll(self):
+        """Run the waiting frames if the oldest has passed the deadline."""
+        if self._pending and time.perf_counter() - self._pending[0][2] >= self.deadline:
+            return self.flush()
+        return []
+
+    def flush(self):
+        if not self._pending:
+            return []
+        n = len(self._pending)
+        start = time.perf_counter()
+        detections = self.model.predict(self._buffer[:n])
+        end = time.perf_counter()
+        results = [DetectionResult(key, frame_time, found, n, start - submitted_at, end - start)
+                   for (key, frame_time, submitted_at), found in zip(self._pending, detections)]
+        for result in results:
+            self.results[result.key] = result
+        self._pending = []
+        self.calls += 1
+        self.frames += n
+        return results
+
+    def infer(self, frames, frame_time=0.0):
+        """Run a list of frames (keyed by position) and return their DetectionResults in order."""
+        results = []
+        for key, frame in enumerate(frames):
+            results.extend(self.submit(key, frame, frame_time))
+        results.extend(self.flush())
+        return results
+
+
+def vehicle_views(image, n, size=(160, 120), seed=0):
+    """n crops of one image, standing in for per-vehicle camera frames."""
+    rng = np.random.default_rng(seed)
+    height, width = image.shape[:2]
+    xs = rng.integers(0, width - size[0], n)
+    ys = rng.integers(0, height - size[1], n)
+    return [np.ascontiguousarray(image[y:y + size[1], x:x + size[0]]) for x, y in zip(xs, ys)]
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Per-vehicle vs batched detection throughput.")
+    parser.add_argument("--vehicles", type=int, default=64)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    import pygame
+    asset = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "city", "4Wayroad800x600.png")
+    views = vehicle_views(frame_array(pygame.image.load(asset)), args.vehicles)
+    model = load_model("tiny")
+    shape = views[0].shape
+
+    single = InferenceBatcher(model, max_batch=1, warmup_shape=shape)
+    batched = InferenceBatcher(model, max_batch=args.max_batch, warmup_shape=shape)
+    for name, batcher in (("one call per vehicle", single), ("batched", batched)):
+        start = time.perf_counter()
+        for i in range(args.frames):
+            results = batcher.infer(views, frame_time=i)
+        elapsed = time.perf_counter() - start
+        print("{:<22} {:6d} calls {:9.0f} frames/s  ({} detections in last frame set)".format(
+            name, batcher.calls, args.vehicles * args.frames / elapsed, sum(len(r.detections) for r in results)))
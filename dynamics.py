@@ -0,0 +1,144 @@
+import numpy as np
+from scipy.integrate import odeint
+from constants import RHO, G, F_BRAKE_MAX, V_HOLD
+from vehicle_params import vehicle_parameters
+from road_map import SurfaceTable
+from telemetry import TRACE, TRACE_STEP, TRACE_RHS
+from profiler import PROFILER
+
+
+class CarState:
+    def __init__(self, position=0, velocity=0, lateral_position=0, lateral_velocity=0, orientation=0, yaw_rate=0) -> None:
+        self.position = position
+        self.velocity = velocity
+        self.lateral_position = lateral_position
+        self.lateral_velocity = lateral_velocity
+        self.orientation = orientation #heading
+        self.yaw_rate = yaw_rate  # a state only of bicycle.DynamicCar; not part of as_list()
+        # self.steering_angle= #front wheel
+    def as_list(self):
+        return [self.position,self.velocity,self.lateral_position,self.lateral_velocity, self.orientation]
+
+class Car:
+    def __init__(self, surface=None):
+        self.mass = vehicle_parameters["mass"]
+        self.drag_coefficient = vehicle_parameters["drag_coefficient"]
+        self.max_steering_angle = np.pi / 6
+        self.max_acceptable_acceleration = 50.0
+        self._throttle = 1
+        self._brake = 0
+        self._steering_angle = 0
+        self.elapsed = 0.0  # sim-time integrated so far, used to timestamp trace samples
+        # Road surface under the car by position: a SurfaceTable, a RoadMap, or None for uniform asphalt
+        if surface is None:
+            surface = SurfaceTable.uniform()
+        elif not isinstance(surface, SurfaceTable):
+            surface = surface.surface_table()
+        self.surface = surface
+    @property
+    def throttle(self):
+        return self._throttle
+    @throttle.setter
+    def throttle(self, value):
+        self._throttle = max(0, min(1, value))
+    @property
+    def brake(self):
+        return self._brake
+    @brake.setter
+    def brake(self, value):
+        self._brake = max(0, min(1, value))
+    @property
+    def steering_angle(self):
+        return self._steering_angle
+    @steering_angle.setter
+    def steering_angle(self,value):
+        self._steering_angle = max(-self.max_steering_angle,min(value,self.max_steering_angle))
+    def traction_control(self, acceleration, engine_torque, friction=0.9):
+        if acceleration > self.max_acceptable_acceleration:
+            engine_torque = engine_torque * self.max_acceptable_acceleration / acceleration
+        # the tyres cannot put more than friction * m * g on the road
+        return min(engine_torque, friction * self.mass * G * vehicle_parameters["tire_radius"])
+
+    def longitudinal_forces(self, v, engine_torque, rolling_coefficient=0.015, friction=0.9):
+        """Return (F_engine, F_brake, F_drag, F_net) at speed v; the defaults are asphalt.
+
+        Brake and rolling resistance oppose the motion and fade out linearly
+        below V_HOLD, so a braked car comes to rest at v = 0 instead of being
+        pushed backwards, and the right-hand side stays continuous there.
+        """
+        hold = max(-1.0, min(v / V_HOLD, 1.0))
+        F_drag = 0.5 * RHO * vehicle_parameters["frontal_area"] * self.drag_coefficient * v ** 2
+        F_rolling = self.mass * G * rolling_coefficient * hold
+
+        F_net_without_engine_brake = -F_drag - F_rolling
+        a = F_net_without_engine_brake / self.mass
+
+        engine_max_torque = self.traction_control(a, engine_torque, friction)
+        F_engine_max = engine_max_torque / vehicle_parameters["tire_radius"]
+        F_engine = self._throttle * F_engine_max
+        F_brake = min(self._brake * F_BRAKE_MAX, friction * self.mass * G) * hold
+
+        F_net = F_engine + F_net_without_engine_brake - F_brake
+        return F_engine, F_brake, F_drag, F_net
+
+    def longitudinal_dynamics(self, v, engine_torque, rolling_coefficient=0.015, friction=0.9):
+        return self.longitudinal_forces(v, engine_torque, rolling_coefficient, friction)[3] / self.mass
+
+    def lateral_dynamics(self, v_y, slip_angle, friction=0.9):
+        F_cornering = -vehicle_parameters["tire_cornering_stiffness"] * slip_angle
+        F_grip = friction * self.mass * G  # cornering force saturates at the grip limit
+        a_y = max(-F_grip, min(F_cornering, F_grip)) / self.mass
+        return a_y
+
+    def state_vector(self, state: CarState):
+        """The integrated state vector of a CarState."""
+        return state.as_list()
+
+    def make_state(self, values) -> CarState:
+        return CarState(*values)
+
+    def equations_of_motion(self, state, t, engine_torque, steering_angle, slip_angle):
+        return self.derivatives_on_surface(state, t, engine_torque, steering_angle, *self.surface.at(state[0]))
+
+    def derivatives_on_surface(self, state, t, engine_torque, steering_angle, rolling_coefficient, friction):
+        """equations_of_motion with the road surface given instead of looked up by position."""
+        position, velocity, lateral_position, lateral_velocity, orientation = state
+        slip_angle = np.arctan2(lateral_velocity, velocity)
+        adjust_slip_angle = slip_angle + steering_angle
+
+        F_engine, F_brake, F_drag, F_net = self.longitudinal_forces(velocity, engine_torque, rolling_coefficient, friction)
+        acceleration = F_net / self.mass
+        lateral_acceleration = self.lateral_dynamics(lateral_velocity, adjust_slip_angle, friction)
+
+        dv_dt = acceleration
+        dv_y_dt = lateral_acceleration
+        dx_dt = velocity * np.cos(orientation)
+        dy_dt = velocity * np.sin(orientation)
+        dtheta_dt = velocity  * np.sin(steering_angle) / vehicle_parameters["wheelbase"]
+        if TRACE.level >= TRACE_RHS:
+            TRACE.record(self.elapsed + t, F_engine, F_brake, F_drag, F_net, dtheta_dt, self._throttle, self._brake, steering_angle)
+        return [dx_dt, dv_dt, dy_dt, dv_y_dt, dtheta_dt]
+
+    def acceleration(self, state, engine_torque):
+        """Longitudinal acceleration dv/dt at a state vector, the derivative the integrator uses."""
+        return self.longitudinal_dynamics(state[1], engine_torque, *self.surface.at(state[0]))
+
+    def get_next_state(self, state: CarState, Dt, engine_torque, slip_angle, steering_angle) -> CarState:
+        # Integrate equations of motion over dt to get the next state
+        t = [0, Dt]
+        current_state_list=state.as_list()
+        args = (engine_torque, steering_angle, slip_angle)
+        if PROFILER.enabled:
+            # odeint already counts its RHS evaluations; ask for them instead of wrapping the RHS
+            solution, info = odeint(self.equations_of_motion, current_state_list, t, args=args, full_output=True)
+            PROFILER.count("rhs_calls", int(info["nfe"][-1]))
+            next_state_values = solution[1]
+        else:
+            next_state_values = odeint(self.equations_of_motion, current_state_list, t, args=args)[1]
+        self.elapsed += Dt
+        if TRACE.level == TRACE_STEP:
+            F_engine, F_brake, F_drag, F_net = self.longitudinal_forces(next_state_values[1], engine_torque,
+                                                                        *self.surface.at(next_state_values[0]))
+            dtheta_dt = next_state_values[1] * np.sin(steering_angle) / vehicle_parameters["wheelbase"]
+            TRACE.record(self.elapsed, F_engine, F_brake, F_drag, F_net, dtheta_dt, self._throttle, self._brake, steering_angle)
+        return CarState(*next_state_values)
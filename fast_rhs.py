@@ -0,0 +1,249 @@
+import importlib.util
+import math
+import numpy as np
+from scipy.integrate import odeint
+from constants import RHO, G, F_BRAKE_MAX, V_HOLD
+from vehicle_params import vehicle_parameters
+from dynamics import Car, CarState
+
+def numba_available():
+    # numba is optional and slow to import, so it is only loaded when compiling
+    return importlib.util.find_spec("numba") is not None
+
+
+def _njit(function):
+    if not numba_available():
+        raise RuntimeError("use_numba=True but numba is not installed")
+    import numba
+    return numba.njit(cache=True)(function)
+
+# Slots of the flat parameter array built by pack_parameters
+P_MASS, P_DRAG_FACTOR, P_ROLLING_FORCE, P_TIRE_RADIUS, P_CORNERING_STIFFNESS, \
+    P_WHEELBASE, P_MAX_ACCELERATION, P_THROTTLE, P_BRAKE, P_BRAKE_MAX, P_GRIP = range(11)
+N_PARAMETERS = 11
+
+
+def pack_parameters(params=None, throttle=1.0, brake=0.0, rolling_coefficient=0.015,
+                    max_acceptable_acceleration=50.0, friction=0.9):
+    """Resolve vehicle parameters, controls and the road surface once into a flat float array.
+
+    The defaults for rolling_coefficient and friction are asphalt.
+    """
+    params = vehicle_parameters if params is None else params
+    p = np.empty(N_PARAMETERS)
+    p[P_MASS] = params["mass"]
+    p[P_DRAG_FACTOR] = 0.5 * RHO * params["frontal_area"] * params["drag_coefficient"]
+    p[P_ROLLING_FORCE] = params["mass"] * G * rolling_coefficient
+    p[P_TIRE_RADIUS] = params["tire_radius"]
+    p[P_CORNERING_STIFFNESS] = params["tire_cornering_stiffness"]
+    p[P_WHEELBASE] = params["wheelbase"]
+    p[P_MAX_ACCELERATION] = max_acceptable_acceleration
+    p[P_THROTTLE] = throttle
+    p[P_BRAKE] = brake
+    p[P_BRAKE_MAX] = F_BRAKE_MAX
+    p[P_GRIP] = friction * params["mass"] * G
+    return p
+
+
+def equations_of_motion(state, t, engine_torque, steering_angle, slip_angle, p):
+    """dynamics.Car.equations_of_motion on plain floats, parameters from pack_parameters.
+
+    p is indexed by literal slot number (see the P_* constants) so the function
+    also compiles unchanged under numba.
+    """
+    velocity = state[1]
+    lateral_velocity = state[3]
+    orientation = state[4]
+    mass = p[0]
+
+    hold = min(max(velocity / V_HOLD, -1.0), 1.0)
+    F_net_without_engine_brake = -p[1] * velocity * velocity - p[2] * hold
+    a = F_net_without_engine_brake / mass
+    if a > p[6]:
+        engine_torque = engine_torque * p[6] / a
+    if engine_torque > p[10] * p[3]:
+        engine_torque = p[10] * p[3]
+    F_brake = min(p[8] * p[9], p[10]) * hold
+    F_net = p[7] * engine_torque / p[3] + F_net_without_engine_brake - F_brake
+
+    adjust_slip_angle = math.atan2(lateral_velocity, velocity) + steering_angle
+    F_cornering = min(max(-p[4] * adjust_slip_angle, -p[10]), p[10])
+    return (velocity * math.cos(orientation),
+            F_net / mass,
+            velocity * math.sin(orientation),
+            F_cornering / mass,
+            velocity * math.sin(steering_angle) / p[5])
+
+
+def car_model_equations_of_motion(state, t, engine_torque, brake_force, steering_angle, slip_angle, p):
+    """car_model.Car.equations_of_motion on plain floats, parameters from pack_parameters.
+
+    car_model evaluates traction control with zero acceleration, so it never
+    limits the torque and is left out here.
+    """
+    velocity = state[1]
+    lateral_velocity = state[3]
+    orientation = state[4]
+    mass = p[0]
+
+    F_net = engine_torque / p[3] - p[1] * velocity * velocity - p[2] - brake_force
+    adjust_slip_angle = math.atan2(lateral_velocity, velocity) + steering_angle
+    heading = orientation + steering_angle
+    return (velocity * math.cos(heading),
+            F_net / mass,
+            velocity * math.sin(heading),
+            -p[4] * adjust_slip_angle / mass,
+            velocity / p[5] * math.tan(steering_angle))
+
+
+def jacobian(state, t, engine_torque, steering_angle, slip_angle, p):
+    """Analytic Jacobian of equations_of_motion, J[i, j] = d f_i / d state_j.
+
+    Usable as odeint's Dfun (with col_deriv=False) so the solver does not
+    estimate it by finite differences.
+    """
+    velocity = state[1]
+    lateral_velocity = state[3]
+    orientation = state[4]
+    mass = p[0]
+    cos_o = math.cos(orientation)
+    sin_o = math.sin(orientation)
+
+    J = np.zeros((5, 5))
+    J[0, 1] = cos_o
+    J[0, 4] = -velocity * sin_o
+    J[2, 1] = sin_o
+    J[2, 4] = velocity * cos_o
+
+    dF_dv = -2.0 * p[1] * velocity
+    dF_brake_dv = 0.0
+    hold = 1.0 if velocity >= V_HOLD else -1.0
+    if -V_HOLD < velocity < V_HOLD:
+        # brake and rolling resistance fade out linearly towards v = 0
+        hold = velocity / V_HOLD
+        dF_dv -= p[2] / V_HOLD
+        dF_brake_dv = min(p[8] * p[9], p[10]) / V_HOLD
+    a = (-p[1] * velocity * velocity - p[2] * hold) / mass
+    if a > p[6] and engine_torque * p[6] / a < p[10] * p[3]:
+        # traction control scales the torque by max_acceleration / a
+        dF_dv -= p[7] * engine_torque * p[6] / (a * a * p[3]) * dF_dv / mass
+    J[1, 1] = (dF_dv - dF_brake_dv) / mass
+
+    speed_sq = velocity * velocity + lateral_velocity * lateral_velocity
+    # a saturated cornering force no longer depends on the slip angle
+    if speed_sq > 0.0 and p[4] * abs(math.atan2(lateral_velocity, velocity) + steering_angle) < p[10]:
+        J[3, 1] = p[4] * lateral_velocity / (mass * speed_sq)
+        J[3, 3] = -p[4] * velocity / (mass * speed_sq)
+    J[4, 1] = math.sin(steering_angle) / p[5]
+    return J
+
+
+def car_model_jacobian(state, t, engine_torque, brake_force, steering_angle, slip_angle, p):
+    """Analytic Jacobian of car_model_equations_of_motion."""
+    velocity = state[1]
+    lateral_velocity = state[3]
+    heading = state[4] + steering_angle
+    mass = p[0]
+
+    J = np.zeros((5, 5))
+    J[0, 1] = math.cos(heading)
+    J[0, 4] = -velocity * math.sin(heading)
+    J[1, 1] = -2.0 * p[1] * velocity / mass
+    J[2, 1] = math.sin(heading)
+    J[2, 4] = velocity * math.cos(heading)
+    speed_sq = velocity * velocity + lateral_velocity * lateral_velocity
+    if speed_sq > 0.0:
+        J[3, 1] = p[4] * lateral_velocity / (mass * speed_sq)
+        J[3, 3] = -p[4] * velocity / (mass * speed_sq)
+    J[4, 1] = math.tan(steering_angle) / p[5]
+    return J
+
+
+def make_rhs(model="sim", use_numba=False, tfirst=False):
+    """Return the fast right-hand side for `model` ("sim" or "car_model").
+
+    With tfirst the function takes (t, state, ...) as solve_ivp expects;
+    otherwise (state, t, ...) as odeint expects. use_numba compiles the
+    function with numba.njit, which must then be installed.
+    """
+    rhs = equations_of_motion if model == "sim" else car_model_equations_of_motion
+    if use_numba:
+        rhs = _njit(rhs)
+    if tfirst:
+        inner = rhs
+        rhs = lambda t, state, *args: inner(state, t, *args)
+    return rhs
+
+
+def make_jacobian(model="sim", use_numba=False, tfirst=False):
+    """Return the analytic Jacobian matching make_rhs(model, use_numba, tfirst)."""
+    jac = jacobian if model == "sim" else car_model_jacobian
+    if use_numba:
+        jac = _njit(jac)
+    if tfirst:
+        inner = jac
+        jac = lambda t, state, *args: inner(state, t, *args)
+    return jac
+
+
+class FastCar(Car):
+    """Car whose get_next_state integrates the flat-parameter RHS.
+
+    Parameters, controls and the road surface are resolved once per step
+    rather than on every derivative evaluation, so the surface is the one
+    under the car at the start of the step. The telemetry trace is not
+    recorded at RHS level.
+    """
+
+    def __init__(self, params=None, use_numba=False, surface=None):
+        super().__init__(surface)
+        self.params = vehicle_parameters if params is None else params
+        self.mass = self.params["mass"]
+        self.drag_coefficient = self.params["drag_coefficient"]
+        self.use_numba = use_numba
+        self.rhs = make_rhs("sim", use_numba)
+
+    def pack_parameters(self, position=0.0):
+        rolling_coefficient, friction = self.surface.at(position)
+        p = pack_parameters(self.params, self._throttle, self._brake, rolling_coefficient,
+                            self.max_acceptable_acceleration, friction)
+        # Python floats index and multiply faster than NumPy scalars; numba wants the array
+        return p if self.use_numba else p.tolist()
+
+    def equations_of_motion(self, state, t, engine_torque, steering_angle, slip_angle):
+        return self.rhs(state, t, engine_torque, steering_angle, slip_angle, self.pack_parameters(state[0]))
+
+    def get_next_state(self, state: CarState, Dt, engine_torque, slip_angle, steering_angle) -> CarState:
+        p = self.pack_parameters(state.position)
+        next_state_values = odeint(self.rhs, state.as_list(), [0, Dt], args=(engine_torque, steering_angle, slip_angle, p))[1]
+        self.elapsed += Dt
+        return CarState(*next_state_values)
+
+
+def check_equivalence(samples=1000, seed=0, rtol=1e-9, atol=1e-9):
+    """Compare the fast RHS with both reference models on random states.
+
+    Returns the largest absolute difference found, raises AssertionError on a mismatch.
+    """
+    import car_model
+
+    rng = np.random.default_rng(seed)
+    car = Car()
+    old_car = car_model.Car()
+    p = pack_parameters()
+    worst = 0.0
+    for _ in range(samples):
+        state = rng.uniform([-100, 0, -10, -5, -np.pi], [100, 50, 10, 5, np.pi])
+        torque = rng.uniform(0, 450)
+        steering = rng.uniform(-car.max_steering_angle, car.max_steering_angle)
+        brake_force = rng.uniform(0, 1000)
+        pairs = [
+            (car.equations_of_motion(state, 0.0, torque, steering, 0.05),
+             equations_of_motion(state, 0.0, torque, steering, 0.05, p)),
+            (old_car.equations_of_motion(state, 0.0, torque, brake_force, steering, 0.05),
+             car_model_equations_of_motion(state, 0.0, torque, brake_force, steering, 0.05, p)),
+        ]
+        for expected, actual in pairs:
+            np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol)
+            worst = max(worst, float(np.max(np.abs(np.subtract(actual, expected)))))
+    return worst
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import pygame
+
+# Rows of padding kept around the ROI band so blur, Canny and dilation see the
+# same neighbourhood at the band edges as they would on the full frame
+ROI_MARGIN = 8
+
+
+def roi_rows(height):
+    """First and last (inclusive) frame row of the lane ROI rectangle."""
+    return height // 2 - 30, 2 * height // 3 - 20
+
+
+def roi_polygon(width, height):
+    top, bottom = roi_rows(height)
+    top_left, bottom_right = (-50, top), (width + 150, bottom)
+    return np.array([[top_left, (bottom_right[0], top_left[1]), bottom_right, (top_left[0], bottom_right[1])]], dtype=np.int32)
+
+
+class LaneDetectionStage:
+    """Lane detection over the ROI band only, reusing its buffers between frames.
+
+    The ROI is a full-width horizontal band, so the frame is cropped to that
+    band (plus ROI_MARGIN rows) before any filtering, and the fixed ROI mask
+    reduces to zeroing the margin rows. Buffers are allocated on the first
+    frame of a given size and reused afterwards.
+    """
+
+    def __init__(self, minLineLength=95, maxLineGap=100, canny_thresholds=(255, 255), solid_line_threshold=200.0):
+        self.minLineLength = minLineLength
+        self.maxLineGap = maxLineGap
+        self.canny_thresholds = canny_thresholds
+        self.solid_line_threshold = solid_line_threshold
+        self.kernel = np.ones((3, 3), np.uint8)
+        self._shape = None
+
+    def _allocate(self, height, width):
+        top, bottom = roi_rows(height)
+        self.band = (max(top - ROI_MARGIN, 0), min(bottom + 1 + ROI_MARGIN, height))
+        self.roi = (top - self.band[0], bottom + 1 - self.band[0])  # ROI rows inside the band
+        band_height = self.band[1] - self.band[0]
+        self.rgb = np.empty((band_height, width, 3), np.uint8)
+        self.gray = np.empty((band_height, width), np.uint8)
+        self.contrasted = np.empty_like(self.gray)
+        self.blurred = np.empty_like(self.gray)
+        self.edges = np.empty_like(self.gray)
+        self.dilated = np.empty_like(self.gray)
+        self.polygon = roi_polygon(width, height)
+        self.frame = np.empty((height, width, 3), np.uint8)
+        self.line_image = np.zeros((height, width, 3), np.uint8)
+        self.overlay = np.empty((height, width, 3), np.uint8)
+        self._shape = (height, width)
+
+    def _edges(self):
+        cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY, dst=self.gray)
+        cv2.convertScaleAbs(self.gray, dst=self.contrasted, alpha=1.5, beta=0)
+        cv2.GaussianBlur(self.contrasted, (5, 5), 0, dst=self.blurred)
+        cv2.Canny(self.blurred, *self.canny_thresholds, edges=self.edges)
+        cv2.dilate(self.edges, self.kernel, dst=self.dilated, iterations=1)
+        # ROI mask: everything outside the ROI rows is the margin
+        self.dilated[:self.roi[0]] = 0
+        self.dilated[self.roi[1]:] = 0
+        lines = cv2.HoughLinesP(self.dilated, 2, np.pi/180, 100, np.array([]), minLineLength=self.minLineLength, maxLineGap=self.maxLineGap)
+        if lines is not None:
+            lines[..., 1] += self.band[0]  # back to frame coordinates
+            lines[..., 3] += self.band[0]
+        return lines
+
+    def process(self, frame, draw=True):
+        """Detect lanes in an (height, width, 3) RGB array; any strides are accepted.
+
+        Returns (lines, overlay). The overlay reuses an internal buffer and is
+        None when draw is False; copy it if it must outlive the next call.
+        """
+        height, width = frame.shape[:2]
+        if self._shape != (height, width):
+            self._allocate(height, width)
+        np.copyto(self.rgb, frame[self.band[0]:self.band[1]])
+        lines = self._edges()
+        if not draw:
+            return lines, None
+        np.copyto(self.frame, frame)
+        return lines, self._draw(lines)
+
+    def process_surface(self, surface, draw=True):
+        """Detect lanes on a pygame surface, reading its pixels without a full-frame copy."""
+        try:
+            pixels = pygame.surfarray.pixels3d(surface)  # (width, height, 3) view, locks the surface
+        except ValueError:  # palette or 16-bit surfaces have no direct RGB view
+            pixels = pygame.surfarray.array3d(surface)
+        try:
+            return self.process(pixels.transpose(1, 0, 2), draw)
+        finally:
+            del pixels  # unlock the surface
+
+    def _draw(self, lines):
+        self.line_image.fill(0)
+        if lines is not None:
+            for line in lines:
+                x1, y1, x2, y2 = line.reshape(4)
+                length = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
+
+                if length > self.solid_line_threshold:  # Solid line
+                    cv2.line(self.line_image, (x1, y1), (x2, y2), (0, 255, 0), 10)
+                else:  # Dashed line
+                    cv2.line(self.line_image, (x1, y1), (x2, y2), (0, 0, 255), 10)
+        cv2.addWeighted(self.frame, 0.8, self.line_image, 1, 1, dst=self.overlay)
+        # Draw the ROI polygon for debugging purposes
+        cv2.polylines(self.overlay, [self.polygon], isClosed=True, color=(255, 255, 0), thickness=2)
+        return self.overlay
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import namedtuple
+from lane_detection import LaneDetectionStage
+
+# lane_center and slope as returned by Road.calculate_lane_center_and_slope;
+# frame_time is the caller's (simulation) timestamp of the frame, submitted_at
+# and published_at are time.perf_counter() readings for latency accounting
+LaneEstimate = namedtuple("LaneEstimate", "lane_center slope lines frame_id frame_time submitted_at published_at")
+
+
+class PerceptionWorker:
+    """Lane detection on a background thread, fed through a single-slot mailbox.
+
+    submit() never blocks: a frame still waiting in the slot is replaced by the
+    newer one and counted as dropped. The worker publishes a LaneEstimate per
+    processed frame and latest() returns the newest one without waiting, so
+    the caller's loop timing does not depend on perception latency. OpenCV
+    releases the GIL while it filters, so physics keeps running meanwhile.
+    With synchronous=True frames are processed inside submit(), for
+    reproducible headless runs.
+    """
+
+    def __init__(self, road, stage=None, synchronous=False):
+        self.road = road
+        self.stage = stage if stage is not None else LaneDetectionStage()
+        self.synchronous = synchronous
+        self._cond = threading.Condition()
+        self._slot = None
+        self._latest = None
+        self._running = False
+        self._thread = None
+        self._frame_id = 0
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def start(self):
+        if not self.synchronous and self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="perception", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, surface, frame_time):
+        """Queue a copy of a pygame surface for detection, replacing any stale frame."""
+        frame = (surface.copy(), self._frame_id, frame_time, time.perf_counter())
+        self._frame_id += 1
+        self.submitted += 1
+        if self.synchronous:
+            self._process(frame)
+            return
+        with self._cond:
+            if self._slot is not None:
+                self.dropped += 1
+            self._slot = frame
+            self._cond.notify()
+
+    def latest(self):
+        """Return the newest LaneEstimate, or None before the first one is published."""
+        return self._latest
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._slot is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, self._slot = self._slot, None
+            self._process(frame)
+
+    def _process(self, frame):
+        surface, frame_id, frame_time, submitted_at = frame
+        lines, _ = self.stage.process_surface(surface, draw=False)
+        lane_center, slope = self.road.calculate_lane_center_and_slope(lines)
+        # a single reference assignment, so readers never see a half-written estimate
+        self._latest = LaneEstimate(lane_center, slope, lines, frame_id, frame_time, submitted_at, time.perf_counter())
+        self.processed += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,213 @@
+import argparse
+import math
+import time
+import numpy as np
+from adaptive import EventIntegrator, Powertrain
+from dynamics import Car, CarState
+from telemetry import TRACE, TRACE_STEP, TRACE_RHS
+from profiler import PROFILER
+from trajectory import TrajectoryStore, TRAJECTORY_DTYPE
+
+dt = 0.05  # Time step for simulation
+engine_torque = 320
+slip_angle = 0.05
+MAX_SUBSTEPS = 8  # physics steps per advance() before backlog is dropped
+MAX_FRAME_TIME = 0.25  # wall seconds one advance() accepts, e.g. after a stall or window drag
+
+
+class PhysicsLoop:
+    """Steps the car dynamics and keeps the state history, with no rendering.
+
+    Renderers and other consumers register with add_subscriber and get called
+    every `every` physics steps, so they can run at a lower rate than physics.
+    history_capacity turns the history into a ring holding the newest samples.
+
+    For real-time use, advance() feeds wall time into an accumulator and runs
+    however many fixed Dt steps fit, and interpolated() blends the last two
+    states for drawing, so frame rate and physics rate are independent.
+
+    powertrain (adaptive.Powertrain, default direct drive) turns engine_torque
+    into wheel torque. adaptive=True integrates each Dt with an
+    adaptive.EventIntegrator, which stops at gear shifts, surface changes and
+    the car braking to rest, instead of one odeint call; history is still
+    sampled every Dt.
+    """
+
+    def __init__(self, car=None, state=None, Dt=dt, engine_torque=engine_torque, slip_angle=slip_angle, history_capacity=None,
+                 powertrain=None, adaptive=False):
+        self.car = car if car is not None else Car()
+        self.current_state = state if state is not None else CarState()
+        self.Dt = Dt
+        self.engine_torque = engine_torque
+        self.slip_angle = slip_angle
+        self.powertrain = powertrain if powertrain is not None else Powertrain.direct()
+        self.gear = None
+        self.integrator = EventIntegrator(self.car, self.powertrain, engine_torque, slip_angle) if adaptive else None
+        self.t = 0.0
+        self.step_count = 0
+        self.history = TrajectoryStore(capacity=history_capacity)
+        self._subscribers = []
+        self.accumulator = 0.0
+        self.dropped_time = 0.0  # wall time discarded by the substep cap
+        self._blend = np.zeros(1, dtype=TRAJECTORY_DTYPE)
+
+    @property
+    def positions(self):
+        return self.history.column("position")
+    @property
+    def velocities(self):
+        return self.history.column("velocity")
+    @property
+    def lateral_positions(self):
+        return self.history.column("lateral_position")
+    @property
+    def orientations(self):
+        return self.history.column("orientation")
+
+    def add_subscriber(self, callback, every=1):
+        """Call callback(loop) after every `every` physics steps."""
+        self._subscribers.append((callback, max(1, int(every))))
+
+    def remove_subscriber(self, callback):
+        self._subscribers = [(cb, every) for cb, every in self._subscribers if cb is not callback]
+
+    @property
+    def adaptive(self):
+        return self.integrator is not None
+
+    def update_dynamics(self, DT=None):
+        DT = self.Dt if DT is None else DT
+        if self.integrator is not None:
+            self.integrator.engine_torque = self.engine_torque
+            result = self.integrator.run(self.current_state, DT, DT)
+            self.car.elapsed += DT
+            self.current_state = self.car.make_state(result.y[-1])
+            self.gear = self.integrator.gear
+            acceleration = result.acceleration[-1]
+        else:
+            self.gear = self.powertrain.shift(self.current_state.velocity, self.gear)
+            torque = self.powertrain.wheel_torque(self.engine_torque, self.gear)
+            self.current_state = self.car.get_next_state(self.current_state, DT, torque, self.slip_angle, self.car.steering_angle)
+            acceleration = self.car.acceleration(self.current_state.as_list(), torque)
+        self.t += DT
+        self.history.append(self.t, self.current_state, acceleration)
+        self.step_count += 1
+        PROFILER.count("physics_steps")
+
+    def step(self, DT=None):
+        self.update_dynamics(DT)
+        self._notify()
+
+    def _notify(self):
+        for callback, every in self._subscribers:
+            if self.step_count % every == 0:
+                callback(self)
+
+    def advance(self, elapsed, max_substeps=MAX_SUBSTEPS):
+        """Add elapsed wall seconds and take every whole Dt step now due, at most max_substeps.
+
+        Returns the fraction of a step left in the accumulator, the blend
+        factor for interpolated(). When the cap is hit the remaining backlog
+        is dropped (and added to dropped_time) so a slow machine runs slower
+        than real time instead of spiralling.
+        """
+        self.accumulator += min(elapsed, MAX_FRAME_TIME)
+        substeps = 0
+        while self.accumulator >= self.Dt and substeps < max_substeps:
+            self.step()
+            self.accumulator -= self.Dt
+            substeps += 1
+        if self.accumulator >= self.Dt:
+            backlog = self.accumulator - self.accumulator % self.Dt
+            self.dropped_time += backlog
+            self.accumulator -= backlog
+        return self.accumulator / self.Dt
+
+    def interpolated(self, alpha):
+        """Record blending the previous and current state by alpha in [0, 1).
+
+        The record is a reused buffer with the history's fields; the
+        orientation is blended along the shorter arc.
+        """
+        if len(self.history) < 2:
+            if len(self.history):
+                self._blend[0] = self.history[-1]
+            else:
+                self._blend[0] = (self.t, *self.current_state.as_list(), 0.0)
+            return self._blend[0]
+        blend = self._blend[0]
+        a, b = self.history[-2], self.history[-1]
+        for name in TRAJECTORY_DTYPE.names:
+            blend[name] = a[name] + alpha * (b[name] - a[name])
+        turn = (b["orientation"] - a["orientation"] + math.pi) % (2 * math.pi) - math.pi
+        blend["orientation"] = a["orientation"] + alpha * turn
+        return blend
+
+    def run(self, duration=None, steps=None, should_stop=None):
+        """Step as fast as the CPU allows for `duration` sim-seconds or `steps` steps.
+
+        should_stop is an optional callable checked before every step, e.g. a
+        renderer reporting that its window was closed.
+        """
+        if steps is None:
+            if duration is None:
+                raise ValueError("give either duration or steps")
+            steps = int(round(duration / self.Dt))
+        for _ in range(steps):
+            if should_stop is not None and should_stop():
+                break
+            self.step()
+        return self.current_state
+
+
+def run_headless(duration=None, steps=None, Dt=dt, render_hz=0, record=None, adaptive=False, gearbox=False):
+    """Run one car without a display, optionally rendering at render_hz sim-Hz.
+
+    record is an optional recording directory (see recorder.TrajectoryRecorder);
+    gearbox selects the vehicle_parameters gearbox instead of direct drive.
+    """
+    loop = PhysicsLoop(Dt=Dt, powertrain=Powertrain() if gearbox else None, adaptive=adaptive)
+    recorder = None
+    if record:
+        from recorder import TrajectoryRecorder
+        recorder = TrajectoryRecorder(record, metadata={"source": "physics_loop", "dt": Dt})
+        loop.add_subscriber(recorder.subscriber())
+    should_stop = None
+    if render_hz:
+        from sim import Simulation  # pygame is only needed when rendering
+        view = Simulation(physics=loop)
+        loop.add_subscriber(view.render_subscriber, every=round(1 / (render_hz * Dt)))
+        should_stop = lambda: view.exit
+    start = time.perf_counter()
+    loop.run(duration, steps, should_stop)
+    wall = time.perf_counter() - start
+    if recorder is not None:
+        recorder.close()
+    return loop, wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the vehicle dynamics faster than real time.")
+    parser.add_argument("--duration", type=float, default=None, help="simulated seconds to run")
+    parser.add_argument("--steps", type=int, default=None, help="number of physics steps to run")
+    parser.add_argument("--dt", type=float, default=dt, help="physics time step in seconds")
+    parser.add_argument("--render-hz", type=float, default=0, help="render at this simulated rate (0 = headless)")
+    parser.add_argument("--trace", default=None, help="write a binary force/control trace to this file")
+    parser.add_argument("--trace-level", choices=["step", "rhs"], default="step", help="record once per step or on every RHS call")
+    parser.add_argument("--record", default=None, help="record states and controls to this recording directory")
+    parser.add_argument("--adaptive", action="store_true", help="event-driven adaptive integration within each step")
+    parser.add_argument("--gearbox", action="store_true", help="drive through the gearbox instead of direct drive")
+    args = parser.parse_args()
+    if args.duration is None and args.steps is None:
+        args.duration = 60.0
+    if args.trace:
+        TRACE.enable(TRACE_RHS if args.trace_level == "rhs" else TRACE_STEP, sink=args.trace)
+
+    loop, wall = run_headless(args.duration, args.steps, args.dt, args.render_hz, args.record, args.adaptive, args.gearbox)
+    print("simulated {:.1f}s in {:.3f}s wall ({:.0f}x real time), {} steps".format(
+        loop.t, wall, loop.t / wall if wall else float("inf"), loop.step_count))
+    s = loop.current_state
+    print("final position: ({:.2f}, {:.2f}) velocity: {:.2f}".format(s.position, s.lateral_position, s.velocity))
+    if args.trace:
+        TRACE.close()
+        print("trace: {} samples in {}".format(len(TRACE.load(args.trace)), args.trace))
@@ -0,0 +1,178 @@
+import json
+import time
+import numpy as np
+
+
+class _Scope:
+    """Reusable context manager adding its elapsed time to one profiler slot."""
+
+    __slots__ = ("_times", "_name", "_start")
+
+    def __init__(self, times, name):
+        self._times = times
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._times[self._name] += time.perf_counter() - self._start
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class Profiler:
+    """Named timing scopes and counters, totalled per frame, with rolling percentiles.
+
+    Off by default: scope() then returns a shared no-op context manager and
+    count() returns after one attribute read, so call sites can stay in the
+    hot path. When enabled, scope times and counts accumulate until frame()
+    closes the frame and pushes each total into a ring of the last `window`
+    frames, from which stats() computes p50/p99. With a sink path, every
+    closed frame is also appended to it as one JSON line.
+    """
+
+    def __init__(self, window=300, enabled=False):
+        self.enabled = enabled
+        self.window = window
+        self.frames = 0
+        self._times = {}
+        self._counts = {}
+        self._scopes = {}
+        self._rings = {}  # name -> [kind, ring array, frames filled]
+        self._frame_start = None
+        self._sink = None
+
+    def enable(self, sink=None):
+        self.enabled = True
+        if sink is not None:
+            self.close()
+            self._sink = open(sink, "a")
+
+    def disable(self):
+        self.enabled = False
+        self.close()
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        scope = self._scopes.get(name)
+        if scope is None:
+            self._times.setdefault(name, 0.0)
+            scope = self._scopes[name] = _Scope(self._times, name)
+        return scope
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        self._counts[name] = self._counts.get(name, 0) + n
+
+    def _push(self, name, kind, value):
+        ring = self._rings.get(name)
+        if ring is None:
+            ring = self._rings[name] = [kind, np.zeros(self.window), 0]
+        ring[1][self.frames % self.window] = value
+        ring[2] = min(ring[2] + 1, self.window)
+
+    def frame(self):
+        """Close the current frame; its wall time since the previous call is recorded as "frame"."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self._times["frame"] = now - self._frame_start
+        self._frame_start = now
+        for name, value in self._times.items():
+            self._push(name, "time", value)
+        for name, value in self._counts.items():
+            self._push(name, "count", value)
+        if self._sink is not None:
+            self._sink.write(json.dumps({"frame": self.frames, "times": self._times, "counts": self._counts}) + "\n")
+        self.frames += 1
+        for name in self._times:  # zeroed in place, the scopes hold a reference
+            self._times[name] = 0.0
+        for name in self._counts:
+            self._counts[name] = 0
+
+    def stats(self):
+        """Return {name: {"kind", "last", "mean", "p50", "p99"}} over the retained frames; times in seconds.
+
+        A scope or counter first seen after the first frame only has its own
+        frames in the statistics, not the zeros of the frames before it.
+        """
+        result = {}
+        if not self.frames:
+            return result
+        last = (self.frames - 1) % self.window
+        for name, (kind, ring, filled) in self._rings.items():
+            values = ring[(last - np.arange(filled)) % self.window]
+            p50, p99 = np.percentile(values, (50, 99))
+            result[name] = {"kind": kind, "last": float(ring[last]), "mean": float(values.mean()),
+                            "p50": float(p50), "p99": float(p99)}
+        return result
+
+    def export(self, path):
+        """Write the current stats() and frame count as JSON."""
+        with open(path, "w") as f:
+            json.dump({"frames": self.frames, "window": self.window, "stats": self.stats()}, f, indent=2, sort_keys=True)
+
+    def reset(self):
+        self.frames = 0
+        self._rings.clear()
+        for name in self._times:
+            self._times[name] = 0.0
+        self._counts.clear()
+        self._frame_start = None
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def summary_lines(self):
+        """One text line per scope/counter, slowest p99 first, for overlays and logs."""
+        stats = self.stats()
+        times = sorted(((s["p99"], name, s) for name, s in stats.items() if s["kind"] == "time"), reverse=True)
+        lines = ["{:<16} p50 {:6.2f} ms  p99 {:6.2f} ms".format(name, 1e3 * s["p50"], 1e3 * s["p99"]) for _, name, s in times]
+        lines += ["{:<16} p50 {:6.0f}     p99 {:6.0f}".format(name, s["p50"], s["p99"])
+                  for name, s in sorted(stats.items()) if s["kind"] == "count"]
+        return lines
+
+
+class ProfilerOverlay:
+    """Draws Profiler.summary_lines() on a pygame surface, re-rendering the text every `every` frames."""
+
+    def __init__(self, profiler, every=15, size=16, color=(255, 255, 0)):
+        self.profiler = profiler
+        self.every = every
+        self.size = size
+        self.color = color
+        self._surfaces = []
+        self._rendered_at = -every
+
+    def draw(self, screen, x=10, y=120):
+        from render_cache import get_font
+        if self.profiler.frames - self._rendered_at >= self.every:
+            font = get_font(self.size)
+            self._surfaces = [font.render(line, True, self.color) for line in self.profiler.summary_lines()]
+            self._rendered_at = self.profiler.frames
+        for surface in self._surfaces:
+            screen.blit(surface, (x, y))
+            y += surface.get_height()
+
+
+# Process-wide profiler used by the simulation loop and the dynamics hot path
+PROFILER = Profiler()
@@ -2,17 +2,18 @@ from datetime import time
 import pygame
 from pygame.locals import *
 import numpy as np
-from car_model import Car
-from scipy.integrate import odeint
+from car_model import Car, DEFAULT_MANEUVER, simulate_maneuver
 from constants import *
 from Road import Road
+from render_cache import SpriteCache, get_font
+from recorder import RECORD_DTYPE, ROAD_TYPES, TrajectoryRecorder, TrajectoryReplay
 # Window dimensions
 WIDTH = 800
 HEIGHT = 600
 WHITE = (255, 255, 255) # Color of background
 class Simulation:
     
-    def __init__(self):
+    def __init__(self, replay=None):
         pygame.init() # Initialize pygame
         # Set up the screen
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT), HWSURFACE|DOUBLEBUF|RESIZABLE)
@@ -22,50 +23,59 @@ class Simulation:
         self.exit = False
         # Load the car image
         self.car_image = pygame.image.load("car.png")  # Assuming you have a car.png image
+        self.car_sprites = SpriteCache(self.car_image)
         self.car=Car()
         self.road = Road()
 
-        #precompute the car motion
-        self.position_pixels, self.lateral_positions_pixels,self.orientations, self.velocities= self.position_pixel()
-    
+        #precompute the car motion, or read it back from a recording
+        if replay:
+            self.position_pixels, self.lateral_positions_pixels,self.orientations, self.velocities= self.load_replay(replay)
+        else:
+            self.position_pixels, self.lateral_positions_pixels,self.orientations, self.velocities= self.position_pixel()
+
+    @staticmethod
+    def to_pixels(positions, lateral_positions):
+        # Note: This is a basic scaling for demonstration purposes.
+        return positions * 30, -lateral_positions * 30  # Scaling factor
+
+    def load_replay(self, path):
+        """Read the maneuver from a memory-mapped recording instead of integrating it."""
+        replay = TrajectoryReplay(path)
+        positions_pixels, lateral_positions_pixels = self.to_pixels(replay.column("position"), replay.column("lateral_position"))
+        return positions_pixels, lateral_positions_pixels, replay.column("orientation"), replay.column("velocity")
+
+    def record(self, path):
+        """Write the precomputed maneuver, its controls and road properties to a recording."""
+        rows = np.zeros(len(self.solution), dtype=RECORD_DTYPE)
+        rows["t"] = self.t_points
+        for i, name in enumerate(["position", "velocity", "lateral_position", "lateral_velocity", "orientation"]):
+            rows[name] = self.solution[:, i]
+        rows["throttle"] = 1.0  # car_model drives at full engine torque
+        rows["steering_angle"] = np.concatenate([np.full(samples, angle) for _, _, _, samples, angle in DEFAULT_MANEUVER])
+        for i, position in enumerate(self.position_pixels):
+            properties = self.road.get_road_properties(int(position))
+            rows[i]["road_type"] = ROAD_TYPES.index(properties["road_type"])
+            rows[i]["friction"] = properties["friction"]
+            rows[i]["roughness"] = properties["roughness"]
+        with TrajectoryRecorder(path, metadata={"source": "pyg", "maneuver": "default"}) as recorder:
+            recorder.append_rows(rows)
+
     def position_pixel(self):
-        #Initial state
-        initial_state=[0,0,0,0,0] # [position, velocity, lateral_position, lateral_velocity]
         # Sample inputs
         engine_torque = 320
         slip_angle = 0.05
         brake_force=0 # for full brake put 845.0
 
-        # Time points
-        t_points={
-            'straight': np.linspace(0, 4, 5 * 50),#From 0 to 5 sec, 50 points
-            'turn_right': np.linspace(4, 5, 50),
-            'little_straight': np.linspace(5, 7, 2 * 50),
-            'turn_left': np.linspace(7, 15, 8 * 50)        
-        }
-        steering_angle = {
-            'straight': 0,
-            'turn_right': 30 * (np.pi / 180),
-            'little_straight':0,
-            'turn_left': -30 * (np.pi / 180)
-        }
-
-        #solve differential equations
-        def solve(t, angle, state):
-            return odeint(self.car.equations_of_motion,state, t_points[t], args=(engine_torque, brake_force, steering_angle[angle], slip_angle))
-    #   # Concatenate solutions
-        solutions=[solve('straight','straight',initial_state)]
-        for t in ['turn_right','little_straight','turn_left']:
-            solutions.append(solve(t,t,solutions[-1][-1]))
-        solution = np.vstack(solutions)
+        #solve differential equations over the default maneuver:
+        # straight, turn right, little straight, turn left
+        self.t_points, solution = simulate_maneuver(self.car, DEFAULT_MANEUVER, engine_torque, brake_force, slip_angle)
+        self.solution = solution
         positions=solution[:,0]
         velocities=solution[:,1]
         lateral_positions = solution[:,2]
         
         # Convert positions to screen coordinates
-        # Note: This is a basic scaling for demonstration purposes.
-        positions_pixels = positions * 30  # Scaling factor
-        lateral_positions_pixels = -lateral_positions * 30  # Scaling factor
+        positions_pixels, lateral_positions_pixels = self.to_pixels(positions, lateral_positions)
         orientation = solution[:,4]
         # print("Time: {}s | Position: {} | Lateral Position: {} | Orientation: {}".format(time, positions_pixels, lateral_positions_pixels, orientation))
 
@@ -76,8 +86,7 @@ class Simulation:
             in pygame rotation is counter clockwise, but 
             in our model, positive steering angle means clockwise (right turn) 
         """
-        car_scaled = pygame.transform.scale(self.car_image,(44,22))
-        return pygame.transform.rotate(car_scaled, -np.degrees(steering_angle))
+        return self.car_sprites.rotated(steering_angle)
     
     def draw_car(self,x_pos, y_pos, rotated_img,orientation):
         """Draw the car at the specified x& Y-coordinate."""
@@ -98,7 +107,6 @@ class Simulation:
 
         # Draw the greenery on top and bottom
         self.screen.fill(colors["greenery"])
-        print(properties)
         pygame.draw.rect(self.screen, colors[properties["road_type"]], (0, HEIGHT // 3, WIDTH, HEIGHT // 3))
 
     def handle_events(self):
@@ -106,8 +114,7 @@ class Simulation:
             if event.type == pygame.QUIT:
                 self.exit = True
     def display_text(self,message, x, y, color=(0, 0, 0)):
-        font = pygame.font.SysFont(None, 25)
-        text = font.render(message, True, color)
+        text = get_font(25).render(message, True, color)
         self.screen.blit(text, (x, y))
     def draw_graph(self, positions, velocities):
         """Draw a graph representing the car's position and velocity over time."""
@@ -136,7 +143,14 @@ class Simulation:
         self.display_text("Velocity (blue)", WIDTH - 200, graph_y + graph_height + 25)
 
 if __name__ == "__main__":
-    sim=Simulation()
+    import argparse
+    parser = argparse.ArgumentParser(description="Animate the precomputed maneuver.")
+    parser.add_argument("--record", default=None, help="save the computed maneuver to this recording directory")
+    parser.add_argument("--replay", default=None, help="animate a recording instead of integrating the maneuver")
+    args = parser.parse_args()
+    sim=Simulation(replay=args.replay)
+    if args.record and not args.replay:
+        sim.record(args.record)
     # Main loop
     i = 0
     sim.screen.fill(WHITE)
@@ -149,8 +163,7 @@ if __name__ == "__main__":
             sim.draw_road(i)
             orientation= sim.orientations[i]
             steering_angle = orientation
-            font = pygame.font.SysFont(None, 25)
-            text = font.render("Steering Angle: {:.2f}".format(steering_angle), True, (0, 0, 0))
+            text = get_font(25).render("Steering Angle: {:.2f}".format(steering_angle), True, (0, 0, 0))
             # Displaying position and velocity:
             pos_text = "Position: {:.2f}".format(sim.position_pixels[i])
             vel_text = "Velocity: {:.2f}".format(sim.lateral_positions_pixels[i])
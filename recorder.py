@@ -0,0 +1,158 @@
+import json
+import os
+import numpy as np
+from constants import ROAD_TYPES
+
+RECORD_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("position", np.float64),
+    ("velocity", np.float64),
+    ("lateral_position", np.float64),
+    ("lateral_velocity", np.float64),
+    ("orientation", np.float64),
+    ("throttle", np.float32),
+    ("brake", np.float32),
+    ("steering_angle", np.float32),
+    ("road_type", np.uint8),
+    ("friction", np.float32),
+    ("roughness", np.float32),
+])
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+
+class TrajectoryRecorder:
+    """Append-only recording of states, controls and road properties.
+
+    A recording is a directory of .npy chunks of RECORD_DTYPE rows plus an
+    index.json listing each chunk with its row count and time range. Chunks are
+    written once when full and never rewritten; the index is replaced
+    atomically after every chunk, so a crashed run keeps all flushed chunks.
+    """
+
+    def __init__(self, path, chunk_rows=8192, metadata=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self._buffer = np.zeros(chunk_rows, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._index = {"version": FORMAT_VERSION, "dtype": RECORD_DTYPE.descr, "metadata": metadata or {}, "chunks": []}
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self._index["chunks"] = json.load(f)["chunks"]  # keep appending to an existing recording
+
+    def append(self, t, state, throttle=0.0, brake=0.0, steering_angle=0.0, road_properties=None):
+        row = self._buffer[self._n]
+        row["t"] = t
+        row["position"], row["velocity"], row["lateral_position"], row["lateral_velocity"], row["orientation"] = state.as_list()
+        row["throttle"], row["brake"], row["steering_angle"] = throttle, brake, steering_angle
+        if road_properties is not None:
+            row["road_type"] = ROAD_TYPES.index(road_properties["road_type"])
+            row["friction"] = road_properties["friction"]
+            row["roughness"] = road_properties["roughness"]
+        self._n += 1
+        if self._n == self.chunk_rows:
+            self.flush()
+
+    def append_rows(self, rows):
+        """Append a structured array of RECORD_DTYPE rows in bulk."""
+        self.flush()
+        for start in range(0, len(rows), self.chunk_rows):
+            self._write_chunk(np.asarray(rows[start:start + self.chunk_rows], dtype=RECORD_DTYPE))
+
+    def subscriber(self, road=None):
+        """Return a PhysicsLoop subscriber that records every call, with road properties if a Road is given."""
+        def record(loop):
+            car = loop.car
+            properties = road.get_road_properties(int(loop.current_state.position)) if road is not None else None
+            self.append(loop.t, loop.current_state, car.throttle, car.brake, car.steering_angle, properties)
+        return record
+
+    def _write_chunk(self, rows):
+        name = "chunk_{:06d}.npy".format(len(self._index["chunks"]))
+        np.save(os.path.join(self.path, name), rows)
+        self._index["chunks"].append({"file": name, "rows": len(rows), "t0": float(rows["t"][0]), "t1": float(rows["t"][-1])})
+        tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+    def flush(self):
+        if self._n:
+            self._write_chunk(self._buffer[:self._n].copy())
+            self._n = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReplay:
+    """Read-only view of a recording; chunks are memory-mapped, not loaded."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index["version"] != FORMAT_VERSION:
+            raise ValueError("unsupported recording version {}".format(self.index["version"]))
+        self.metadata = self.index["metadata"]
+        self.chunks = [np.load(os.path.join(path, c["file"]), mmap_mode="r") for c in self.index["chunks"]]
+        self._offsets = np.cumsum([0] + [len(c) for c in self.chunks])
+        self._t0 = np.array([c["t0"] for c in self.index["chunks"]])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("replay index out of range")
+        k = np.searchsorted(self._offsets, i, side="right") - 1
+        return self.chunks[k][i - self._offsets[k]]
+
+    def index_at(self, t):
+        """Index of the last sample with time <= t."""
+        k = max(np.searchsorted(self._t0, t, side="right") - 1, 0)
+        j = np.searchsorted(self.chunks[k]["t"], t, side="right") - 1
+        return max(int(self._offsets[k] + j), 0)
+
+    def column(self, name):
+        """Return one field over the whole recording (copied out of the chunks)."""
+        return np.concatenate([c[name] for c in self.chunks]) if self.chunks else np.zeros(0, RECORD_DTYPE[name])
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+
+def diff_recordings(path_a, path_b, fields=("position", "velocity", "lateral_position", "lateral_velocity", "orientation")):
+    """Return the max absolute difference per field between two recordings of equal length."""
+    a, b = TrajectoryReplay(path_a), TrajectoryReplay(path_b)
+    if len(a) != len(b):
+        raise ValueError("recordings differ in length: {} vs {}".format(len(a), len(b)))
+    return {name: float(np.max(np.abs(a.column(name) - b.column(name)))) if len(a) else 0.0 for name in fields}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or diff trajectory recordings.")
+    parser.add_argument("recording")
+    parser.add_argument("other", nargs="?", help="second recording to diff against")
+    args = parser.parse_args()
+    if args.other:
+        for name, value in diff_recordings(args.recording, args.other).items():
+            print("{:<18} max |diff| = {:.3e}".format(name, value))
+    else:
+        replay = TrajectoryReplay(args.recording)
+        print("{} samples in {} chunks, t = {:.2f}..{:.2f}s".format(
+            len(replay), len(replay.chunks), replay[0]["t"], replay[-1]["t"]) if len(replay) else "empty recording")
+        print("metadata:", replay.metadata)
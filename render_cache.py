@@ -0,0 +1,66 @@
+import math
+from collections import OrderedDict
+import pygame
+
+DEFAULT_SPRITE_SIZE = (44, 22)
+
+
+class SpriteCache:
+    """Scaled sprite with pre-rotated copies kept in a bounded LRU.
+
+    The sprite is scaled once; orientations are quantized to angle_bins steps
+    over a full turn so nearby headings share one rotated surface.
+    """
+
+    def __init__(self, image, size=DEFAULT_SPRITE_SIZE, angle_bins=360, maxsize=512):
+        scaled = pygame.transform.scale(image, size)
+        if pygame.display.get_surface() is not None:
+            scaled = scaled.convert_alpha()  # match the display format so blits skip conversion
+        self.scaled = scaled
+        self.angle_bins = angle_bins
+        self.maxsize = maxsize
+        self._step = 360.0 / angle_bins
+        self._rotated = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def rotated(self, orientation):
+        """Return the sprite rotated for `orientation` (radians, clockwise positive).
+
+        pygame rotates counter clockwise, so the angle is negated as in the
+        original per-frame transform.
+        """
+        key = int(round(-math.degrees(orientation) / self._step)) % self.angle_bins
+        surface = self._rotated.get(key)
+        if surface is not None:
+            self._rotated.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = pygame.transform.rotate(self.scaled, key * self._step)
+        if surface.get_width() == 0 or surface.get_height() == 0:
+            surface = self.scaled
+        self._rotated[key] = surface
+        if len(self._rotated) > self.maxsize:
+            self._rotated.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._rotated.clear()
+
+
+_fonts = {}
+
+
+def get_font(size=25, name=None):
+    """Return a SysFont created once per (name, size) and reused afterwards."""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.SysFont(name, size)
+    return font
+
+
+def clear_fonts():
+    """Forget the cached fonts; they are invalid once pygame.quit() has run."""
+    _fonts.clear()
@@ -0,0 +1,225 @@
+import bisect
+import json
+import numpy as np
+from constants import ROAD_TYPES, friction, roughness, rolling_coefficient
+
+SEGMENT_DTYPE = np.dtype([
+    ("road_type", np.uint8),  # index into ROAD_TYPES
+    ("friction", np.float32),
+    ("roughness", np.float32),
+    ("s0", np.float64),  # arc length where the segment starts and ends
+    ("s1", np.float64),
+])
+
+EDGE_DTYPE = np.dtype([
+    ("x0", np.float64), ("y0", np.float64),
+    ("x1", np.float64), ("y1", np.float64),
+    ("s0", np.float64),  # arc length at (x0, y0)
+    ("length", np.float64),
+    ("segment", np.int32),
+])
+
+
+class RoadMap:
+    """Road network as consecutive polyline segments, each with one surface.
+
+    Segments are laid end to end along a route, so every point of the road
+    has an arc length s. Segment and polyline-edge tables are structured
+    arrays. Arc-length queries binary-search the segment ends. Queries in
+    (x, y) use a KD-tree over points sampled every sample_spacing along the
+    edges, then project onto the found edge. Both are O(log n) per point and
+    take whole arrays. A periodic map wraps s modulo its length; otherwise s
+    is clamped to the ends.
+    """
+
+    def __init__(self, segments, periodic=False, sample_spacing=1.0):
+        self.periodic = periodic
+        self.sample_spacing = sample_spacing
+        self.segments = np.zeros(len(segments), SEGMENT_DTYPE)
+        edges = []
+        s = 0.0
+        for i, segment in enumerate(segments):
+            road_type = segment["road_type"]
+            points = np.asarray(segment["points"], dtype=np.float64)
+            if len(points) < 2:
+                raise ValueError("segment {} needs at least two points".format(i))
+            row = self.segments[i]
+            row["road_type"] = ROAD_TYPES.index(road_type)
+            row["friction"] = segment.get("friction", friction[road_type])
+            row["roughness"] = segment.get("roughness", roughness[road_type])
+            row["s0"] = s
+            for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+                length = float(np.hypot(x1 - x0, y1 - y0))
+                edges.append((x0, y0, x1, y1, s, length, i))
+                s += length
+            row["s1"] = s
+        self.edges = np.array(edges, dtype=EDGE_DTYPE)
+        self.length = s
+        self._source = [dict(segment) for segment in segments]
+        # one shared dict per segment for scalar lookups; treat as read-only
+        self._properties = [{"road_type": segment["road_type"],
+                             "road_type_code": int(row["road_type"]),
+                             "roughness": segment.get("roughness", roughness[segment["road_type"]]),
+                             "friction": segment.get("friction", friction[segment["road_type"]])}
+                            for segment, row in zip(segments, self.segments)]
+        self._tree = None
+        self._sample_edges = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["segments"], spec.get("periodic", False), spec.get("sample_spacing", 1.0))
+
+    def save(self, path):
+        segments = [json.dumps(dict(segment, points=np.asarray(segment["points"]).tolist())) for segment in self._source]
+        with open(path, "w") as f:  # one segment per line keeps map files diffable
+            f.write('{{"periodic": {}, "sample_spacing": {}, "segments": [\n  {}\n]}}\n'.format(
+                json.dumps(self.periodic), json.dumps(self.sample_spacing), ",\n  ".join(segments)))
+
+    @classmethod
+    def straight(cls, road_types, segment_length=100, periodic=True):
+        """Segments of segment_length along the x axis, one per road type in order."""
+        return cls([{"road_type": road_type, "points": [(i * segment_length, 0), ((i + 1) * segment_length, 0)]}
+                    for i, road_type in enumerate(road_types)], periodic=periodic)
+
+    def _wrap(self, s):
+        return np.mod(s, self.length) if self.periodic else np.clip(s, 0, self.length)
+
+    def segment_at(self, s):
+        """Segment index for arc length(s) s."""
+        index = np.searchsorted(self.segments["s1"], self._wrap(s), side="right")
+        return np.minimum(index, len(self.segments) - 1)
+
+    def _build_index(self):
+        from scipy.spatial import cKDTree  # scipy.spatial is slow to import, only needed for 2-D queries
+        counts = np.maximum(np.ceil(self.edges["length"] / self.sample_spacing).astype(int), 1) + 1
+        edge = np.repeat(np.arange(len(self.edges)), counts)
+        starts = np.cumsum(counts) - counts
+        fraction = (np.arange(counts.sum()) - starts[edge]) / (counts[edge] - 1)
+        e = self.edges[edge]
+        points = np.column_stack([e["x0"] + fraction * (e["x1"] - e["x0"]), e["y0"] + fraction * (e["y1"] - e["y0"])])
+        self._tree = cKDTree(points)
+        self._sample_edges = edge
+
+    def locate(self, x, y):
+        """Project points onto the road; returns (segment, s, offset) arrays.
+
+        offset is the signed distance from the centreline, positive on the
+        counter-clockwise side of the direction of travel (y pointing up).
+        """
+        if self._tree is None:
+            self._build_index()
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        _, nearest = self._tree.query(np.column_stack([x.ravel(), y.ravel()]))
+        e = self.edges[self._sample_edges[nearest]]
+        dx, dy = e["x1"] - e["x0"], e["y1"] - e["y0"]
+        length = np.maximum(e["length"], 1e-12)
+        px, py = x.ravel() - e["x0"], y.ravel() - e["y0"]
+        along = np.clip((px * dx + py * dy) / length, 0, e["length"])
+        offset = (dx * py - dy * px) / length
+        shape = x.shape
+        return e["segment"].reshape(shape), (e["s0"] + along).reshape(shape), offset.reshape(shape)
+
+    def properties(self, segment):
+        """Road properties of segment index(es): a shared dict for a scalar, a dict of arrays otherwise."""
+        if np.ndim(segment) == 0:
+            return self._properties[int(segment)]
+        rows = self.segments[segment]
+        return {
+            "road_type": np.asarray(ROAD_TYPES, dtype=object)[rows["road_type"]],
+            "road_type_code": rows["road_type"],
+            "roughness": rows["roughness"],
+            "friction": rows["friction"],
+        }
+
+    def lookup(self, x, y=None):
+        """Road properties at arc length x, or at the map point (x, y) when y is given."""
+        segment = self.segment_at(x) if y is None else self.locate(x, y)[0]
+        return self.properties(segment)
+
+    def runs_along_x(self, tolerance=1e-9):
+        """True when the route is the x axis from the origin, so x is the arc length."""
+        e = self.edges
+        return bool(np.all(np.abs(e["y0"]) <= tolerance) and np.all(np.abs(e["y1"]) <= tolerance)
+                    and np.all(np.abs(e["x0"] - e["s0"]) <= tolerance)
+                    and np.all(np.abs(e["x1"] - (e["s0"] + e["length"])) <= tolerance))
+
+    def surface_table(self):
+        """SurfaceTable for the dynamics, which look the surface up by the car's x position.
+
+        That is only the arc length on a map laid along the x axis (see
+        straight()); any other map raises ValueError rather than handing out
+        the surface of the wrong segment.
+        """
+        if not self.runs_along_x():
+            raise ValueError("surface lookups index by x, so the map must run along the x axis from the origin; "
+                             "use RoadMap.locate(x, y) or lookup(x, y) for other maps")
+        return SurfaceTable(self.segments["s1"], rolling_coefficient(self.segments["roughness"].astype(np.float64)),
+                            self.segments["friction"].astype(np.float64), self.length, self.periodic)
+
+
+class SurfaceTable:
+    """Rolling coefficient and friction per segment, looked up by arc length inside the dynamics.
+
+    Built once from a RoadMap (or uniform()), it holds the segment ends and
+    the two coefficients as arrays for batch lookups and as lists for the
+    scalar path, so a derivative evaluation costs one bisect and no dicts.
+    """
+
+    def __init__(self, ends, rolling_coefficients, frictions, length, periodic):
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.rolling_coefficients = np.asarray(rolling_coefficients, dtype=np.float64)
+        self.frictions = np.asarray(frictions, dtype=np.float64)
+        self.length = float(length)
+        self.periodic = periodic
+        self._ends = self.ends.tolist()
+        self._rolling = self.rolling_coefficients.tolist()
+        self._friction = self.frictions.tolist()
+        self._last = len(self._ends) - 1
+
+    @classmethod
+    def uniform(cls, road_type="asphalt"):
+        return cls([np.inf], [rolling_coefficient(roughness[road_type])], [friction[road_type]], np.inf, False)
+
+    def at(self, s):
+        """(rolling_coefficient, friction) at a scalar arc length."""
+        if self.periodic:
+            s %= self.length
+        i = bisect.bisect_right(self._ends, s)
+        if i > self._last:
+            i = self._last
+        return self._rolling[i], self._friction[i]
+
+    def lookup(self, s):
+        """(rolling_coefficients, frictions) arrays for an array of arc lengths."""
+        s = np.mod(s, self.length) if self.periodic else s
+        i = np.minimum(np.searchsorted(self.ends, s, side="right"), self._last)
+        return self.rolling_coefficients[i], self.frictions[i]
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description="Query speed of a road map, array vs per-point.")
+    parser.add_argument("map", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "maps", "city_loop.json"))
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    road_map = RoadMap.load(args.map)
+    print("{}: {} segments, {} edges, {:.0f} long".format(args.map, len(road_map.segments), len(road_map.edges), road_map.length))
+    rng = np.random.default_rng(0)
+    s = rng.uniform(0, road_map.length, args.points)
+    x, y = rng.uniform(0, 800, args.points), rng.uniform(0, 600, args.points)
+    road_map.lookup(0.0, 0.0)  # build the 2-D index outside the timing
+
+    start = time.perf_counter()
+    for value in s[:100_000]:
+        road_map.lookup(value)
+    print("per-point arc length: {:12,.0f} queries/s".format(100_000 / (time.perf_counter() - start)))
+    for name, query in (("array arc length", lambda: road_map.lookup(s)), ("array (x, y)", lambda: road_map.lookup(x, y))):
+        start = time.perf_counter()
+        query()
+        print("{:<20}: {:12,.0f} queries/s".format(name, args.points / (time.perf_counter() - start)))
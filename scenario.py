@@ -0,0 +1,336 @@
+"""Declarative driving scenarios, compiled once into control arrays, and a runner.
+
+    python scenario.py                          # every scenario in assets/scenarios
+    python scenario.py path/to/dir file.json    # directories and single files
+    python scenario.py --out results.json       # also write the results as JSON
+
+A scenario file (JSON, or YAML when PyYAML is installed) holds:
+
+    name, duration, dt       run length and physics step, seconds
+    engine                   a key of bicycle.ENGINES, default "kinematic"
+    initial                  CarState fields, e.g. {"velocity": 15}
+    road                     {"map": path} or {"segments": [{"road_type", "length"}], "periodic"};
+                             the car drives along x, so a map must run along the x axis from
+                             the origin (RoadMap.straight); curved maps such as city_loop are rejected
+    weather                  a key of constants.weather_friction, scales every surface's friction
+    controls                 throttle, brake, steering_angle: a constant or [[t, value], ...]
+                             breakpoints, linear in between; a repeated t is a step
+    faults                   [{"type", "start", "duration", ...}], see FAULTS
+    assertions               {name: limit}, see ASSERTIONS
+
+compile_scenario() samples the timelines and faults once onto a uniform grid,
+so the run loop reads its inputs by index and interpolation, O(1) per step.
+The runner exits with status 1 when any assertion fails.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from constants import weather_friction
+from bicycle import ENGINES, make_car
+from dynamics import CarState
+from physics_loop import PhysicsLoop
+from road_map import RoadMap, SurfaceTable
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = os.path.join(HERE, "assets", "scenarios")
+CHANNELS = ("throttle", "brake", "steering_angle")
+THROTTLE, BRAKE, STEERING = range(3)
+STOPPED_SPEED = 0.1  # m/s, below which stopping_distance counts the car as stopped
+FAILSAFE_BRAKE = 0.3  # as can_bus.VehicleInterface applies when controls frames time out
+
+# one evaluated assertion; value and limit in the assertion's own unit
+Check = namedtuple("Check", "name value limit passed")
+ScenarioResult = namedtuple("ScenarioResult", "name path passed checks steps compile_time run_time error")
+
+
+def load_scenario(path):
+    """Parse a scenario file; .yaml/.yml needs PyYAML, anything else is read as JSON."""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml  # optional, only for YAML scenarios
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    spec.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return spec
+
+
+def timeline(points, grid):
+    """Sample a constant or [[t, value], ...] breakpoints at the grid times.
+
+    Values are linear between breakpoints and held before the first and after
+    the last; two breakpoints at the same t make a step at t.
+    """
+    if np.ndim(points) == 0:
+        return np.full(len(grid), float(points))
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2 or not len(points):
+        raise ValueError("a timeline is a number or a list of [t, value] pairs")
+    times, values = points[:, 0], points[:, 1]
+    if np.any(np.diff(times) < 0):
+        raise ValueError("timeline times must not decrease")
+    if len(points) == 1:
+        return np.full(len(grid), values[0])
+    i = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 2)
+    span = times[i + 1] - times[i]
+    fraction = np.clip(np.divide(grid - times[i], span, out=np.ones_like(grid), where=span > 0), 0, 1)
+    # a step at the first breakpoint would otherwise take its post-step value early
+    return np.where(grid < times[0], values[0], values[i] + fraction * (values[i + 1] - values[i]))
+
+
+def _throttle_stuck(fault, window, controls, friction_scale):
+    controls[window, THROTTLE] = fault.get("value", controls[window, THROTTLE][:1])
+
+
+def _steering_stuck(fault, window, controls, friction_scale):
+    controls[window, STEERING] = fault.get("value", controls[window, STEERING][:1])
+
+
+def _brake_failure(fault, window, controls, friction_scale):
+    controls[window, BRAKE] *= 1.0 - fault.get("severity", 1.0)
+
+
+def _controls_lost(fault, window, controls, friction_scale):
+    controls[window, THROTTLE] = 0.0
+    controls[window, BRAKE] = fault.get("failsafe_brake", FAILSAFE_BRAKE)
+
+
+def _friction(fault, window, controls, friction_scale):
+    friction_scale[window] *= fault["scale"]
+
+
+# fault type -> function(fault, window mask, controls, friction_scale) editing the arrays in place
+FAULTS = {
+    "throttle_stuck": _throttle_stuck,  # value, default the throttle at the start
+    "steering_stuck": _steering_stuck,  # value, default the steering at the start
+    "brake_failure": _brake_failure,    # severity, fraction of brake lost, default 1
+    "controls_lost": _controls_lost,    # failsafe_brake while the driver's inputs are gone
+    "friction": _friction,              # scale, e.g. an ice patch or oil on the road
+}
+
+
+def build_road(road, base_dir="."):
+    """RoadMap from a scenario's road entry; None for uniform asphalt."""
+    if not road:
+        return None
+    if "map" in road:
+        road_map = RoadMap.load(os.path.join(base_dir, road["map"]))
+        if not road_map.runs_along_x():
+            raise ValueError("road map {!r} does not run along the x axis from the origin; scenarios look the "
+                             "surface up by the car's x position, so use a straight map or a \"segments\" road"
+                             .format(road["map"]))
+        return road_map
+    segments, x = [], 0.0
+    for segment in road["segments"]:
+        segments.append({"road_type": segment["road_type"], "points": [(x, 0.0), (x + segment["length"], 0.0)]})
+        x += segment["length"]
+    return RoadMap(segments, periodic=road.get("periodic", False))
+
+
+class CompiledScenario:
+    """A scenario with its controls, faults and weather sampled onto a uniform time grid.
+
+    controls is an (n, 3) array of throttle, brake and steering at t = k * step.
+    at(t) interpolates between the two neighbouring rows without a search;
+    the rows are also kept as lists so the per-step path touches no NumPy
+    scalars. Friction changes from weather and faults are folded into one
+    SurfaceTable per distinct scale, built here, so the run swaps tables
+    instead of rescaling every lookup.
+    """
+
+    def __init__(self, spec, base_dir="."):
+        self.spec = spec
+        self.name = spec["name"]
+        self.duration = float(spec["duration"])
+        self.dt = float(spec.get("dt", 0.05))
+        self.engine = spec.get("engine", "kinematic")
+        self.step = float(spec.get("sample_step", self.dt))
+        self.initial = dict(spec.get("initial", {}))
+        self.assertions = dict(spec.get("assertions", {}))
+        self.road_map = build_road(spec.get("road"), base_dir)
+        unknown = set(self.assertions) - set(ASSERTIONS)
+        if unknown:
+            raise ValueError("unknown assertion(s) {}; known: {}".format(sorted(unknown), sorted(ASSERTIONS)))
+
+        n = int(np.ceil(self.duration / self.step)) + 2
+        self.grid = np.arange(n) * self.step
+        controls = spec.get("controls", {})
+        self.controls = np.column_stack([timeline(controls.get(name, 1.0 if name == "throttle" else 0.0), self.grid)
+                                         for name in CHANNELS])
+        friction_scale = np.full(n, weather_friction[spec.get("weather", "dry")])
+        for fault in spec.get("faults", []):
+            apply = FAULTS.get(fault["type"])
+            if apply is None:
+                raise ValueError("unknown fault type {!r}; known: {}".format(fault["type"], sorted(FAULTS)))
+            start = fault.get("start", 0.0)
+            window = (self.grid >= start) & (self.grid < start + fault.get("duration", np.inf))
+            apply(fault, window, self.controls, friction_scale)
+        self.friction_scale = friction_scale
+
+        base = self.road_map.surface_table() if self.road_map is not None else SurfaceTable.uniform()
+        scales, index = np.unique(friction_scale, return_inverse=True)
+        self.surfaces = [SurfaceTable(base.ends, base.rolling_coefficients, base.frictions * scale, base.length, base.periodic)
+                         for scale in scales]
+        self._surface_index = index.ravel().tolist()
+        self._rows = self.controls.tolist()
+        self._inverse_step = 1.0 / self.step
+        self._last = n - 1
+
+    def at(self, t):
+        """(throttle, brake, steering_angle) at time t."""
+        x = t * self._inverse_step
+        i = int(x)
+        if i >= self._last:
+            return tuple(self._rows[self._last])
+        f = x - i
+        a, b = self._rows[i], self._rows[i + 1]
+        return a[0] + f * (b[0] - a[0]), a[1] + f * (b[1] - a[1]), a[2] + f * (b[2] - a[2])
+
+    def surface_at(self, t):
+        """Index into surfaces of the table in force at time t."""
+        return self._surface_index[min(int(t * self._inverse_step + 1e-9), self._last)]
+
+
+def compile_scenario(spec, base_dir="."):
+    return CompiledScenario(spec, base_dir)
+
+
+def simulate(compiled, engine=None):
+    """Run a compiled scenario on a PhysicsLoop; returns the loop, its history and the applied controls.
+
+    engine overrides the scenario's own.
+    """
+    surface = compiled.surface_at(0.0)
+    car = make_car(engine or compiled.engine, compiled.surfaces[surface])
+    physics = PhysicsLoop(car, CarState(**compiled.initial), Dt=compiled.dt)
+    steps = int(round(compiled.duration / compiled.dt))
+    applied = np.empty((steps, 3))
+    for k in range(steps):
+        t = physics.t
+        throttle, brake, steering = compiled.at(t)
+        car.throttle, car.brake, car.steering_angle = throttle, brake, steering
+        applied[k] = throttle, brake, steering
+        index = compiled.surface_at(t)
+        if index != surface:
+            surface = index
+            car.surface = compiled.surfaces[surface]
+        physics.step()
+    return physics, applied
+
+
+def _max_lateral_deviation(compiled, physics, applied):
+    x, y = physics.positions, physics.lateral_positions
+    if compiled.road_map is None:
+        return float(np.abs(y).max())
+    return float(np.abs(compiled.road_map.locate(x, y)[2]).max())
+
+
+def _stopping_distance(compiled, physics, applied):
+    """Path length from the first braking step to the first step below STOPPED_SPEED; inf if it never stops."""
+    braking = np.flatnonzero(applied[:, BRAKE] > 0)
+    if not len(braking):
+        return float("inf")
+    onset = braking[0]
+    x, y, v = physics.positions, physics.lateral_positions, physics.velocities
+    # history row k is the state after step k, so braking began at row onset - 1 (or the initial state)
+    if onset:
+        x0, y0 = x[onset - 1], y[onset - 1]
+    else:
+        x0, y0 = compiled.initial.get("position", 0.0), compiled.initial.get("lateral_position", 0.0)
+    stopped = np.flatnonzero(v[onset:] < STOPPED_SPEED)
+    if not len(stopped):
+        return float("inf")
+    end = onset + stopped[0]
+    xs = np.concatenate([[x0], x[onset:end + 1]])
+    ys = np.concatenate([[y0], y[onset:end + 1]])
+    return float(np.hypot(np.diff(xs), np.diff(ys)).sum())
+
+
+def _max_speed(compiled, physics, applied):
+    return float(physics.velocities.max())
+
+
+def _final_speed(compiled, physics, applied):
+    return float(physics.velocities[-1])
+
+
+# assertion name -> function(compiled, physics, applied) giving a value that must not exceed the limit
+ASSERTIONS = {
+    "max_lateral_deviation": _max_lateral_deviation,  # m from the road centreline
+    "stopping_distance": _stopping_distance,          # m travelled from brake onset to standstill
+    "max_speed": _max_speed,                          # m/s
+    "final_speed": _final_speed,                      # m/s at the end of the run
+}
+
+
+def evaluate(compiled, physics, applied):
+    checks = []
+    for name, limit in compiled.assertions.items():
+        value = ASSERTIONS[name](compiled, physics, applied)
+        checks.append(Check(name, value, float(limit), value <= limit))
+    return checks
+
+
+def run_scenario(path, engine=None):
+    """Load, compile, run and check one scenario file; errors are reported in the result, not raised."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        start = time.perf_counter()
+        compiled = compile_scenario(load_scenario(path), os.path.dirname(os.path.abspath(path)))
+        compiled_at = time.perf_counter()
+        physics, applied = simulate(compiled, engine)
+        checks = evaluate(compiled, physics, applied)
+        finished = time.perf_counter()
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        return ScenarioResult(name, path, False, [], 0, 0.0, 0.0, "{}: {}".format(type(error).__name__, error))
+    return ScenarioResult(compiled.name, path, all(check.passed for check in checks), checks, physics.step_count,
+                          compiled_at - start, finished - compiled_at, None)
+
+
+def scenario_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.endswith((".json", ".yaml", ".yml")))
+        else:
+            files.append(path)
+    return files
+
+
+def write_results(results, path):
+    entries = [{"name": r.name, "path": r.path, "passed": r.passed, "error": r.error, "steps": r.steps,
+                "compile_time": r.compile_time, "run_time": r.run_time,
+                "checks": [dict(c._asdict()) for c in r.checks]} for r in results]
+    with open(path, "w") as f:
+        json.dump({"passed": sum(r.passed for r in results), "failed": sum(not r.passed for r in results),
+                   "scenarios": entries}, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scenario files and check their assertions.")
+    parser.add_argument("paths", nargs="*", default=[SCENARIOS], help="scenario files or directories")
+    parser.add_argument("--out", default=None, help="write the results to this JSON file")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=None, help="vehicle model for every scenario")
+    args = parser.parse_args()
+
+    results = [run_scenario(path, args.engine) for path in scenario_files(args.paths)]
+    for r in results:
+        print("{} {:<28} {:5d} steps  compile {:5.1f} ms  run {:6.1f} ms".format(
+            "PASS" if r.passed else "FAIL", r.name, r.steps, 1e3 * r.compile_time, 1e3 * r.run_time))
+        if r.error:
+            print("     error: {}".format(r.error))
+        for c in r.checks:
+            print("     {:<24} {:10.3f} <= {:<8g} {}".format(c.name, c.value, c.limit, "ok" if c.passed else "FAILED"))
+    if args.out:
+        write_results(results, args.out)
+    failed = sum(not r.passed for r in results)
+    print("{} passed, {} failed".format(len(results) - failed, failed))
+    sys.exit(1 if failed else 0)
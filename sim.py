@@ -1,124 +1,73 @@
+import argparse
+import os
+import time
 import pygame
 import numpy as np
-from scipy.integrate import odeint
 from constants import *
-from vehicle_params import vehicle_parameters
+from bicycle import ENGINES, make_car
+from physics_loop import PhysicsLoop, dt
+from adaptive import Powertrain
+from render_cache import SpriteCache, get_font
+from recorder import TrajectoryRecorder, TrajectoryReplay
+from profiler import PROFILER, ProfilerOverlay
+from battery import BatteryPack, battery_subscriber
+from can_bus import VehicleNetwork
 from Road import Road
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+
 # Constants
 WIDTH = 800
 HEIGHT = 600
 WHITE = (255, 255, 255)
-RHO = 1.225  # air density in kg/m^3
-G = 9.81
-F_BRAKE_MAX = 1000  # Maximum brake force
 FPS=30
-dt = 0.05  # Time step for simulation
-engine_torque = 320
-slip_angle = 0.05
-
-class CarState:
-    def __init__(self, position=0, velocity=0, lateral_position=0, lateral_velocity=0, orientation=0) -> None:
-        self.position = position
-        self.velocity = velocity
-        self.lateral_position = lateral_position
-        self.lateral_velocity = lateral_velocity
-        self.orientation = orientation #heading
-        # self.steering_angle= #front wheel
-    def as_list(self):
-        return [self.position,self.velocity,self.lateral_position,self.lateral_velocity, self.orientation]
-
-class Car:
-    def __init__(self):
-        self.mass = vehicle_parameters["mass"]
-        self.drag_coefficient = vehicle_parameters["drag_coefficient"]
-        self.max_steering_angle = np.pi / 6
-        self.max_acceptable_acceleration = 50.0
-        self._throttle = 1
-        self._brake = 0
-        self._steering_angle = 0
-    @property
-    def throttle(self):
-        return self._throttle
-    @throttle.setter
-    def throttle(self, value):
-        self._throttle = max(0, min(1, value))
-        print("Debug_set_throttle: ",self._throttle)
-    @property
-    def brake(self):
-        return self._brake
-    @brake.setter
-    def brake(self, value):
-        self._brake = max(0, min(1, value))
-        print("Debug_set_brake: ",self._brake)
-    @property
-    def steering_angle(self):
-        return self._steering_angle
-    @steering_angle.setter
-    def steering_angle(self,value):
-        self._steering_angle = max(-self.max_steering_angle,min(value,self.max_steering_angle))
-    def traction_control(self, acceleration, engine_torque):
-        if acceleration > self.max_acceptable_acceleration:
-            return engine_torque * self.max_acceptable_acceleration / acceleration
-        return engine_torque
-
-    def longitudinal_dynamics(self, v, engine_torque):
-        F_drag = 0.5 * RHO * vehicle_parameters["frontal_area"] * self.drag_coefficient * v ** 2
-        F_rolling = self.mass * G * 0.015
-
-        F_net_without_engine_brake = -F_drag - F_rolling
-        a = F_net_without_engine_brake / self.mass
-
-        engine_max_torque = self.traction_control(a, engine_torque)
-        F_engine_max = engine_max_torque / vehicle_parameters["tire_radius"]
-        F_engine = self._throttle * F_engine_max
-        F_brake = self._brake * F_BRAKE_MAX
-
-        F_net = F_engine + F_net_without_engine_brake - F_brake
-
-        a = F_net / self.mass
-        print("Debug_long_dynamics brake,F_brake,throttle,F_engine,F_net:",self.brake,"\t",F_brake,"\t",self.throttle,"\t",F_engine,"\t",F_net)
-        return a
-
-    def lateral_dynamics(self, v_y, slip_angle):
-        F_cornering = -vehicle_parameters["tire_cornering_stiffness"] * slip_angle
-        a_y = F_cornering / self.mass
-        return a_y
-
-    def equations_of_motion(self, state, t, engine_torque, steering_angle, slip_angle):
-        position, velocity, lateral_position, lateral_velocity, orientation = state
-        slip_angle = np.arctan2(lateral_velocity, velocity)
-        adjust_slip_angle = slip_angle + steering_angle
-
-        acceleration = self.longitudinal_dynamics(velocity, engine_torque)
-        lateral_acceleration = self.lateral_dynamics(lateral_velocity, adjust_slip_angle)
-
-        dv_dt = acceleration
-        dv_y_dt = lateral_acceleration
-        dx_dt = velocity * np.cos(orientation)
-        dy_dt = velocity * np.sin(orientation)
-        dtheta_dt = velocity  * np.sin(steering_angle) / vehicle_parameters["wheelbase"]
-        print("debug_equation_of_motion, dtheta_dt:",dtheta_dt)
-        return [dx_dt, dv_dt, dy_dt, dv_y_dt, dtheta_dt]
-
-    def get_next_state(self, state: CarState, Dt, engine_torque, slip_angle, steering_angle) -> CarState:
-        # Integrate equations of motion over dt to get the next state
-        t = [0, Dt]
-        current_state_list=state.as_list()
-        next_state_values = odeint(self.equations_of_motion, current_state_list, t, args=(engine_torque, steering_angle, slip_angle))[1]
-        return CarState(*next_state_values)
-
+HISTORY_SECONDS = 600  # sim-time kept in the interactive ring history
 
 class Simulation:
-    def __init__(self):
+    def __init__(self, physics=None, perception=False, profile_overlay=False, autopilot=None, control_hz=20.0,
+                 engine="kinematic", adaptive=False, gearbox=False, network=False):
         pygame.init()
         self.setup_display()
-        self.car_image = pygame.image.load("car.png")
-        self.car = Car()
-        self.exit = False
+        self.car_image = pygame.image.load(os.path.join(HERE, "car.png"))
+        self.car_sprites = SpriteCache(self.car_image)
         self.road = Road()
-        self.positions, self.lateral_positions, self.orientations, self.velocities = [],[],[],[]
-        self.current_state=CarState()
+        # Physics and state history live in PhysicsLoop; this class only renders and reads input
+        if physics is None:
+            physics = PhysicsLoop(make_car(engine, self.road.map), history_capacity=int(HISTORY_SECONDS / dt),
+                                  powertrain=Powertrain() if gearbox else None, adaptive=adaptive)
+        self.physics = physics
+        self.car = self.physics.car
+        self.exit = False
+        # Lane detection runs on its own thread and never blocks the frame loop
+        self.perception = None
+        if perception:
+            from perception import PerceptionWorker  # pulls in OpenCV, only when asked for
+            self.perception = PerceptionWorker(self.road).start()
+        # Keys set the car's controls directly, or with network=True the controls ECU, so the car
+        # only sees its inputs as frames on the simulated network, which runs on the physics clock
+        self.battery = self.network = None
+        self.controls = self.car
+        if network:
+            self.battery = BatteryPack(1)
+            self.physics.add_subscriber(battery_subscriber(self.battery))
+            self.network = VehicleNetwork.for_vehicle(self.physics, pack=self.battery, perception=self.perception)
+            self.physics.add_subscriber(self.network.subscriber())
+            self.controls = self.network.controls
+        # With an autopilot ("pid" or "pursuit") the controls ECU is driven from the lane camera instead of the keys
+        self.autopilot = None
+        if autopilot:
+            from autopilot import Autopilot, CONTROLLERS, CITY_ASSETS, LaneCamera
+            camera = LaneCamera.load(os.path.join(CITY_ASSETS, "4Wayroad800x600.png"), road=self.road)
+            self.autopilot = Autopilot(camera, CONTROLLERS[autopilot](), self.controls, control_hz=control_hz).attach(self.physics)
+        # Frame-time breakdown drawn over the scene; needs PROFILER enabled to have data
+        self.profile_overlay = ProfilerOverlay(PROFILER) if profile_overlay else None
+
+    @property
+    def current_state(self):
+        return self.physics.current_state
+    @property
+    def history(self):
+        return self.physics.history
 
     def setup_display(self):
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HWSURFACE | pygame.DOUBLEBUF | pygame.RESIZABLE)
@@ -126,56 +75,45 @@ class Simulation:
         self.clock = pygame.time.Clock()
 
     def display_text(self, message, x, y, color=(0, 0, 0)):
-        font = pygame.font.SysFont(None, 25)
-        text = font.render(message, True, color)
+        text = get_font(25).render(message, True, color)
         self.screen.blit(text, (x, y))
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.exit = True
-        self._handle_continuous_keys()
+        if self.autopilot is None:
+            self._handle_continuous_keys()
 
     def _handle_continuous_keys(self):
         keys = pygame.key.get_pressed()
         
         # Define a factor for steering angle change
-        steering_factor = 0.025 * self.car.max_steering_angle
+        steering_factor = 0.025 * self.controls.max_steering_angle
 
         if keys[pygame.K_UP]:
-            self.car.throttle = min(self.car.throttle + 0.1, 1)  # limit throttle to 1
-            if self.car.brake > 0:
-                self.car.brake = max(self.car.brake - 0.1, 0)        
+            self.controls.throttle = min(self.controls.throttle + 0.1, 1)  # limit throttle to 1
+            if self.controls.brake > 0:
+                self.controls.brake = max(self.controls.brake - 0.1, 0)
         if keys[pygame.K_DOWN]:
-            self.car.brake = min(self.car.brake + 0.1, 1)  # limit brake to 1
-            if self.car.throttle > 0:
-                self.car.throttle = max(self.car.throttle - 0.1, 0)
+            self.controls.brake = min(self.controls.brake + 0.1, 1)  # limit brake to 1
+            if self.controls.throttle > 0:
+                self.controls.throttle = max(self.controls.throttle - 0.1, 0)
 
         if keys[pygame.K_LEFT]:
-            self.car.steering_angle -= steering_factor
+            self.controls.steering_angle -= steering_factor
         if keys[pygame.K_RIGHT]:
-            self.car.steering_angle += steering_factor
+            self.controls.steering_angle += steering_factor
         if keys[pygame.K_SPACE]:
-            self.car.throttle = 0
-            self.car.brake = 0
-            self.car.steering_angle = 0  # Reset the steering when spacebar is pressed
-
-        # Print debug info
-        print("Debug_steering_angle: ", self.car.steering_angle)
-        print("Debug_max_steering_angle: ", self.car.max_steering_angle)
-        print("Debug_min_steering_angle: ", -self.car.max_steering_angle)
+            self.controls.throttle = 0
+            self.controls.brake = 0
+            self.controls.steering_angle = 0  # Reset the steering when spacebar is pressed
 
     def update_dynamics(self, DT):
-        self.current_state = self.car.get_next_state(self.current_state, DT, engine_torque, slip_angle, self.car.steering_angle)
-        self.positions = np.append(self.positions, self.current_state.position)
-        self.velocities = np.append(self.velocities, self.current_state.velocity)
-        self.lateral_positions = np.append(self.lateral_positions, self.current_state.lateral_position)
-        self.orientations= np.append(self.orientations,self.current_state.orientation)
+        self.physics.step(DT)
 
     def rotated_car(self, orientation):
-        car_scaled = pygame.transform.scale(self.car_image, (44, 22))
-        rotated = pygame.transform.rotate(car_scaled, -np.degrees(orientation))
-        return rotated if rotated.get_width() != 0 and rotated.get_height() != 0 else car_scaled
+        return self.car_sprites.rotated(orientation)
 
     def draw_car(self, x_pos, y_pos, rotated_img, orientation):
         car_width, car_height = rotated_img.get_size()
@@ -183,64 +121,144 @@ class Simulation:
         # y_pos -= np.sin(orientation) * 5
         self.screen.blit(rotated_img, (WIDTH / 2 + x_pos - car_width / 2, HEIGHT / 2 + y_pos - car_height / 2))
 
-    def draw_road(self, i):
-        properties = self.road.get_road_properties(int(self.positions[i]))
+    def draw_road(self, position):
+        properties = self.road.get_road_properties(int(position))
         self.screen.fill(colors["greenery"])
         pygame.draw.rect(self.screen, colors[properties["road_type"]], (0, HEIGHT // 3, WIDTH, HEIGHT // 3))
     def calculate_distance(self, x1, y1, x2, y2):
         return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
 
-    def calculate_acceleration(self, velocities, i):
-        if i == 0:
-            return 0
-        return (velocities[i] - velocities[i-1]) / 0.02  # dt = 1/50 = 0.02
-    
-    def run(self):
-        positions_over_time = []
-        lateral_positions_over_time = []
-        velocities_over_time = []
-        accelerations_over_time=[]
-        positions_over_time.append(self.current_state.position)
-        lateral_positions_over_time.append(self.current_state.lateral_position)
-        velocities_over_time.append(self.current_state.velocity)
-        accelerations_over_time.append(0)
-        i = 0
-        pygame.key.set_repeat(100, 50)  # Delay of 100ms before key repeats, then every 50ms
+    def calculate_acceleration(self, i):
+        # dv/dt from the equations of motion, stored with each history sample
+        return self.history[i]["acceleration"]
 
-        while not self.exit:
-            # dt = self.clock.tick(FPS) / 1000.0  # Get time taken for the frame in seconds
-            self.handle_events()
-            self.update_dynamics(dt)
-            # self.render(0)
-            self.screen.fill((0, 0, 0))
+    def render(self, i):
+        self.draw_frame(self.history[i], self.calculate_acceleration(i))
+
+    def render_interpolated(self, alpha):
+        """Draw the state alpha of the way from the previous physics step to the latest one."""
+        sample = self.physics.interpolated(alpha)
+        self.draw_frame(sample, sample["acceleration"])
 
-            self.draw_road(i)
+    def draw_frame(self, sample, acc):
+        """Draw one frame from a state record (history or replay) with the given acceleration."""
+        with PROFILER.scope("draw_road"):
+            self.screen.fill((0, 0, 0))
+            self.draw_road(sample["position"])
 
-            positions_over_time.append(self.current_state.position)
-            lateral_positions_over_time.append(self.current_state.lateral_position)
-            velocities_over_time.append(self.current_state.velocity)
-            acc = self.calculate_acceleration(velocities_over_time, i)
-            accelerations_over_time.append(acc)
-            
-            pos_text = "Position_x: {:.2f}, Position_y: {:.2f}".format(self.current_state.position,self.current_state.lateral_position)
-            vel_text = "Velocity: {:.2f}".format(self.current_state.velocity)
+        with PROFILER.scope("text"):
+            pos_text = "Position_x: {:.2f}, Position_y: {:.2f}".format(sample["position"],sample["lateral_position"])
+            vel_text = "Velocity: {:.2f}".format(sample["velocity"])
             acc_text ="Acceleration: {:.2f}".format(acc)
 
             self.display_text(pos_text, 10, 30)
             self.display_text(vel_text, 10, 50)
             self.display_text(acc_text,10,70)
+            if self.perception is not None:
+                estimate = self.perception.latest()
+                if estimate is not None and estimate.lane_center is not None:
+                    lane_text = "Lane center: {}, slope: {:.2f}, age: {:.0f} ms".format(
+                        estimate.lane_center, estimate.slope, 1000 * (time.perf_counter() - estimate.submitted_at))
+                    self.display_text(lane_text, 10, 90)
+            if self.autopilot is not None and self.autopilot.observation is not None:
+                observation = self.autopilot.observation
+                self.display_text("Autopilot: lane offset {:.2f} m, heading {:.3f} rad".format(
+                    observation.offset, observation.heading), 10, 110)
+
+        with PROFILER.scope("sprite_rotation"):
+            car_rotated_image = self.rotated_car(sample["orientation"])
+        with PROFILER.scope("draw_car"):
+            self.draw_car(sample["position"], sample["lateral_position"], car_rotated_image, sample["orientation"])
+        if self.profile_overlay is not None:
+            with PROFILER.scope("overlay"):
+                self.profile_overlay.draw(self.screen)
+
+        with PROFILER.scope("display_flip"):
+            pygame.display.flip()
 
-            car_rotated_image = self.rotated_car(self.orientations[i])
-            self.draw_car(self.positions[i], self.lateral_positions[i], car_rotated_image, self.orientations[i])
+    def render_subscriber(self, physics):
+        """PhysicsLoop subscriber that draws the latest state, for headless runs with a view."""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.exit = True
+        self.render(-1)
 
-            pygame.display.flip()
+    def run(self, record=None, fps=FPS):
+        pygame.key.set_repeat(100, 50)  # Delay of 100ms before key repeats, then every 50ms
+        recorder = None
+        if record:
+            recorder = TrajectoryRecorder(record, metadata={"source": "sim", "dt": dt})
+            self.physics.add_subscriber(recorder.subscriber(self.road))
+
+        # Physics advances in fixed steps against wall time; frames draw whatever
+        # lies between the last two steps, so neither rate drags the other
+        previous = time.perf_counter()
+        while not self.exit:
+            now = time.perf_counter()
+            elapsed, previous = now - previous, now
+            with PROFILER.scope("handle_events"):
+                self.handle_events()
+            with PROFILER.scope("update_dynamics"):
+                alpha = self.physics.advance(elapsed)
+            self.render_interpolated(alpha)
+            if self.perception is not None:
+                with PROFILER.scope("perception_submit"):
+                    self.perception.submit(self.screen, self.physics.t)
+            with PROFILER.scope("idle"):  # time left in the frame budget
+                self.clock.tick(fps)
+            PROFILER.frame()
+        if recorder is not None:
+            recorder.close()
+        if self.perception is not None:
+            self.perception.stop()
+        if self.network is not None:
+            self.network.close()
+
+    def replay(self, path):
+        """Draw a recording frame by frame without integrating anything."""
+        recording = TrajectoryReplay(path)
+        i = 0
+        while not self.exit and i < len(recording):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.exit = True
+            sample = recording[i]
+            # recordings keep no derivative, so difference over the actual sample spacing
+            acc = (sample["velocity"] - recording[i-1]["velocity"]) / (sample["t"] - recording[i-1]["t"]) if i else 0
+            self.draw_frame(sample, acc)
             i += 1
-            if i >= len(self.positions):
-                i = 0
-            self.clock.tick(FPS)
+            with PROFILER.scope("idle"):
+                self.clock.tick(FPS)
+            PROFILER.frame()
 
 
 if __name__ == "__main__":
-    sim = Simulation()
-    sim.run()
+    parser = argparse.ArgumentParser(description="Interactive car simulation.")
+    parser.add_argument("--record", default=None, help="record the session to this directory")
+    parser.add_argument("--replay", default=None, help="replay a recording instead of simulating")
+    parser.add_argument("--fps", type=int, default=FPS, help="render frame rate; physics keeps its own fixed step")
+    parser.add_argument("--perception", action="store_true", help="run lane detection on a background thread")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="kinematic", help="vehicle model: kinematic or dynamic bicycle")
+    parser.add_argument("--adaptive", action="store_true", help="event-driven adaptive integration within each physics step")
+    parser.add_argument("--gearbox", action="store_true", help="drive through the gearbox instead of direct drive")
+    parser.add_argument("--network", action="store_true", help="route the controls over the simulated CAN network, with a BMS")
+    parser.add_argument("--autopilot", choices=("pid", "pursuit"), default=None, help="keep the lane instead of reading the keys")
+    parser.add_argument("--control-hz", type=float, default=20.0, help="autopilot control rate, Hz")
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None,
+                        help="time each subsystem and write p50/p99 stats to this file (default profile.json)")
+    parser.add_argument("--profile-frames", default=None, help="also append every frame's timings to this JSON-lines file")
+    parser.add_argument("--profile-overlay", action="store_true", help="show the frame-time breakdown on screen")
+    args = parser.parse_args()
+    if args.profile or args.profile_frames or args.profile_overlay:
+        PROFILER.enable(sink=args.profile_frames)
+    sim = Simulation(perception=args.perception, profile_overlay=args.profile_overlay, autopilot=args.autopilot,
+                     control_hz=args.control_hz, engine=args.engine, adaptive=args.adaptive, gearbox=args.gearbox,
+                     network=args.network)
+    if args.replay:
+        sim.replay(args.replay)
+    else:
+        sim.run(record=args.record, fps=args.fps)
+    if args.profile:
+        PROFILER.export(args.profile)
+    PROFILER.close()
     pygame.quit()
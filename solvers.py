@@ -0,0 +1,138 @@
+import argparse
+import time
+import numpy as np
+from scipy.integrate import odeint, solve_ivp
+import fast_rhs
+from car_model import DEFAULT_MANEUVER
+from dynamics import CarState
+
+# "odeint" is scipy's LSODA wrapper the rest of the repo uses; the others go through solve_ivp
+SOLVERS = ("odeint", "LSODA", "BDF", "Radau", "RK45", "RK23", "DOP853")
+# Methods that make use of a Jacobian; explicit Runge-Kutta ignores it
+JACOBIAN_SOLVERS = ("odeint", "LSODA", "BDF", "Radau")
+
+
+class IntegrationResult:
+    def __init__(self, t, y, solver, nfev, njev, success=True, message=""):
+        self.t = t
+        self.y = y  # (len(t), 5), same layout as odeint output
+        self.solver = solver
+        self.nfev = nfev  # right-hand-side evaluations
+        self.njev = njev  # Jacobian evaluations
+        self.success = success
+        self.message = message
+
+
+def _counting(function):
+    """Wrap function so that counted.calls tracks how often the solver evaluated it."""
+    def counted(*args):
+        counted.calls += 1
+        return function(*args)
+    counted.calls = 0
+    return counted
+
+
+def integrate(y0, t, args, solver="odeint", model="sim", use_jacobian=True, rtol=1e-6, atol=1e-8):
+    """Integrate the fast RHS of `model` over the time points t with the chosen solver.
+
+    args are the RHS arguments after (state, t), ending with the packed
+    parameter array. use_jacobian passes the analytic Jacobian to solvers
+    that can use it; otherwise they estimate it by finite differences.
+    njev counts calls to the analytic Jacobian when it is passed. It is 0
+    when the solver never needed one, e.g. LSODA staying on its non-stiff
+    Adams method.
+    """
+    if solver not in SOLVERS:
+        raise ValueError("unknown solver {!r}, choose one of {}".format(solver, SOLVERS))
+    use_jacobian = use_jacobian and solver in JACOBIAN_SOLVERS
+    if solver == "odeint":
+        rhs = fast_rhs.make_rhs(model)
+        Dfun = _counting(fast_rhs.make_jacobian(model)) if use_jacobian else None
+        y, info = odeint(rhs, y0, t, args=tuple(args), Dfun=Dfun, rtol=rtol, atol=atol, full_output=True)
+        # the counters are cumulative per output point, and left at 0 past a failure
+        njev = Dfun.calls if use_jacobian else int(info["nje"].max())
+        return IntegrationResult(np.asarray(t), y, solver, int(info["nfe"].max()), njev,
+                                 info["message"] == "Integration successful.", info["message"])
+
+    rhs = fast_rhs.make_rhs(model, tfirst=True)
+    jac = _counting(fast_rhs.make_jacobian(model, tfirst=True)) if use_jacobian else None
+    kwargs = {"jac": jac} if use_jacobian else {}
+    sol = solve_ivp(rhs, (t[0], t[-1]), y0, method=solver, t_eval=t, args=tuple(args), rtol=rtol, atol=atol, **kwargs)
+    return IntegrationResult(sol.t, sol.y.T, solver, sol.nfev, jac.calls if use_jacobian else sol.njev,
+                             sol.success, sol.message)
+
+
+class SolverCar(fast_rhs.FastCar):
+    """FastCar that steps with a selectable solver and counts evaluations."""
+
+    def __init__(self, params=None, solver="odeint", use_jacobian=True, rtol=1e-6, atol=1e-8, surface=None):
+        super().__init__(params, surface=surface)
+        self.solver = solver
+        self.use_jacobian = use_jacobian
+        self.rtol = rtol
+        self.atol = atol
+        self.nfev = 0
+        self.njev = 0
+
+    def get_next_state(self, state: CarState, Dt, engine_torque, slip_angle, steering_angle) -> CarState:
+        result = integrate(np.array(state.as_list(), dtype=float), [0.0, Dt],
+                           (engine_torque, steering_angle, slip_angle, self.pack_parameters(state.position)),
+                           self.solver, "sim", self.use_jacobian, self.rtol, self.atol)
+        self.nfev += result.nfev
+        self.njev += result.njev
+        self.elapsed += Dt
+        return CarState(*result.y[-1])
+
+
+def integrate_maneuver(maneuver=DEFAULT_MANEUVER, solver="odeint", use_jacobian=True, engine_torque=320,
+                       brake_force=0, slip_angle=0.05, params=None, rtol=1e-6, atol=1e-8):
+    """car_model.simulate_maneuver through integrate(); returns (t, y, total nfev, total njev)."""
+    p = fast_rhs.pack_parameters(params)
+    state = np.zeros(5)
+    times, solutions, nfev, njev = [], [], 0, 0
+    for name, start, end, samples, steering_angle in maneuver:
+        t = np.linspace(start, end, samples)
+        result = integrate(state, t, (engine_torque, brake_force, steering_angle, slip_angle, p),
+                           solver, "car_model", use_jacobian, rtol, atol)
+        if not result.success:
+            raise RuntimeError("{} failed on segment {!r}: {}".format(solver, name, result.message))
+        state = result.y[-1]
+        times.append(result.t)
+        solutions.append(result.y)
+        nfev += result.nfev
+        njev += result.njev
+    return np.concatenate(times), np.vstack(solutions), nfev, njev
+
+
+def compare_solvers(solvers=SOLVERS, rtol=1e-6, atol=1e-8):
+    """Run the default maneuver with each solver, with and without the analytic Jacobian.
+
+    Returns rows with evaluation counts, wall time and the max deviation from a
+    tight-tolerance reference, to pick the cheapest solver that stays accurate.
+    """
+    _, reference, _, _ = integrate_maneuver(solver="DOP853", rtol=1e-11, atol=1e-12)
+    rows = []
+    for solver in solvers:
+        for use_jacobian in ((True, False) if solver in JACOBIAN_SOLVERS else (False,)):
+            start = time.perf_counter()
+            _, y, nfev, njev = integrate_maneuver(solver=solver, use_jacobian=use_jacobian, rtol=rtol, atol=atol)
+            rows.append({
+                "solver": solver,
+                "jacobian": "analytic" if use_jacobian else ("finite-diff" if solver in JACOBIAN_SOLVERS else "-"),
+                "nfev": nfev,
+                "njev": njev,
+                "wall_ms": 1000 * (time.perf_counter() - start),
+                "max_error": float(np.max(np.abs(y - reference))),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ODE solvers on the default maneuver.")
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVERS), choices=SOLVERS)
+    parser.add_argument("--rtol", type=float, default=1e-6)
+    parser.add_argument("--atol", type=float, default=1e-8)
+    args = parser.parse_args()
+    print("{:<8} {:<12} {:>7} {:>6} {:>9} {:>10}".format("solver", "jacobian", "nfev", "njev", "wall ms", "max error"))
+    for row in compare_solvers(args.solvers, args.rtol, args.atol):
+        print("{solver:<8} {jacobian:<12} {nfev:>7} {njev:>6} {wall_ms:>9.1f} {max_error:>10.2e}".format(**row))
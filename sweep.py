@@ -0,0 +1,153 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.integrate import odeint
+from car_model import DEFAULT_MANEUVER
+from fast_rhs import FastCar
+from road_map import SurfaceTable
+from vehicle_params import vehicle_parameters
+
+# Steering profiles, in the segment format of car_model.DEFAULT_MANEUVER
+STEERING_PROFILES = {
+    "default": DEFAULT_MANEUVER,
+    "straight": [('straight', 0, 15, 15 * 50, 0)],
+    "lane_change": [
+        ('straight', 0, 4, 4 * 50, 0),
+        ('left', 4, 5, 50, -5 * (np.pi / 180)),
+        ('right', 5, 6, 50, 5 * (np.pi / 180)),
+        ('straight', 6, 15, 9 * 50, 0),
+    ],
+    "slalom": [(name, 3 * i, 3 * (i + 1), 3 * 50, angle * (np.pi / 180))
+               for i, (name, angle) in enumerate([('left', -10), ('right', 10)] * 2 + [('straight', 0)])],
+}
+
+DEFAULT_GRID = {
+    "engine_torque": [300, 400, 500],
+    "steering_profile": ["default", "lane_change"],
+    "road_type": ["asphalt", "gravel", "snow"],
+    "vehicle": {"base": {}, "heavy": {"mass": 2000}},
+}
+
+# Summary metrics reported per scenario, in result table column order
+METRICS = ["ok", "final_position", "final_lateral_position", "max_velocity", "final_velocity",
+           "max_abs_lateral_position", "final_orientation", "distance"]
+
+
+def expand_grid(grid):
+    """Return the cartesian product of a parameter grid as a list of scenario dicts."""
+    vehicles = grid.get("vehicle", {"base": {}})
+    scenarios = []
+    for torque, profile, road_type, vehicle in itertools.product(
+            grid["engine_torque"], grid["steering_profile"], grid["road_type"], vehicles):
+        params = dict(vehicle_parameters, **vehicles[vehicle])
+        scenarios.append({
+            "index": len(scenarios),
+            "engine_torque": torque,
+            "steering_profile": profile,
+            "road_type": road_type,
+            "vehicle": vehicle,
+            "params": params,
+        })
+    return scenarios
+
+
+def simulate_profile(car, profile, engine_torque, slip_angle=0.05):
+    """Integrate a FastCar from rest through consecutive profile segments.
+
+    The car's surface is uniform, so its parameters are packed once. Returns
+    the concatenated time points and the (n, 5) solution.
+    """
+    p = car.pack_parameters()
+    state = [0, 0, 0, 0, 0]
+    times, solutions = [], []
+    for name, start, end, samples, steering_angle in profile:
+        t = np.linspace(start, end, samples)
+        solution = odeint(car.rhs, state, t, args=(engine_torque, steering_angle, slip_angle, p))
+        state = solution[-1]
+        times.append(t)
+        solutions.append(solution)
+    return np.concatenate(times), np.vstack(solutions)
+
+
+def run_scenario(scenario):
+    """Integrate one scenario on the dynamics.Car equations; returns (summary row, (t, solution)).
+
+    The road type sets both the rolling resistance and the tyre grip, through
+    a uniform SurfaceTable.
+    """
+    car = FastCar(scenario["params"], surface=SurfaceTable.uniform(scenario["road_type"]))
+    t, solution = simulate_profile(car, STEERING_PROFILES[scenario["steering_profile"]], scenario["engine_torque"])
+    x, v, y = solution[:, 0], solution[:, 1], solution[:, 2]
+    row = {key: scenario[key] for key in ("index", "engine_torque", "steering_profile", "road_type", "vehicle")}
+    row.update({
+        # the resistive forces fade out at v = 0, so a negative speed means the integration failed
+        "ok": bool(np.all(np.isfinite(solution)) and v.min() >= 0),
+        "final_position": x[-1],
+        "final_lateral_position": y[-1],
+        "max_velocity": v.max(),
+        "final_velocity": v[-1],
+        "max_abs_lateral_position": np.abs(y).max(),
+        "final_orientation": solution[-1, 4],
+        "distance": np.sum(np.hypot(np.diff(x), np.diff(y))),
+    })
+    return row, (t, solution)
+
+
+def run_sweep(grid=None, workers=None, chunksize=None, keep_trajectories=True):
+    """Run every scenario of the grid on a process pool.
+
+    Scenarios are handed to the workers in chunks to amortize the inter-process
+    overhead. Returns (rows, trajectories) with rows ordered by scenario index
+    and trajectories a dict index -> (t, solution) when keep_trajectories is set.
+    """
+    scenarios = expand_grid(grid or DEFAULT_GRID)
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(scenarios) / (workers * 4)))
+    if workers == 1:
+        results = list(map(run_scenario, scenarios))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_scenario, scenarios, chunksize=chunksize))
+    rows = [row for row, _ in results]
+    trajectories = {row["index"]: trajectory for row, trajectory in results} if keep_trajectories else {}
+    return rows, trajectories
+
+
+def write_results(rows, trajectories, csv_path, npz_path=None):
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    if npz_path:
+        arrays = {}
+        for index, (t, solution) in trajectories.items():
+            arrays["t_{}".format(index)] = t
+            arrays["state_{}".format(index)] = solution
+        np.savez_compressed(npz_path, **arrays)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a grid of vehicle scenarios across CPU cores.")
+    parser.add_argument("--grid", help="JSON file with engine_torque, steering_profile, road_type and vehicle entries")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=None, help="scenarios per task sent to a worker")
+    parser.add_argument("--out", default="sweep_results.csv", help="summary table output")
+    parser.add_argument("--trajectories", default=None, help="optional .npz file for per-scenario trajectories")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    start = time.perf_counter()
+    rows, trajectories = run_sweep(grid, args.workers, args.chunksize, keep_trajectories=bool(args.trajectories))
+    wall = time.perf_counter() - start
+    write_results(rows, trajectories, args.out, args.trajectories)
+    print("{} scenarios in {:.2f}s on {} workers -> {}".format(len(rows), wall, args.workers or os.cpu_count(), args.out))
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Trace levels, higher levels record more often
+TRACE_OFF = 0
+TRACE_STEP = 1  # once per integration step
+TRACE_RHS = 2   # every right-hand-side evaluation inside the integrator
+
+TRACE_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("F_engine", np.float64),
+    ("F_brake", np.float64),
+    ("F_drag", np.float64),
+    ("F_net", np.float64),
+    ("dtheta_dt", np.float64),
+    ("throttle", np.float64),
+    ("brake", np.float64),
+    ("steering_angle", np.float64),
+])
+
+
+class Telemetry:
+    """Preallocated ring buffer of dynamics samples, off by default.
+
+    Callers guard with `if TRACE.level >= TRACE_RHS:` so a disabled trace costs
+    one attribute read and integer compare. When the ring wraps, samples are
+    either overwritten or, if a binary sink is open, flushed to it first.
+    """
+
+    def __init__(self, capacity=65536, level=TRACE_OFF):
+        self.level = level
+        self._buffer = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self._count = 0  # total samples recorded since the last clear
+        self._sink = None
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def enable(self, level=TRACE_RHS, sink=None):
+        """Start recording. sink is an optional path that receives raw TRACE_DTYPE records."""
+        self.level = level
+        if sink is not None:
+            self.close()
+            self._sink = open(sink, "ab")
+
+    def disable(self):
+        self.level = TRACE_OFF
+        self.close()
+
+    def record(self, t, F_engine, F_brake, F_drag, F_net, dtheta_dt, throttle, brake, steering_angle):
+        i = self._count % len(self._buffer)
+        if i == 0 and self._count and self._sink is not None:
+            self._buffer.tofile(self._sink)
+        self._buffer[i] = (t, F_engine, F_brake, F_drag, F_net, dtheta_dt, throttle, brake, steering_angle)
+        self._count += 1
+
+    def samples(self):
+        """Return the buffered samples, oldest first."""
+        n = len(self._buffer)
+        if self._count <= n:
+            return self._buffer[:self._count].copy()
+        i = self._count % n
+        return np.concatenate((self._buffer[i:], self._buffer[:i]))
+
+    def clear(self):
+        self._count = 0
+
+    def flush(self):
+        """Write samples not yet in the sink and start a fresh ring."""
+        if self._sink is None:
+            return
+        n = len(self._buffer)
+        pending = self._count % n or (n if self._count else 0)
+        self._buffer[:pending].tofile(self._sink)
+        self._sink.flush()
+        self._count = 0
+
+    def close(self):
+        if self._sink is not None:
+            self.flush()
+            self._sink.close()
+            self._sink = None
+
+    @staticmethod
+    def load(path):
+        """Read a binary trace written through a sink."""
+        return np.fromfile(path, dtype=TRACE_DTYPE)
+
+
+# Process-wide trace used by the dynamics hot path
+TRACE = Telemetry()
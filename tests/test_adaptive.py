@@ -0,0 +1,57 @@
+import math
+import numpy as np
+import pytest
+from adaptive import DEFAULT_PHASES, EventIntegrator, Powertrain, fixed_step_maneuver, run_maneuver
+from dynamics import Car
+
+
+def shift_speed(powertrain, gear, rpm):
+    return rpm * 2 * math.pi / 60.0 * powertrain.tire_radius / (powertrain.ratios[gear] * powertrain.final_drive)
+
+
+@pytest.fixture(scope="module")
+def maneuver():
+    return run_maneuver(EventIntegrator(Car(), Powertrain()), DEFAULT_PHASES, dt=0.01)
+
+
+@pytest.mark.parametrize("gear", range(Powertrain().top_gear))
+def test_shift_changes_gear_either_side_of_the_shift_speed(gear):
+    powertrain = Powertrain()
+    up = shift_speed(powertrain, gear, powertrain.shift_up_rpm)
+    assert powertrain.shift(up * 0.999, gear) == gear
+    assert powertrain.shift(up * 1.001, gear) == gear + 1
+    assert powertrain.gear_for(up * 0.999) == gear
+    down = shift_speed(powertrain, gear + 1, powertrain.shift_down_rpm)
+    assert powertrain.shift(down * 1.001, gear + 1) == gear + 1
+    assert powertrain.shift(down * 0.999, gear + 1) == gear
+
+
+def test_integrator_shifts_at_the_shift_speeds(maneuver):
+    powertrain = Powertrain()
+    ups = [e for e in maneuver.events if e.kind == "shift_up"]
+    downs = [e for e in maneuver.events if e.kind == "shift_down"]
+    assert [e.detail for e in ups] == list(range(1, powertrain.top_gear + 1))
+    assert [e.detail for e in downs] == list(range(powertrain.top_gear - 1, -1, -1))
+    velocity = maneuver.y[:, 1]
+    for event in ups + downs:
+        old = event.detail - 1 if event.kind == "shift_up" else event.detail + 1
+        rpm = powertrain.shift_up_rpm if event.kind == "shift_up" else powertrain.shift_down_rpm
+        assert np.interp(event.t, maneuver.t, velocity) == pytest.approx(shift_speed(powertrain, old, rpm), rel=1e-3)
+        # the recorded gear changes at the event, not a sample later
+        before, after = maneuver.t < event.t, maneuver.t > event.t
+        assert maneuver.gear[before][-1] == old
+        assert maneuver.gear[after][0] == event.detail
+    assert maneuver.events[-1].kind == "stop"
+
+
+def test_integrator_matches_fixed_steps_and_the_gap_shrinks_with_dt(maneuver):
+    errors = []
+    for Dt in (0.05, 0.01):
+        adaptive = maneuver if Dt == 0.01 else run_maneuver(EventIntegrator(Car(), Powertrain()), DEFAULT_PHASES, dt=Dt)
+        t, y, _ = fixed_step_maneuver(Car(), Powertrain(), DEFAULT_PHASES, Dt=Dt)
+        np.testing.assert_allclose(adaptive.t, t, atol=1e-9)
+        np.testing.assert_allclose(adaptive.y[:, 1], y[:, 1], atol=0.1)
+        errors.append(np.abs(adaptive.y[:, 0] - y[:, 0]).max())
+    assert errors[0] < 2.5  # m, over a 2.7 km run
+    # the fixed steps pick gears up to Dt late, a first-order error
+    assert errors[1] < errors[0] / 3
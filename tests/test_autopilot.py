@@ -0,0 +1,32 @@
+import os
+import numpy as np
+import pytest
+from autopilot import CITY_ASSETS, CONTROLLERS, LaneCamera, evaluate
+
+
+@pytest.fixture(scope="module")
+def camera():
+    return LaneCamera.load(os.path.join(CITY_ASSETS, "4Wayroad800x600.png"))
+
+
+@pytest.mark.parametrize("position", np.arange(0.0, 80.0, 10.0))
+@pytest.mark.parametrize("lateral, orientation", [(0.0, 0.0), (0.03, 0.0), (-0.3, 0.0), (0.0, 0.03), (0.5, -0.05)])
+def test_measured_offset_and_heading_match_the_pose(camera, position, lateral, orientation):
+    observation = camera.measure(camera.render(position, lateral, orientation))
+    assert observation.offset == pytest.approx(-lateral, abs=0.01)  # 0.1 px
+    assert observation.heading == pytest.approx(-orientation, abs=0.002)
+
+
+@pytest.mark.parametrize("controller", sorted(CONTROLLERS))
+def test_controllers_hold_a_centred_start(camera, controller):
+    result = evaluate(camera, CONTROLLERS[controller](), duration=10.0)
+    assert result.misses == 0
+    assert result.max_error < 0.02
+
+
+@pytest.mark.parametrize("controller", sorted(CONTROLLERS))
+@pytest.mark.parametrize("offset, heading", [(0.75, 0.0), (-0.5, 0.05)])
+def test_controllers_settle_on_the_lane_centre(camera, controller, offset, heading):
+    result = evaluate(camera, CONTROLLERS[controller](), offset, heading)
+    assert result.misses == 0
+    assert result.final_error < 0.05
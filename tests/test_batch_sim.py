@@ -0,0 +1,23 @@
+import numpy as np
+from batch_sim import BatchCar, ODEINT_TOLERANCE, compare_with_odeint
+from dynamics import CarState
+
+
+def test_batch_matches_odeint():
+    assert compare_with_odeint() <= ODEINT_TOLERANCE
+
+
+def test_batch_matches_odeint_turning_at_speed():
+    assert compare_with_odeint(steering_angle=-0.1, initial_velocity=25.0) <= ODEINT_TOLERANCE
+
+
+def test_cars_in_a_batch_are_independent():
+    states = [CarState(velocity=v) for v in (5.0, 15.0, 25.0)]
+    batch = BatchCar.from_states(states)
+    batch.steering_angle = [0.0, 0.05, -0.05]
+    batch.step(0.05)
+    for i, state in enumerate(states):
+        single = BatchCar.from_states([state])
+        single.steering_angle = batch.steering_angle[i]
+        single.step(0.05)
+        np.testing.assert_allclose(batch.states[i], single.states[0])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from adaptive import Powertrain
+from battery import BatteryPack, battery_subscriber
+from physics_loop import PhysicsLoop
+
+
+def test_soc_follows_the_charge_drawn():
+    pack = BatteryPack(3, soc=0.8)
+    start = pack.soc.copy()
+    drawn, energy = np.zeros(3), np.zeros(3)
+    for _ in range(2000):
+        delivered = pack.step([5e3, 20e3, -5e3], 0.1)
+        drawn += pack.current * 0.1
+        energy += delivered * 0.1
+    np.testing.assert_allclose(start - pack.soc, drawn / pack.capacity, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(pack.energy, energy, rtol=1e-9)
+    assert drawn[1] > drawn[0] > 0 > drawn[2]
+    # 20 kW for 200 s at ~350 V is about 11.4 Ah out of 60
+    assert drawn[1] / 3600 == pytest.approx(20e3 * 200 / pack.voltage[1] / 3600, rel=0.05)
+
+
+def test_delivered_power_matches_the_request_within_limits():
+    pack = BatteryPack(1)
+    assert pack.step(10e3, 0.05)[0] == pytest.approx(10e3)
+
+
+def test_under_voltage_latches():
+    pack = BatteryPack(1, soc=0.05)
+    delivered = pack.step(500e3, 0.05)
+    assert pack.under_voltage[0]
+    assert delivered[0] < 500e3
+    pack.step(0.0, 0.05)
+    assert pack.under_voltage[0] and pack.summary()["faults"] == ["under_voltage"]
+
+
+def test_over_voltage_latches_when_charging_a_full_pack():
+    pack = BatteryPack(2, soc=0.99)
+    pack.step([-200e3, 0.0], 0.05)
+    assert list(pack.over_voltage) == [True, False]
+    pack.step(0.0, 0.05)
+    assert pack.over_voltage[0]
+
+
+def test_over_temperature_latches():
+    pack = BatteryPack(1, temperature=59.9)  # just under t_max; cooling alone would pull it down
+    for _ in range(100):
+        pack.step(150e3, 0.05)
+    assert pack.over_temperature[0]
+    for _ in range(100):
+        pack.step(0.0, 0.05)
+    assert pack.over_temperature[0]
+
+
+def test_subscriber_draws_through_the_loops_gearbox():
+    direct, geared = PhysicsLoop(), PhysicsLoop(powertrain=Powertrain())
+    packs = [BatteryPack(1), BatteryPack(1)]
+    for loop, pack in zip((direct, geared), packs):
+        loop.add_subscriber(battery_subscriber(pack))
+        loop.run(steps=20)
+    # first gear multiplies the engine torque, and at low speed so does the traction force the pack pays for
+    assert packs[1].energy[0] > 2 * packs[0].energy[0]
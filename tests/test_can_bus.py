@@ -0,0 +1,138 @@
+import pytest
+from can_bus import (FAILSAFE_BRAKE, MESSAGES, ControlsECU, ECU, Frame, Gateway, Injector,
+                     MessageSpec, VehicleInterface, VehicleNetwork)
+from physics_loop import PhysicsLoop
+
+
+@pytest.fixture
+def network():
+    network = VehicleNetwork()
+    yield network
+    network.close()
+
+
+def delivered(bus):
+    frames = []
+    bus.monitor(frames.append)
+    return frames
+
+
+def test_lowest_can_id_wins_arbitration(network):
+    bus = network.bus("can")
+    node = ECU(network, bus, "node")
+    frames = delivered(bus)
+    specs = [MessageSpec("m{}".format(can_id), can_id, 8, None, ("x",)) for can_id in (0x300, 0x050, 0x200, 0x100)]
+    assert bus.transmit_many([Frame(spec, (0,), 0, node) for spec in specs]) == len(specs)
+    network.run_until(0.01)
+    assert [frame.can_id for frame in frames] == [0x050, 0x100, 0x200, 0x300]
+    # back to back on the wire, in that order
+    for first, second in zip(frames, frames[1:]):
+        assert second.sent_at == pytest.approx(first.delivered_at)
+
+
+def test_controls_counter_rejects_replays_and_foreign_sequences(network):
+    physics = PhysicsLoop()
+    vehicle = VehicleInterface(network, network.bus("can"), physics)
+    spec = MESSAGES["controls"]
+
+    def receive(counter, throttle):
+        frame = Frame(spec, (throttle, 0.0, 0.0), counter, None)
+        frame.delivered_at = network.time
+        vehicle._on_controls(frame)
+        return physics.car.throttle
+
+    assert receive(5, 0.2) == 0.2  # first frame synchronises
+    assert receive(6, 0.3) == 0.3
+    assert receive(6, 0.9) == 0.3  # replayed counter
+    assert receive(15, 0.9) == 0.3  # jump past max_counter_jump
+    assert receive(9, 0.4) == 0.4  # a few lost frames are tolerated
+    assert receive(11, 0.5) == 0.5  # wraps modulo the counter width
+    assert (vehicle.accepted, vehicle.rejected) == (4, 2)
+
+
+def test_spoofing_node_cannot_take_over_the_controls(network):
+    physics = PhysicsLoop()
+    bus = network.bus("can")
+    controls = ControlsECU(network, bus, throttle=0.4)
+    vehicle = VehicleInterface(network, bus, physics)
+    Injector(network, bus, "controls", (1.0, 0.0, 0.5), rate=100, start=0.5, duration=0.5, name="attacker")
+    network.run_until(1.2)
+    assert vehicle.rejected > 0
+    assert not vehicle.failsafe
+    assert physics.car.throttle == controls.throttle == 0.4
+    assert physics.car.steering_angle == 0.0
+
+
+def test_watchdog_applies_failsafe_after_timeout_and_recovers(network):
+    physics = PhysicsLoop()
+    bus = network.bus("can")
+    controls = ControlsECU(network, bus, throttle=0.6)
+    vehicle = VehicleInterface(network, bus, physics, timeout=0.1)
+    network.run_until(0.5)
+    assert not vehicle.failsafe and physics.car.throttle == 0.6
+
+    controls.silent = True
+    network.run_until(0.5 + 0.05)
+    assert not vehicle.failsafe  # still inside the timeout
+    network.run_until(0.5 + 0.1 + 0.03)
+    assert vehicle.failsafe
+    assert physics.car.throttle == 0
+    assert physics.car.brake == FAILSAFE_BRAKE
+
+    controls.silent = False
+    network.run_until(0.8)
+    assert not vehicle.failsafe
+    assert physics.car.throttle == 0.6 and physics.car.brake == 0.0
+
+
+def test_repeated_errors_put_the_sender_bus_off(network):
+    bus = network.bus("can")
+    node = ECU(network, bus, "node")
+    bus.error_rate = 1.0
+    assert node.send(MessageSpec("m", 0x100, 8, None, ("x",)), (0,)) == 1
+    # +8 per error frame; the 32nd, about 6 ms in, reaches 256 and the frame is lost
+    network.run_until(0.007)
+    assert bus.errors == 32
+    assert bus.frames == 0 and bus.dropped == 1
+    recovered = node.bus_off_until
+    assert recovered > network.time
+    assert node.send("controls", (0, 0, 0)) == 0  # still bus-off
+
+    bus.error_rate = 0.0
+    network.run_until(recovered + 1e-3)
+    frames = delivered(bus)
+    assert node.send("controls", (0, 0, 0)) == 1
+    network.run_until(recovered + 0.01)
+    assert len(frames) == 1 and node.transmit_errors == 0
+
+
+def test_failed_bus_holds_frames_until_it_recovers(network):
+    bus = network.bus("can")
+    node = ECU(network, bus, "node")
+    frames = delivered(bus)
+    network.run_until(0.1)
+    bus.fail(0.05)
+    node.send("controls", (0, 0, 0))
+    network.run_until(0.14)
+    assert frames == [] and bus.stats()["pending"] == 1
+    network.run_until(0.2)
+    assert len(frames) == 1
+    assert frames[0].sent_at == pytest.approx(0.15)
+    assert frames[0].delivered_at - frames[0].queued_at >= 0.05
+
+
+def test_gateway_silenced_during_its_delay_does_not_forward(network):
+    source, target = network.bus("a"), network.bus("b")
+    node = ECU(network, source, "node")
+    gateway = Gateway(network, source, target, ("vehicle_speed",), delay=1e-3)
+    forwarded = delivered(target)
+
+    node.send("vehicle_speed", (1.0, 0.0))
+    network.run_until(0.01)
+    assert [frame.sender for frame in forwarded] == [gateway]
+
+    # the gateway crashes after receiving the frame but before forwarding it
+    source.monitor(lambda frame: setattr(gateway, "silent", True))
+    node.send("vehicle_speed", (2.0, 0.0))
+    network.run_until(0.02)
+    assert len(forwarded) == 1
@@ -0,0 +1,23 @@
+import pytest
+from bicycle import ENGINES, make_car
+from dynamics import CarState
+from physics_loop import PhysicsLoop
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_braked_car_stops_without_reversing(engine):
+    physics = PhysicsLoop(make_car(engine), CarState(velocity=2.0))
+    physics.car.throttle, physics.car.brake = 0.0, 1.0
+    physics.run(steps=200)
+    assert physics.velocities.min() >= 0.0
+    assert physics.current_state.velocity < 1e-6
+    stopped_at = physics.current_state.position
+    physics.run(steps=100)
+    assert physics.current_state.position == pytest.approx(stopped_at, abs=1e-6)
+
+
+def test_car_at_rest_stays_put_without_throttle():
+    physics = PhysicsLoop()
+    physics.car.throttle = 0.0
+    physics.run(steps=20)
+    assert physics.current_state.position == 0.0 and physics.current_state.velocity == 0.0
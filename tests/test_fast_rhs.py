@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+import fast_rhs
+from constants import ROAD_TYPES, V_HOLD
+from dynamics import Car
+from road_map import RoadMap, SurfaceTable
+
+
+def random_inputs(rng, car, samples=200):
+    for _ in range(samples):
+        state = rng.uniform([-100, 0, -10, -5, -np.pi], [100, 50, 10, 5, np.pi])
+        if rng.random() < 0.25:
+            state[1] = rng.uniform(-2 * V_HOLD, 2 * V_HOLD)  # where brake and rolling resistance fade out
+        yield state, rng.uniform(0, 450), rng.uniform(-car.max_steering_angle, car.max_steering_angle), \
+            rng.uniform(0, 1), rng.choice([0.0, rng.uniform(0, 1)])
+
+
+@pytest.mark.parametrize("surface", [SurfaceTable.uniform(road_type) for road_type in ROAD_TYPES]
+                         + [RoadMap.straight(ROAD_TYPES, 40.0).surface_table()],
+                         ids=ROAD_TYPES + ["mixed"])
+def test_fast_rhs_matches_car(surface):
+    rng = np.random.default_rng(0)
+    car, fast = Car(surface), fast_rhs.FastCar(surface=surface)
+    for state, torque, steering, throttle, brake in random_inputs(rng, car):
+        car.throttle = fast.throttle = throttle
+        car.brake = fast.brake = brake
+        np.testing.assert_allclose(fast.equations_of_motion(state, 0.0, torque, steering, 0.05),
+                                   car.equations_of_motion(state, 0.0, torque, steering, 0.05), rtol=1e-9, atol=1e-9)
+
+
+def test_check_equivalence():
+    assert fast_rhs.check_equivalence(samples=200) < 1e-6
@@ -0,0 +1,87 @@
+import math
+import numpy as np
+import pytest
+from dynamics import CarState
+from physics_loop import MAX_FRAME_TIME, MAX_SUBSTEPS, PhysicsLoop
+from trajectory import TRAJECTORY_DTYPE
+
+
+def cruising(Dt=0.05):
+    return PhysicsLoop(state=CarState(velocity=10.0), Dt=Dt)
+
+
+@pytest.mark.parametrize("whole", range(MAX_SUBSTEPS + 1))
+def test_advance_takes_every_whole_step_due(whole):
+    physics = cruising(Dt=0.02)  # so MAX_SUBSTEPS steps stay under MAX_FRAME_TIME
+    alpha = physics.advance((whole + 0.3) * physics.Dt)
+    assert physics.step_count == whole
+    assert alpha == pytest.approx(0.3)
+    assert physics.dropped_time == 0.0
+
+
+def test_advance_carries_the_remainder_between_calls():
+    physics = cruising()
+    alphas = [physics.advance(0.35 * physics.Dt) for _ in range(10)]
+    assert physics.step_count == 3  # floor(10 * 0.35)
+    assert alphas[:4] == pytest.approx([0.35, 0.7, 0.05, 0.4])
+    assert alphas[-1] == pytest.approx(0.5)
+
+
+def test_advance_caps_substeps_and_drops_the_backlog():
+    physics = cruising(Dt=0.01)
+    alpha = physics.advance(0.205)  # 20 steps due
+    assert physics.step_count == MAX_SUBSTEPS
+    assert physics.dropped_time == pytest.approx(0.2 - MAX_SUBSTEPS * 0.01)
+    assert alpha == pytest.approx(0.5)
+    # the next frame starts from the remainder, not the dropped backlog
+    physics.advance(0.0)
+    assert physics.step_count == MAX_SUBSTEPS
+
+
+def test_advance_caps_the_frame_time():
+    physics = cruising(Dt=0.04)
+    alpha = physics.advance(10.0, max_substeps=1000)
+    assert physics.step_count == 6  # floor(MAX_FRAME_TIME / Dt)
+    assert alpha == pytest.approx((MAX_FRAME_TIME - 6 * 0.04) / 0.04)
+    assert physics.dropped_time == 0.0
+
+
+def test_alpha_stays_in_the_unit_interval():
+    physics = cruising(Dt=0.02)
+    rng = np.random.default_rng(0)
+    fed = 0.0
+    for elapsed in rng.exponential(0.03, 500):
+        alpha = physics.advance(elapsed)
+        fed += min(elapsed, MAX_FRAME_TIME)
+        assert 0.0 <= alpha < 1.0
+        # every second fed is stepped, dropped or still in the accumulator
+        assert physics.step_count * physics.Dt + physics.dropped_time + alpha * physics.Dt == pytest.approx(fed)
+
+
+@pytest.mark.parametrize("alpha", [0.0, 0.25, 0.5, 0.999])
+def test_interpolated_blends_the_last_two_samples(alpha):
+    physics = cruising()
+    physics.car.throttle = 0.5
+    physics.car.steering_angle = 0.1
+    physics.run(steps=5)
+    a, b = physics.history[-2].copy(), physics.history[-1].copy()
+    blend = physics.interpolated(alpha)
+    for name in TRAJECTORY_DTYPE.names:
+        assert blend[name] == pytest.approx(a[name] + alpha * (b[name] - a[name]))
+    assert a["t"] <= blend["t"] < b["t"]
+
+
+def test_interpolated_turns_the_short_way_across_pi():
+    physics = cruising()
+    physics.history.append(0.0, CarState(orientation=math.pi - 0.1))
+    physics.history.append(0.05, CarState(orientation=-math.pi + 0.1))
+    blend = physics.interpolated(0.25)
+    assert blend["orientation"] == pytest.approx(math.pi - 0.05)
+    assert blend["t"] == pytest.approx(0.0125)
+
+
+def test_interpolated_before_two_samples_returns_the_current_state():
+    physics = cruising()
+    assert physics.interpolated(0.5)["velocity"] == 10.0
+    physics.step()
+    assert physics.interpolated(0.5)["t"] == physics.t
@@ -0,0 +1,27 @@
+import pytest
+from profiler import Profiler
+
+
+def test_late_counter_statistics_cover_only_its_own_frames():
+    profiler = Profiler(window=10, enabled=True)
+    for _ in range(6):
+        profiler.count("early", 1)
+        profiler.frame()
+    for _ in range(2):
+        profiler.count("late", 4)
+        profiler.frame()
+    stats = profiler.stats()
+    assert stats["late"]["p50"] == stats["late"]["mean"] == 4
+    assert stats["early"]["mean"] == pytest.approx(6 / 8)  # zero in the frames it was not counted
+
+
+def test_statistics_use_the_last_window_frames_after_wrapping():
+    profiler = Profiler(window=4, enabled=True)
+    for frame in range(3):
+        profiler.frame()
+    for value in range(1, 8):
+        profiler.count("late", value)
+        profiler.frame()
+    stats = profiler.stats()["late"]
+    assert stats["last"] == 7
+    assert stats["mean"] == pytest.approx((4 + 5 + 6 + 7) / 4)
@@ -0,0 +1,102 @@
+import json
+import os
+import numpy as np
+import pytest
+from dynamics import CarState
+from physics_loop import PhysicsLoop
+from recorder import FORMAT_VERSION, INDEX_FILE, RECORD_DTYPE, TrajectoryRecorder, TrajectoryReplay
+from Road import Road
+
+
+def read_index(path):
+    with open(os.path.join(path, INDEX_FILE)) as f:
+        return json.load(f)
+
+
+def record(path, n, chunk_rows=4, **kwargs):
+    with TrajectoryRecorder(str(path), chunk_rows=chunk_rows, **kwargs) as recorder:
+        for i in range(n):
+            recorder.append(0.1 * i, CarState(position=float(i), velocity=2.0 * i), throttle=0.5, brake=0.0,
+                            steering_angle=0.01 * i)
+
+
+def test_round_trip_across_chunk_boundaries(tmp_path):
+    record(tmp_path, 10, metadata={"engine": "kinematic"})
+    index = read_index(tmp_path)
+    assert index["version"] == FORMAT_VERSION
+    assert index["metadata"] == {"engine": "kinematic"}
+    assert np.dtype([tuple(field) for field in index["dtype"]]) == RECORD_DTYPE
+    assert [c["file"] for c in index["chunks"]] == ["chunk_000000.npy", "chunk_000001.npy", "chunk_000002.npy"]
+    assert [c["rows"] for c in index["chunks"]] == [4, 4, 2]  # the last, partial chunk is written on close
+    assert [t for c in index["chunks"] for t in (c["t0"], c["t1"])] == pytest.approx([0.0, 0.3, 0.4, 0.7, 0.8, 0.9])
+
+    replay = TrajectoryReplay(str(tmp_path))
+    assert len(replay) == 10 and len(replay.chunks) == 3
+    assert replay.metadata == {"engine": "kinematic"}
+    np.testing.assert_array_equal(replay.column("position"), np.arange(10.0))
+    np.testing.assert_allclose(replay.column("steering_angle"), 0.01 * np.arange(10), rtol=1e-6)
+    for i in (0, 3, 4, 7, 8, 9, -1, -10):
+        assert replay[i]["position"] == (i % 10)
+        assert replay[i]["velocity"] == 2.0 * (i % 10)
+    assert [row["position"] for row in replay] == list(range(10))
+    with pytest.raises(IndexError):
+        replay[10]
+    with pytest.raises(IndexError):
+        replay[-11]
+
+
+@pytest.mark.parametrize("t, expected", [(-1.0, 0), (0.0, 0), (0.35, 3), (0.4, 4), (0.75, 7), (0.8, 8), (5.0, 9)])
+def test_index_at_finds_the_last_sample_at_or_before_t(tmp_path, t, expected):
+    record(tmp_path, 10)
+    assert TrajectoryReplay(str(tmp_path)).index_at(t) == expected
+
+
+def test_flushed_chunks_survive_without_close(tmp_path):
+    recorder = TrajectoryRecorder(str(tmp_path), chunk_rows=4)
+    for i in range(6):
+        recorder.append(0.1 * i, CarState(position=float(i)))
+    # only the full chunk is on disk; the two buffered rows would be lost in a crash
+    assert [c["rows"] for c in read_index(tmp_path)["chunks"]] == [4]
+    assert len(TrajectoryReplay(str(tmp_path))) == 4
+    recorder.close()
+    assert len(TrajectoryReplay(str(tmp_path))) == 6
+
+
+def test_reopening_appends_new_chunks(tmp_path):
+    record(tmp_path, 6)
+    with TrajectoryRecorder(str(tmp_path), chunk_rows=4) as recorder:
+        recorder.append(1.0, CarState(position=100.0))
+    index = read_index(tmp_path)
+    assert [c["rows"] for c in index["chunks"]] == [4, 2, 1]
+    assert index["chunks"][-1]["file"] == "chunk_000002.npy"
+    replay = TrajectoryReplay(str(tmp_path))
+    assert replay[-1]["position"] == 100.0 and len(replay) == 7
+
+
+def test_append_rows_flushes_then_writes_whole_chunks(tmp_path):
+    rows = np.zeros(9, dtype=RECORD_DTYPE)
+    rows["t"] = np.arange(9.0) + 1.0
+    with TrajectoryRecorder(str(tmp_path), chunk_rows=4) as recorder:
+        recorder.append(0.0, CarState())
+        recorder.append_rows(rows)
+    assert [c["rows"] for c in read_index(tmp_path)["chunks"]] == [1, 4, 4, 1]
+    np.testing.assert_array_equal(TrajectoryReplay(str(tmp_path)).column("t"), np.arange(10.0))
+
+
+def test_subscriber_records_controls_and_road_properties(tmp_path):
+    road = Road()
+    physics = PhysicsLoop(state=CarState(velocity=30.0))
+    physics.car.throttle = 0.25
+    with TrajectoryRecorder(str(tmp_path), chunk_rows=16) as recorder:
+        physics.add_subscriber(recorder.subscriber(road))
+        physics.run(steps=100)
+    replay = TrajectoryReplay(str(tmp_path))
+    assert len(replay) == 100
+    np.testing.assert_allclose(replay.column("t"), physics.history.column("t"))
+    np.testing.assert_allclose(replay.column("position"), physics.positions)
+    assert np.all(replay.column("throttle") == np.float32(0.25))
+    # 150 m of driving crosses the 100 m asphalt segment into gravel
+    assert set(replay.column("road_type")) == {0, 1}
+    for row in (replay[0], replay[-1]):
+        properties = road.get_road_properties(int(row["position"]))
+        assert row["friction"] == np.float32(properties["friction"])
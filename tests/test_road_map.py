@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from constants import ROAD_TYPES, friction, roughness, rolling_coefficient
+from road_map import RoadMap
+
+
+def test_scalar_and_array_properties_have_the_same_keys():
+    road_map = RoadMap.straight(ROAD_TYPES, 10.0)
+    for segment in range(len(ROAD_TYPES)):
+        scalar = road_map.properties(segment)
+        array = road_map.properties(np.array([segment]))
+        assert scalar.keys() == array.keys()
+        assert scalar["road_type_code"] == array["road_type_code"][0] == segment
+        assert scalar["road_type"] == array["road_type"][0]
+
+
+def test_surface_table_rejects_maps_not_along_x():
+    curved = RoadMap([{"road_type": "asphalt", "points": [[0, 0], [10, 0]]},
+                      {"road_type": "snow", "points": [[10, 0], [10, 10]]}])
+    with pytest.raises(ValueError):
+        curved.surface_table()
+    rolling, grip = RoadMap.straight(ROAD_TYPES, 100).surface_table().at(150.0)
+    assert grip == pytest.approx(friction[ROAD_TYPES[1]])
+    assert rolling == pytest.approx(rolling_coefficient(roughness[ROAD_TYPES[1]]))
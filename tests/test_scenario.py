@@ -0,0 +1,62 @@
+import json
+import os
+import numpy as np
+import pytest
+from constants import friction
+from road_map import RoadMap
+from scenario import (BRAKE, SCENARIOS, THROTTLE, compile_scenario, evaluate, run_scenario, scenario_files, simulate,
+                      timeline)
+
+
+def test_timeline_step_at_first_breakpoint_holds_the_value_before_it():
+    grid = np.arange(0, 4, 0.5)
+    np.testing.assert_array_equal(timeline([[2, 0], [2, 1]], grid), [0, 0, 0, 0, 1, 1, 1, 1])
+
+
+def test_timeline_is_linear_between_breakpoints_and_held_outside():
+    grid = np.array([0.0, 1.0, 1.5, 2.0, 3.0, 5.0])
+    np.testing.assert_allclose(timeline([[1, 0], [2, 1], [2, 0.5], [3, 0.5]], grid), [0, 0, 0.5, 0.5, 0.5, 0.5])
+
+
+def test_step_controls_switch_at_the_step_time():
+    compiled = compile_scenario({"name": "step", "duration": 4, "controls": {
+        "throttle": [[0, 0.3], [2, 0.3], [2, 0]], "brake": [[2, 0], [2, 1]]}})
+    for t in (0.0, 1.0, 1.95):
+        throttle, brake, _ = compiled.at(t)
+        assert (throttle, brake) == pytest.approx((0.3, 0.0))
+    for t in (2.0, 3.0):
+        throttle, brake, _ = compiled.at(t)
+        assert (throttle, brake) == pytest.approx((0.0, 1.0))
+    physics, applied = simulate(compiled)
+    # the step starts at physics step 40 (t = 2 s)
+    np.testing.assert_allclose(applied[:40, BRAKE], 0.0, atol=1e-9)
+    np.testing.assert_allclose(applied[40:, BRAKE], 1.0, atol=1e-9)
+    np.testing.assert_allclose(applied[:40, THROTTLE], 0.3, atol=1e-9)
+
+
+@pytest.mark.parametrize("path", scenario_files([SCENARIOS]), ids=os.path.basename)
+def test_bundled_scenarios_pass(path):
+    result = run_scenario(path)
+    assert result.error is None
+    assert result.passed, result.checks
+
+
+def test_map_scenario_runs_on_a_straight_map(tmp_path):
+    RoadMap.straight(["asphalt", "snow"], 50.0, periodic=False).save(str(tmp_path / "straight.json"))
+    spec = {"name": "onto_snow", "duration": 10, "initial": {"velocity": 10},
+            "road": {"map": "straight.json"}, "controls": {"throttle": 0.2},
+            "assertions": {"max_lateral_deviation": 0.5}}
+    compiled = compile_scenario(spec, str(tmp_path))
+    assert compiled.surfaces[0].at(75.0)[1] == pytest.approx(friction["snow"])
+    physics, applied = simulate(compiled)
+    assert physics.positions[-1] > 50.0
+    assert all(check.passed for check in evaluate(compiled, physics, applied))
+
+
+def test_curved_map_scenario_is_rejected(tmp_path):
+    path = tmp_path / "loop.json"
+    path.write_text(json.dumps({"name": "loop", "duration": 1,
+                                "road": {"map": os.path.join(os.path.dirname(SCENARIOS), "maps", "city_loop.json")}}))
+    result = run_scenario(str(path))
+    assert not result.passed
+    assert "does not run along the x axis" in result.error
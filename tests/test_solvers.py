@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+import fast_rhs
+from solvers import JACOBIAN_SOLVERS, integrate
+
+# braking to a crawl with some lateral slip: the slip term gets stiff as v -> 0
+STIFF = dict(y0=[0.0, 0.5, 0.0, 0.2, 0.0], t=np.linspace(0, 2, 11),
+             args=(320, 0.3, 0.05, fast_rhs.pack_parameters(throttle=0.0, brake=0.5)))
+
+
+@pytest.mark.parametrize("solver", JACOBIAN_SOLVERS)
+@pytest.mark.parametrize("use_jacobian", [True, False])
+def test_stiff_problem_reports_jacobian_evaluations(solver, use_jacobian):
+    result = integrate(solver=solver, use_jacobian=use_jacobian, **STIFF)
+    assert result.success
+    assert result.njev > 0
+
+
+def test_analytic_and_finite_difference_jacobians_agree():
+    analytic = integrate(solver="odeint", use_jacobian=True, **STIFF)
+    estimated = integrate(solver="odeint", use_jacobian=False, **STIFF)
+    np.testing.assert_allclose(analytic.y, estimated.y, atol=1e-5)
@@ -0,0 +1,44 @@
+import math
+import numpy as np
+import pytest
+from dynamics import CarState
+from traffic import Agent, Obstacle, TrafficWorld, UniformGrid, brute_force_collisions
+
+
+def random_world(rng, n_cars=30, n_obstacles=10, size=30.0):
+    agents = [Agent(None, CarState()) for _ in range(n_cars)]
+    obstacles = [Obstacle(*rng.uniform(0, size, 2), rng.uniform(0.5, 3.0), rng.uniform(0.5, 2.0), rng.uniform(-math.pi, math.pi))
+                 for _ in range(n_obstacles)]
+    return TrafficWorld(agents, obstacles, follow_range=10.0)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_collisions_match_brute_force_under_random_motion(seed):
+    rng = np.random.default_rng(seed)
+    world = random_world(rng)
+    found = 0
+    for _ in range(10):
+        for i, agent in enumerate(world.agents):
+            # random walk with the odd long jump, so cars cross cells and cluster
+            s = agent.state
+            step = rng.normal(0, 8.0 if rng.random() < 0.1 else 1.5, 2)
+            s.position, s.lateral_position = np.clip([s.position + step[0], s.lateral_position + step[1]], -5, 35)
+            s.orientation = rng.uniform(-math.pi, math.pi)
+            world.grid.move(("car", i), *agent.xy)
+        collisions, _ = world.update_interactions()
+        assert sorted(collisions) == brute_force_collisions(world)
+        found += len(collisions)
+    assert found > 0  # the comparison saw overlaps, not just empty lists
+
+
+def test_grid_query_covers_every_point_in_range():
+    rng = np.random.default_rng(0)
+    grid, points = UniformGrid(cell_size=5.0), rng.uniform(-20, 20, (300, 2))
+    for i, (x, y) in enumerate(points):
+        grid.insert(i, x, y)
+    for i in range(0, 300, 2):
+        points[i] = rng.uniform(-20, 20, 2)
+        grid.move(i, *points[i])
+    for x, y in rng.uniform(-20, 20, (50, 2)):
+        near = {i for i, (px, py) in enumerate(points) if abs(px - x) <= 5.0 and abs(py - y) <= 5.0}
+        assert near <= set(grid.query(x, y, 5.0))
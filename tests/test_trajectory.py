@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from dynamics import CarState
+from trajectory import TrajectoryStore
+
+
+def fill(store, n):
+    for i in range(n):
+        store.append(0.1 * i, CarState(position=float(i), velocity=1.0), acceleration=-float(i))
+    return store
+
+
+def test_growing_store_keeps_every_sample_and_returns_views():
+    store = fill(TrajectoryStore(chunk_size=4), 37)
+    assert len(store) == 37
+    assert len(store._data) == 64  # 4 doubled to 64
+    np.testing.assert_array_equal(store.column("position"), np.arange(37.0))
+    np.testing.assert_array_equal(store.column("acceleration"), -np.arange(37.0))
+    assert store[0]["position"] == 0.0 and store[-1]["position"] == 36.0
+    assert np.shares_memory(store.column("t"), store._data)
+    window = store.time_slice(1.0, 2.0)
+    np.testing.assert_array_equal(window["position"], np.arange(10.0, 20.0))
+    assert np.shares_memory(window, store._data)
+    with pytest.raises(IndexError):
+        store[37]
+
+
+@pytest.mark.parametrize("n", [3, 5, 6, 12, 13])
+def test_ring_keeps_the_newest_samples_in_order(n):
+    store = fill(TrajectoryStore(capacity=5), n)
+    kept = np.arange(max(n - 5, 0), n, dtype=float)
+    assert len(store) == len(kept)
+    assert len(store._data) == 5  # never grows
+    np.testing.assert_array_equal(store.column("position"), kept)
+    np.testing.assert_array_equal(store.records()["acceleration"], -kept)
+    assert [store[i]["position"] for i in range(len(kept))] == list(kept)
+    assert store[-1]["position"] == n - 1
+    assert store[-len(kept)]["position"] == kept[0]
+    with pytest.raises(IndexError):
+        store[len(kept)]
+
+
+def test_ring_time_slice_across_the_wrap():
+    store = fill(TrajectoryStore(capacity=5), 13)  # holds 8..12, stored as 10 11 12 8 9
+    np.testing.assert_array_equal(store.time_slice()["position"], np.arange(8.0, 13.0))
+    np.testing.assert_array_equal(store.time_slice(0.85, 1.15)["position"], [9.0, 10.0, 11.0])
+    np.testing.assert_array_equal(store.time_slice(0.0, 0.95)["position"], [8.0, 9.0])
+    np.testing.assert_array_equal(store.time_slice(1.05)["position"], [11.0, 12.0])
+    assert len(store.time_slice(5.0)) == 0
+
+
+def test_clear_empties_both_modes():
+    for store in (fill(TrajectoryStore(chunk_size=4), 10), fill(TrajectoryStore(capacity=4), 10)):
+        store.clear()
+        assert len(store) == 0
+        fill(store, 2)
+        np.testing.assert_array_equal(store.column("position"), [0.0, 1.0])
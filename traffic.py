@@ -0,0 +1,229 @@
+import argparse
+import math
+import time
+import numpy as np
+from constants import NUM_OBSTACLES, OBSTACLE_LENGTH, OBSTACLE_WIDTH, SCALE
+from dynamics import Car, CarState
+from vehicle_params import vehicle_parameters
+
+LANE_WIDTH = 3.5  # m
+TIME_HEADWAY = 2.0  # s, following gap below v * TIME_HEADWAY counts as too close
+
+
+class UniformGrid:
+    """Spatial hash of 2-D points in square cells, updated incrementally.
+
+    move() only touches the cell lists when an item crosses a cell border, so
+    keeping the index current costs O(1) per moved item. With cell_size at
+    least the query radius, a query visits a 3x3 block of cells.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._where = {}  # item -> cell
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def __len__(self):
+        return len(self._where)
+
+    def insert(self, item, x, y):
+        cell = self._cell(x, y)
+        self._cells.setdefault(cell, []).append(item)
+        self._where[item] = cell
+
+    def remove(self, item):
+        cell = self._where.pop(item)
+        members = self._cells[cell]
+        members.remove(item)
+        if not members:
+            del self._cells[cell]
+
+    def move(self, item, x, y):
+        cell = self._cell(x, y)
+        if cell != self._where[item]:
+            self.remove(item)
+            self._cells.setdefault(cell, []).append(item)
+            self._where[item] = cell
+
+    def query(self, x, y, radius):
+        """Return the items in every cell overlapping the square around (x, y)."""
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        found = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                members = self._cells.get((cx, cy))
+                if members:
+                    found.extend(members)
+        return found
+
+
+class Agent:
+    """A Car with its CarState and footprint in the world."""
+
+    def __init__(self, car, state, length=vehicle_parameters["length"], width=vehicle_parameters["width"]):
+        self.car = car
+        self.state = state
+        self.length = length
+        self.width = width
+
+    @property
+    def xy(self):
+        return self.state.position, self.state.lateral_position
+
+
+class Obstacle:
+    def __init__(self, x, y, length, width, orientation=0.0):
+        self.x = x
+        self.y = y
+        self.length = length
+        self.width = width
+        self.orientation = orientation
+
+    @property
+    def xy(self):
+        return self.x, self.y
+
+
+def _corners(x, y, length, width, orientation):
+    c, s = math.cos(orientation), math.sin(orientation)
+    hl, hw = length / 2, width / 2
+    return [(x + c * dx - s * dy, y + s * dx + c * dy) for dx, dy in ((hl, hw), (hl, -hw), (-hl, -hw), (-hl, hw))]
+
+
+def boxes_overlap(a, b):
+    """Separating-axis test between two oriented rectangles given as (x, y, length, width, orientation)."""
+    ca, cb = _corners(*a), _corners(*b)
+    for orientation in (a[4], b[4]):
+        for ax, ay in ((math.cos(orientation), math.sin(orientation)), (-math.sin(orientation), math.cos(orientation))):
+            pa = [ax * px + ay * py for px, py in ca]
+            pb = [ax * px + ay * py for px, py in cb]
+            if max(pa) < min(pb) or max(pb) < min(pa):
+                return False
+    return True
+
+
+class TrafficWorld:
+    """Many agents plus static obstacles, with grid-indexed neighbour queries.
+
+    Every step integrates each agent, moves it in the grid, then checks
+    collisions and following gaps against nearby items only.
+    """
+
+    def __init__(self, agents=(), obstacles=(), Dt=0.05, engine_torque=320, slip_angle=0.05, follow_range=50.0):
+        self.agents = list(agents)
+        self.obstacles = list(obstacles)
+        self.Dt = Dt
+        self.engine_torque = engine_torque
+        self.slip_angle = slip_angle
+        self.follow_range = follow_range
+        self.t = 0.0
+        self.grid = UniformGrid(cell_size=follow_range)
+        for i, agent in enumerate(self.agents):
+            self.grid.insert(("car", i), *agent.xy)
+        for i, obstacle in enumerate(self.obstacles):
+            self.grid.insert(("obstacle", i), *obstacle.xy)
+        self.collisions = []
+        self.following_gaps = np.full(len(self.agents), np.inf)
+
+    @classmethod
+    def spawn(cls, n_cars, lanes=3, spacing=15.0, n_obstacles=NUM_OBSTACLES, road_length=None, seed=0,
+              car_factory=Car, **kwargs):
+        """Place n_cars in lanes with `spacing` metres between them and scatter obstacles ahead."""
+        rng = np.random.default_rng(seed)
+        agents = []
+        for i in range(n_cars):
+            lane, slot = i % lanes, i // lanes
+            car = car_factory()
+            car.throttle = rng.uniform(0.5, 1.0)
+            state = CarState(position=slot * spacing, velocity=rng.uniform(5, 15), lateral_position=lane * LANE_WIDTH)
+            agents.append(Agent(car, state))
+        road_length = road_length or (n_cars // lanes + 1) * spacing * 2
+        # constants give obstacle sizes in pixels at SCALE, in units of 0.1 m
+        length, width = OBSTACLE_LENGTH / SCALE * 0.1, OBSTACLE_WIDTH / SCALE * 0.1
+        obstacles = [Obstacle(rng.uniform(0, road_length), rng.integers(lanes) * LANE_WIDTH, length, width)
+                     for _ in range(n_obstacles)]
+        return cls(agents, obstacles, **kwargs)
+
+    def _footprint(self, kind, i):
+        if kind == "car":
+            a = self.agents[i]
+            return (a.state.position, a.state.lateral_position, a.length, a.width, a.state.orientation)
+        o = self.obstacles[i]
+        return (o.x, o.y, o.length, o.width, o.orientation)
+
+    def step(self):
+        for i, agent in enumerate(self.agents):
+            agent.state = agent.car.get_next_state(agent.state, self.Dt, self.engine_torque, self.slip_angle, agent.car.steering_angle)
+            self.grid.move(("car", i), *agent.xy)
+        self.t += self.Dt
+        self.update_interactions()
+
+    def update_interactions(self):
+        """Recompute collisions and following gaps from grid neighbours."""
+        collisions = []
+        gaps = np.full(len(self.agents), np.inf)
+        for i, agent in enumerate(self.agents):
+            x, y = agent.xy
+            heading = agent.state.orientation
+            hx, hy = math.cos(heading), math.sin(heading)
+            box = self._footprint("car", i)
+            reach = math.hypot(agent.length, agent.width) / 2
+            for kind, j in self.grid.query(x, y, self.follow_range):
+                if kind == "car" and j == i:
+                    continue
+                other = self._footprint(kind, j)
+                dx, dy = other[0] - x, other[1] - y
+                # each unordered car pair is tested once, from its lower index
+                if (kind == "obstacle" or j > i) and math.hypot(dx, dy) <= reach + math.hypot(other[2], other[3]) / 2:
+                    if boxes_overlap(box, other):
+                        collisions.append((i, kind, j))
+                ahead = dx * hx + dy * hy
+                if ahead > 0 and abs(-dx * hy + dy * hx) < LANE_WIDTH / 2 and ahead <= self.follow_range:
+                    gaps[i] = min(gaps[i], ahead - (agent.length + other[2]) / 2)
+        self.collisions = collisions
+        self.following_gaps = gaps
+        return collisions, gaps
+
+    def too_close(self):
+        """Indices of agents following closer than TIME_HEADWAY seconds."""
+        speeds = np.array([a.state.velocity for a in self.agents])
+        return np.flatnonzero(self.following_gaps < speeds * TIME_HEADWAY)
+
+    def run(self, duration):
+        for _ in range(int(round(duration / self.Dt))):
+            self.step()
+
+
+def brute_force_collisions(world):
+    """O(N^2) reference for update_interactions' collision list."""
+    items = [("car", i) for i in range(len(world.agents))] + [("obstacle", i) for i in range(len(world.obstacles))]
+    found = []
+    for a in range(len(world.agents)):
+        for kind, j in items:
+            if kind == "car" and j <= a:
+                continue
+            if boxes_overlap(world._footprint("car", a), world._footprint(kind, j)):
+                found.append((a, kind, j))
+    return sorted(found)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dense traffic with grid-indexed collision and following checks.")
+    parser.add_argument("--cars", type=int, default=300)
+    parser.add_argument("--obstacles", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    world = TrafficWorld.spawn(args.cars, n_obstacles=args.obstacles, spacing=8.0)
+    start = time.perf_counter()
+    world.run(args.duration)
+    wall = time.perf_counter() - start
+    steps = int(round(args.duration / world.Dt))
+    print("{} cars, {} obstacles: {:.1f} ms/step".format(args.cars, args.obstacles, 1000 * wall / steps))
+    print("collisions: {}, too close: {}".format(len(world.collisions), len(world.too_close())))
+    if sorted(world.collisions) != brute_force_collisions(world):
+        raise SystemExit("grid collisions differ from the brute-force reference")
@@ -0,0 +1,104 @@
+import numpy as np
+
+TRAJECTORY_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("position", np.float64),
+    ("velocity", np.float64),
+    ("lateral_position", np.float64),
+    ("lateral_velocity", np.float64),
+    ("orientation", np.float64),
+    ("acceleration", np.float64),  # dv/dt from the equations of motion at this sample
+])
+
+
+class TrajectoryStore:
+    """Columnar state history backed by one structured NumPy array.
+
+    In the default growing mode the array is extended a chunk at a time (the
+    chunk doubles with the size), so appends are amortized O(1) and columns and
+    time slices are views. With a capacity the store becomes a fixed-size ring
+    that keeps the newest `capacity` samples, for endless interactive sessions.
+    Indices are logical: 0 is the oldest retained sample, -1 the newest.
+    """
+
+    def __init__(self, chunk_size=4096, capacity=None, dtype=TRAJECTORY_DTYPE):
+        self.capacity = capacity
+        self._data = np.zeros(capacity if capacity else chunk_size, dtype=dtype)
+        self._count = 0  # samples appended in total
+
+    @property
+    def ring(self):
+        return self.capacity is not None
+
+    def __len__(self):
+        return min(self._count, len(self._data)) if self.ring else self._count
+
+    def _grow(self):
+        data = np.zeros(2 * len(self._data), dtype=self._data.dtype)
+        data[:self._count] = self._data
+        self._data = data
+
+    def append(self, t, state, acceleration=0.0):
+        """Append a CarState sampled at time t."""
+        self.append_values(t, *state.as_list(), acceleration)
+
+    def append_values(self, *values):
+        if self.ring:
+            i = self._count % len(self._data)
+        else:
+            if self._count == len(self._data):
+                self._grow()
+            i = self._count
+        self._data[i] = values
+        self._count += 1
+
+    def _physical(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("trajectory index out of range")
+        if self._wrapped():
+            return (self._count + i) % len(self._data)
+        return i
+
+    def __getitem__(self, i):
+        """Return sample i as a record view, e.g. store[-1]["velocity"]."""
+        return self._data[self._physical(i)]
+
+    def _wrapped(self):
+        return self.ring and self._count > len(self._data)
+
+    def column(self, name):
+        """Return one field in time order; a view unless the ring has wrapped."""
+        return self.records()[name]
+
+    def records(self):
+        """Return all retained samples in time order; a view unless the ring has wrapped."""
+        if self._wrapped():
+            i = self._count % len(self._data)
+            return np.concatenate((self._data[i:], self._data[:i]))
+        return self._data[:len(self)]
+
+    def time_slice(self, t0=None, t1=None):
+        """Return samples with t0 <= t < t1, as a view whenever they are contiguous in memory."""
+        if self._wrapped():
+            i = self._count % len(self._data)
+            older, newer = self._data[i:], self._data[:i]
+            older, newer = self._slice_sorted(older, t0, t1), self._slice_sorted(newer, t0, t1)
+            if len(older) == 0:
+                return newer
+            if len(newer) == 0:
+                return older
+            return np.concatenate((older, newer))
+        return self._slice_sorted(self._data[:len(self)], t0, t1)
+
+    @staticmethod
+    def _slice_sorted(data, t0, t1):
+        t = data["t"]
+        lo = 0 if t0 is None else np.searchsorted(t, t0, side="left")
+        hi = len(data) if t1 is None else np.searchsorted(t, t1, side="left")
+        return data[lo:hi]
+
+    def clear(self):
+        self._count = 0
@@ -39,3 +39,42 @@ vehicle_parameters = {
     "spring_constant": 30000,    # Spring constant in N/m
     "damping_ratio": 0.3,        # Damping ratio (used to compute damper coefficient)
 }
+
+# Traction battery, one series string of cells. The open circuit voltage is
+# tabulated at evenly spaced state of charge from 0 to 1 and starts at v_min.
+battery_parameters = {
+    "lithium-ion": {
+        "cells_in_series": 96,
+        "capacity_ah": 60.0,             # Cell capacity in amp-hours
+        "ocv": [3.00, 3.45, 3.55, 3.62, 3.68, 3.74, 3.80, 3.87, 3.95, 4.05, 4.20],  # V per cell
+        "r0": 0.0015,                    # Ohmic resistance per cell at 25 C, ohm
+        "r1": 0.0010,                    # Polarization resistance of the RC pair, ohm
+        "c1": 20000.0,                   # Polarization capacitance, farad
+        "r0_temperature_coefficient": 0.01,  # Relative change of r0 per degree below 25 C
+        "cell_mass": 0.9,                # kg
+        "specific_heat": 1000.0,         # J/(kg K)
+        "cooling": 3.0,                  # Heat transfer to the coolant per cell, W/K
+        "v_min": 3.0,                    # Cell voltage limits watched by the BMS
+        "v_max": 4.2,
+        "t_max": 60.0,                   # Cell temperature limit, C
+        "capacity_spread": 0.02,         # Relative standard deviation of cell capacity
+        "resistance_spread": 0.05,       # Relative standard deviation of cell r0
+    },
+    "lead-acid": {
+        "cells_in_series": 6,
+        "capacity_ah": 45.0,
+        "ocv": [1.75, 1.96, 1.98, 2.00, 2.02, 2.04, 2.06, 2.08, 2.10, 2.12, 2.13],
+        "r0": 0.0020,
+        "r1": 0.0015,
+        "c1": 50000.0,
+        "r0_temperature_coefficient": 0.015,
+        "cell_mass": 2.5,
+        "specific_heat": 900.0,
+        "cooling": 2.0,
+        "v_min": 1.75,
+        "v_max": 2.40,
+        "t_max": 50.0,
+        "capacity_spread": 0.03,
+        "resistance_spread": 0.08,
+    },
+}